@@ -0,0 +1,163 @@
+"""Load test of the whole /annotation/generate path against the stub LLM backend.
+
+Every request goes through the WSGI app: token check, parsed_map lookup,
+prompt context, the LLM gateway (concurrency limit, retries) and storing the
+annotation, with the model replaced by the local deterministic stub. Nothing
+is sent over the network.
+
+Usage:
+    python benchmarks/bench_annotate.py [--requests N] [--concurrency C]
+        [--latency SECONDS] [--sigma S] [--errors "429=0.03,503=0.01"]
+        [--max-in-flight K] [--database-url URL]
+"""
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from synthetic import generate_module
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def make_app(args, workdir):
+    # config classes read the environment when annotator is imported
+    os.environ.update(
+        LLM_BACKEND="stub",
+        LLM_STUB_LATENCY_SECONDS=str(args.latency),
+        LLM_STUB_LATENCY_SIGMA=str(args.sigma),
+        LLM_STUB_ERRORS=args.errors,
+        LLM_STUB_SEED=str(args.seed),
+        LLM_MAX_IN_FLIGHT=str(args.max_in_flight),
+        DATABASE_URL=args.database_url
+        or "sqlite:///" + os.path.join(workdir, "bench.db"),
+        UPLOAD_FOLDER=workdir,
+        ANNOTATION_WORKERS="0",
+        PARSER_POOL_WORKERS="0",
+    )
+    from annotator import create_app, db
+
+    app = create_app("development")
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def setup_file(app, n_functions):
+    """Create a user, upload a synthetic module; return (access_token, file uuid,
+    function names)."""
+    from annotator import db
+    from annotator.models.user import User
+
+    with app.app_context():
+        user = User(email="bench@example.com", password="bench-password")
+        db.session.add(user)
+        db.session.commit()
+        access_token = user.encode_access_token()
+    code = generate_module(n_functions, calls_per_function=2, body_statements=3)
+    response = app.test_client().post(
+        "/api/v1/file/upload",
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"file": (io.BytesIO(code.encode("utf-8")), "bench.py"), "name": "bench"},
+    )
+    if response.status_code != 200:
+        raise SystemExit(f"upload failed: {response.status_code} {response.json}")
+    names = [f"func_{i}" for i in range(n_functions)]
+    return access_token, response.json["uuid"], names
+
+
+def annotate(app, access_token, file_uuid, function_name, use_cache):
+    start = time.perf_counter()
+    response = app.test_client().post(
+        "/api/v1/annotation/generate",
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={
+            "file_uuid": file_uuid,
+            "function_name": function_name,
+            "no_cache": "false" if use_cache else "true",
+        },
+    )
+    return time.perf_counter() - start, response.status_code
+
+
+def usage_totals(app):
+    from annotator import db
+    from annotator.models.llm_usage import LLMUsage
+
+    with app.app_context():
+        row = db.session.query(
+            db.func.sum(LLMUsage.calls),
+            db.func.sum(LLMUsage.retries),
+            db.func.sum(LLMUsage.prompt_tokens),
+            db.func.sum(LLMUsage.completion_tokens),
+        ).one()
+    return dict(zip(["calls", "retries", "prompt_tokens", "completion_tokens"], row))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--concurrency", type=int, default=16)
+    arg_parser.add_argument("--functions", type=int, default=100)
+    arg_parser.add_argument("--latency", type=float, default=1.5, help="median, s")
+    arg_parser.add_argument("--sigma", type=float, default=0.5, help="log-normal sigma")
+    arg_parser.add_argument("--errors", default="429=0.03,503=0.01,timeout=0.005")
+    arg_parser.add_argument("--max-in-flight", type=int, default=8)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--cache", action="store_true", help="allow cache hits")
+    arg_parser.add_argument("--database-url", help="default: a temporary SQLite file")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(args, workdir)
+        access_token, file_uuid, names = setup_file(app, args.functions)
+        targets = [names[i % len(names)] for i in range(args.requests)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(
+                executor.map(
+                    lambda name: annotate(
+                        app, access_token, file_uuid, name, args.cache
+                    ),
+                    targets,
+                )
+            )
+        elapsed = time.perf_counter() - start
+        totals = usage_totals(app)
+
+    latencies = sorted(latency for latency, _ in results)
+    statuses = Counter(status for _, status in results)
+    print(
+        f"{args.requests} requests, concurrency {args.concurrency}, "
+        f"max in flight {args.max_in_flight}, stub latency {args.latency}s "
+        f"(sigma {args.sigma}), errors {args.errors or 'none'}"
+    )
+    print(f"throughput   {args.requests / elapsed:8.2f} req/s in {elapsed:.1f}s")
+    print(
+        "latency      "
+        + "  ".join(f"p{p} {percentile(latencies, p):.3f}s" for p in PERCENTILES)
+        + f"  max {latencies[-1]:.3f}s  mean {statistics.mean(latencies):.3f}s"
+    )
+    print("status       " + "  ".join(f"{s}: {n}" for s, n in sorted(statuses.items())))
+    print(
+        f"model calls  {totals['calls']}  retries {totals['retries']}  "
+        f"tokens {totals['prompt_tokens']} prompt / "
+        f"{totals['completion_tokens']} completion"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure how call graph construction scales with the number of functions.
+
+Usage:
+    python benchmarks/bench_call_graph.py [--sizes 1000 10000 50000] [--legacy-max N]
+"""
+
+import argparse
+import statistics
+import time
+
+from annotator.api.file.parser import build_call_graph
+
+from synthetic import generate_function_entries
+
+
+def legacy_build_call_graph(function_entries):
+    """Previous implementation: nested loops over every function pair."""
+    call_graph = {}
+    for f in function_entries:
+        call_graph[f["name"]] = []
+    all_names = {f["name"] for f in function_entries}
+    for f in function_entries:
+        for c in f["calls"]:
+            name_only = c.split(".")[-1]
+            if name_only in all_names:
+                call_graph[f["name"]].append(name_only)
+    for f in function_entries:
+        for callee in call_graph[f["name"]]:
+            for g in function_entries:
+                if g["name"] == callee:
+                    g["called_by"].append(f["name"])
+    return call_graph
+
+
+def time_build(build, size, repeat):
+    timings = []
+    for _ in range(repeat):
+        entries = generate_function_entries(size)
+        start = time.perf_counter()
+        build(entries)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=2000,
+        help="largest size the quadratic implementation is run on",
+    )
+    args = arg_parser.parse_args()
+
+    print(f"{'functions':>10} {'linear ms':>10} {'us/func':>8} {'legacy ms':>10}")
+    for size in args.sizes:
+        linear = time_build(build_call_graph, size, args.repeat)
+        legacy = "-"
+        if size <= args.legacy_max:
+            seconds = time_build(legacy_build_call_graph, size, 1)
+            legacy = f"{seconds * 1000:.1f}"
+        per_func = linear / size * 1e6
+        print(f"{size:>10} {linear * 1000:>10.1f} {per_func:>8.2f} {legacy:>10}")
+
+
+if __name__ == "__main__":
+    main()
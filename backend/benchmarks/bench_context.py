@@ -0,0 +1,55 @@
+"""Prompt context size with call-graph trimming versus the whole parsed_map.
+
+Usage:
+    python benchmarks/bench_context.py [--functions N] [--hops K] [--budget T]
+"""
+
+import argparse
+import statistics
+import time
+
+from annotator.api.annotation.context import build_context
+from annotator.api.file.parser import parse_python_file
+from annotator.util.packed_map import PackedMap, pack_parsed_map
+
+from synthetic import generate_module
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--functions", type=int, nargs="+", default=[50, 500, 2000])
+    arg_parser.add_argument("--hops", type=int, default=2)
+    arg_parser.add_argument("--budget", type=int, default=2000)
+    arg_parser.add_argument("--samples", type=int, default=50)
+    args = arg_parser.parse_args()
+
+    print(f"hops={args.hops} budget={args.budget} tokens")
+    print(
+        f"{'functions':>9} {'full':>9} {'context':>8} {'saved':>7} "
+        f"{'truncated':>9} {'build ms':>9}"
+    )
+    for n in args.functions:
+        code = generate_module(n, calls_per_function=2, body_statements=3)
+        packed = PackedMap(pack_parsed_map(parse_python_file(code)))
+        step = max(n // args.samples, 1)
+        contexts = []
+        timings = []
+        for i in range(0, n, step):
+            start = time.perf_counter()
+            contexts.append(
+                build_context(
+                    packed, f"func_{i}", hops=args.hops, token_budget=args.budget
+                )
+            )
+            timings.append(time.perf_counter() - start)
+        full = contexts[0].full_tokens
+        trimmed = statistics.mean(c.tokens for c in contexts)
+        truncated = sum(c.truncated for c in contexts) / len(contexts)
+        print(
+            f"{n:>9} {full:>9} {trimmed:>8.0f} {1 - trimmed / full:>7.1%} "
+            f"{truncated:>9.0%} {statistics.median(timings) * 1000:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
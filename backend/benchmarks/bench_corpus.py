@@ -0,0 +1,229 @@
+"""Benchmark parse_python_file over the installed CPython stdlib and stress files.
+
+Reports per-file latency percentiles, throughput and peak memory, and writes
+the results as JSON so that runs from different commits can be compared.
+
+Usage:
+    python benchmarks/bench_corpus.py [--limit N] [--repeat R]
+        [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import sysconfig
+import time
+import tracemalloc
+
+from annotator.api.file.parser import PARSER_VERSION, parse_python_file
+
+from synthetic import (
+    generate_long_function_module,
+    generate_module,
+    generate_nested_module,
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def stdlib_sources(limit=None):
+    """Yield (path, code) for the .py files of the running interpreter's stdlib."""
+    root = sysconfig.get_paths()["stdlib"]
+    count = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames if d not in ("site-packages", "__pycache__")
+        )
+        for filename in sorted(filenames):
+            if not filename.endswith(".py"):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    code = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            yield os.path.relpath(path, root), code
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+
+def synthetic_sources():
+    return [
+        ("synthetic/module_2000_functions.py", generate_module(2000)),
+        ("synthetic/module_10000_functions.py", generate_module(10000)),
+        ("synthetic/nested_depth_40.py", generate_nested_module(40)),
+        ("synthetic/long_function_20000.py", generate_long_function_module(20000)),
+    ]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def measure_latency(code, repeat):
+    timings = []
+    parsed = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parsed = parse_python_file(code)
+        timings.append(time.perf_counter() - start)
+    return min(timings), parsed is not None
+
+
+def measure_peak_memory(code):
+    """Peak bytes allocated by Python while parsing code (measured separately,
+    as tracemalloc slows parsing down)."""
+    tracemalloc.start()
+    try:
+        parse_python_file(code)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_suite(name, sources, repeat, memory):
+    latencies = []
+    slowest = []
+    total_bytes = 0
+    peak_memory = 0
+    failed = 0
+    for path, code in sources:
+        size = len(code.encode("utf-8"))
+        latency, ok = measure_latency(code, repeat)
+        if not ok:
+            failed += 1
+            continue
+        total_bytes += size
+        latencies.append(latency)
+        slowest.append((latency, path, size))
+        if memory:
+            peak_memory = max(peak_memory, measure_peak_memory(code))
+    latencies.sort()
+    total_seconds = sum(latencies)
+    slowest.sort(reverse=True)
+    result = {
+        "files": len(latencies),
+        "failed": failed,
+        "bytes": total_bytes,
+        "total_seconds": total_seconds,
+        "throughput_mb_s": (total_bytes / 1e6) / total_seconds if total_seconds else 0.0,
+        "latency_ms": {
+            f"p{pct}": percentile(latencies, pct) * 1000 for pct in PERCENTILES
+        },
+        "slowest": [
+            {"path": path, "bytes": size, "ms": latency * 1000}
+            for latency, path, size in slowest[:5]
+        ],
+    }
+    result["latency_ms"]["max"] = (latencies[-1] if latencies else 0.0) * 1000
+    result["latency_ms"]["mean"] = (
+        statistics.fmean(latencies) * 1000 if latencies else 0.0
+    )
+    if memory:
+        result["peak_memory_bytes"] = peak_memory
+    print_suite(name, result)
+    return result
+
+
+def print_suite(name, result):
+    latency = result["latency_ms"]
+    print(f"== {name}: {result['files']} files, {result['bytes'] / 1e6:.1f} MB")
+    print(
+        "   latency ms  "
+        + "  ".join(f"{key} {value:8.2f}" for key, value in latency.items())
+    )
+    print(f"   throughput  {result['throughput_mb_s']:.2f} MB/s")
+    if "peak_memory_bytes" in result:
+        print(f"   peak memory {result['peak_memory_bytes'] / 1e6:.1f} MB (tracemalloc)")
+    if result["failed"]:
+        print(f"   skipped     {result['failed']} files with syntax errors")
+
+
+def compare(results, baseline_path):
+    """Print relative change of the headline numbers against a previous run."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"== compared to {baseline_path} ({baseline.get('commit') or 'unknown'})")
+    for suite, current in results["suites"].items():
+        previous = baseline.get("suites", {}).get(suite)
+        if previous is None:
+            continue
+        rows = [
+            ("throughput_mb_s", current["throughput_mb_s"], previous["throughput_mb_s"])
+        ]
+        for key, value in current["latency_ms"].items():
+            if key in previous["latency_ms"]:
+                rows.append((f"latency {key}", value, previous["latency_ms"][key]))
+        if "peak_memory_bytes" in current and "peak_memory_bytes" in previous:
+            rows.append(
+                (
+                    "peak_memory",
+                    current["peak_memory_bytes"],
+                    previous["peak_memory_bytes"],
+                )
+            )
+        for label, now, before in rows:
+            change = (now - before) / before * 100 if before else 0.0
+            print(
+                f"   {suite:9} {label:16} {before:12.2f} -> {now:12.2f} ({change:+.1f}%)"
+            )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--limit", type=int, default=None, help="max stdlib files")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timings per file")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    arg_parser.add_argument("--output", default="parser_benchmark.json")
+    arg_parser.add_argument("--compare", help="previous results JSON to compare with")
+    args = arg_parser.parse_args()
+
+    memory = not args.no_memory
+    # deeply nested stress files need more than the default recursion limit
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    results = {
+        "commit": git_commit(),
+        "parser_version": PARSER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "suites": {
+            "stdlib": run_suite(
+                "stdlib", stdlib_sources(args.limit), args.repeat, memory
+            ),
+            "synthetic": run_suite(
+                "synthetic", synthetic_sources(), args.repeat, memory
+            ),
+        },
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
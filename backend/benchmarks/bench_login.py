@@ -0,0 +1,107 @@
+"""Login latency under concurrency, with bcrypt inline or on the bounded hasher.
+
+Every request goes through the WSGI app (/auth/login): user lookup, bcrypt
+check at --rounds and token encoding. With --inline bcrypt runs in the
+request threads, as before the hasher existed; otherwise it runs on
+--workers hasher threads with at most --max-queue logins waiting, and the
+rest are answered 503 at once.
+
+Usage:
+    python benchmarks/bench_login.py [--requests N] [--concurrency C]
+        [--rounds R] [--workers W] [--max-queue Q] [--inline]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+PERCENTILES = (50, 90, 99)
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def make_app(args, workdir):
+    # config classes read the environment when annotator is imported
+    os.environ.update(
+        DATABASE_URL="sqlite:///" + os.path.join(workdir, "bench.db"),
+        BCRYPT_WORKERS="0" if args.inline else str(args.workers),
+        BCRYPT_MAX_QUEUE=str(args.max_queue),
+        BCRYPT_QUEUE_TIMEOUT_SECONDS=str(args.queue_timeout),
+        TOKEN_PURGE_INTERVAL_SECONDS="0",
+        ANNOTATION_WORKERS="0",
+    )
+    from annotator import create_app, db
+    from annotator.models.user import User
+
+    app = create_app("development")
+    app.config["BCRYPT_LOG_ROUNDS"] = args.rounds
+    # every 503 is logged with its traceback
+    app.logger.disabled = True
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email=EMAIL, password=PASSWORD))
+        db.session.commit()
+    return app
+
+
+def login(app):
+    start = time.perf_counter()
+    response = app.test_client().post(
+        "/api/v1/auth/login",
+        data=f"email={EMAIL}&password={PASSWORD}",
+        content_type="application/x-www-form-urlencoded",
+    )
+    return time.perf_counter() - start, response.status_code
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--concurrency", type=int, default=32)
+    arg_parser.add_argument("--rounds", type=int, default=12, help="bcrypt log rounds")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--max-queue", type=int, default=64)
+    arg_parser.add_argument("--queue-timeout", type=float, default=5)
+    arg_parser.add_argument("--inline", action="store_true", help="bcrypt in requests")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(args, workdir)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda _: login(app), range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    mode = "inline" if args.inline else f"{args.workers} hasher threads"
+    ok = sorted(latency for latency, status in results if status == 200)
+    shed = sorted(latency for latency, status in results if status == 503)
+    statuses = Counter(status for _, status in results)
+    print(
+        f"{args.requests} logins, concurrency {args.concurrency}, "
+        f"bcrypt rounds {args.rounds}, {mode}, max queue {args.max_queue}"
+    )
+    print(f"throughput   {len(ok) / elapsed:8.2f} logins/s in {elapsed:.1f}s")
+    if ok:
+        print(
+            "latency 200  "
+            + "  ".join(f"p{p} {percentile(ok, p):.3f}s" for p in PERCENTILES)
+            + f"  max {ok[-1]:.3f}s  mean {statistics.mean(ok):.3f}s"
+        )
+    if shed:
+        print(f"latency 503  p50 {percentile(shed, 50):.3f}s  max {shed[-1]:.3f}s")
+    print("status       " + "  ".join(f"{s}: {n}" for s, n in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the single-pass parser against the previous multi-walk extraction.
+
+Usage:
+    python benchmarks/bench_parser.py [--functions N] [--repeat R]
+"""
+
+import argparse
+import ast
+import statistics
+import time
+
+from annotator.api.file.parser import (
+    FunctionScanner,
+    parse_python_file,
+    extract_returns,
+    extract_calls,
+    detect_control_flow,
+    is_recursive,
+)
+
+from synthetic import generate_module
+
+
+def legacy_extract(func_nodes):
+    """Previous extraction: one ast.walk per helper for every function."""
+    results = []
+    for node in func_nodes:
+        calls = extract_calls(node)
+        results.append(
+            (
+                extract_returns(node),
+                calls,
+                detect_control_flow(node),
+                is_recursive(node.name, calls),
+            )
+        )
+    return results
+
+
+def single_pass_extract(func_nodes):
+    results = []
+    for node in func_nodes:
+        scanner = FunctionScanner(node)
+        results.append(
+            (scanner.returns, scanner.calls, scanner.control_flow, scanner.recursion)
+        )
+    return results
+
+
+def time_it(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--functions", type=int, default=2000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    code = generate_module(args.functions)
+    size_kb = len(code.encode("utf-8")) / 1024
+    tree = ast.parse(code)
+    func_nodes = [n for n in tree.body if isinstance(n, ast.FunctionDef)]
+
+    assert single_pass_extract(func_nodes) == legacy_extract(func_nodes)
+    for entry, extracted in zip(
+        parse_python_file(code)["functions"], legacy_extract(func_nodes)
+    ):
+        assert (
+            entry["returns"],
+            entry["calls"],
+            entry["control_flow"],
+            entry["recursion"],
+        ) == extracted, f"parsed_map differs for {entry['name']}"
+
+    legacy = time_it(legacy_extract, func_nodes, args.repeat)
+    single = time_it(single_pass_extract, func_nodes, args.repeat)
+    print(f"module: {args.functions} functions, {size_kb:.0f} KiB")
+    print(f"legacy multi-walk : {legacy * 1000:8.1f} ms")
+    print(f"single-pass       : {single * 1000:8.1f} ms")
+    print(f"speedup           : {legacy / single:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
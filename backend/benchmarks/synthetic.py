@@ -0,0 +1,78 @@
+"""Synthetic Python sources for parser benchmarks."""
+
+import random
+
+
+def generate_module(n_functions, calls_per_function=3, body_statements=6, seed=0):
+    """Return source code for a module with n_functions top-level functions.
+
+    Every function has a mix of if/while blocks, local and attribute calls to
+    other functions in the module, and several return statements, so that all
+    parts of the parser are exercised.
+    """
+    rng = random.Random(seed)
+    lines = ["import os", "import json", "from collections import deque", ""]
+    lines.append("CONSTANT = 42")
+    lines.append("")
+    for i in range(n_functions):
+        lines.append(f"def func_{i}(a, b, c=None):")
+        lines.append("    result = a + b")
+        for j in range(body_statements):
+            callee = rng.randrange(n_functions)
+            kind = j % 3
+            if kind == 0:
+                lines.append(f"    if result > {j}:")
+                lines.append(f"        result = func_{callee}(result, {j})")
+            elif kind == 1:
+                lines.append(f"    while result < {j * 10}:")
+                lines.append("        result += os.path.getsize(c.name)")
+            else:
+                lines.append(f"    json.dumps({{'k{j}': [result, deque([a])]}})")
+        for _ in range(calls_per_function):
+            callee = rng.randrange(n_functions)
+            lines.append(f"    self_obj.module.func_{callee}(a, b)")
+        lines.append("    if c is None:")
+        lines.append("        return None")
+        lines.append("    return result * 2, [a, b]")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def generate_function_entries(n_functions, calls_per_function=5, seed=0):
+    """Return parsed_map-style function entries with random intra-file calls.
+
+    Used to benchmark call graph construction without paying for ast.parse.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n_functions):
+        calls = [f"func_{rng.randrange(n_functions)}" for _ in range(calls_per_function)]
+        calls.append(f"obj.func_{rng.randrange(n_functions)}")
+        calls.append("os.path.join")
+        entries.append({"name": f"func_{i}", "calls": calls, "called_by": []})
+    return entries
+
+
+def generate_nested_module(depth, n_functions=50):
+    """Return a module whose functions nest if/while blocks depth levels deep."""
+    lines = []
+    for i in range(n_functions):
+        lines.append(f"def nested_{i}(x):")
+        indent = "    "
+        for level in range(depth):
+            keyword = "if" if level % 2 == 0 else "while"
+            lines.append(f"{indent}{keyword} x > {level}:")
+            indent += "    "
+            lines.append(f"{indent}x = nested_{(i + 1) % n_functions}(x - 1)")
+        lines.append(f"{indent}return x")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def generate_long_function_module(n_statements):
+    """Return a module with one function of n_statements call statements."""
+    lines = ["def long_function(items):", "    total = 0"]
+    for i in range(n_statements):
+        lines.append(f"    total += len(items[{i}].values.get('k{i}', []))")
+    lines.append("    return total")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,63 @@
+"""blacklist token jti
+
+Revision ID: 6e1a9d3f5b28
+Revises: 2b8f6e0d4c71
+Create Date: 2026-10-18 19:24:07.581342
+
+Revoked tokens are stored by jti (or SHA-256 of the token) instead of the
+whole token; the downgrade drops the revocations, tokens cannot be restored
+from their ids.
+"""
+
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "6e1a9d3f5b28"
+down_revision = "2b8f6e0d4c71"
+branch_labels = None
+depends_on = None
+
+
+token_blacklist = sa.table(
+    "token_blacklist",
+    sa.column("id", sa.Integer),
+    sa.column("token", sa.String),
+    sa.column("jti", sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table("token_blacklist", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("jti", sa.String(length=64), nullable=True))
+
+    # tokens issued before this revision have no jti claim
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(token_blacklist.c.id, token_blacklist.c.token))
+    for row_id, token in rows.fetchall():
+        connection.execute(
+            token_blacklist.update()
+            .where(token_blacklist.c.id == row_id)
+            .values(jti=hashlib.sha256(token.encode("utf-8")).hexdigest())
+        )
+
+    with op.batch_alter_table("token_blacklist", schema=None) as batch_op:
+        batch_op.alter_column("jti", existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_unique_constraint("uq_token_blacklist_jti", ["jti"])
+        batch_op.create_index(
+            batch_op.f("ix_token_blacklist_expires_at"), ["expires_at"], unique=False
+        )
+        batch_op.drop_column("token")
+
+
+def downgrade():
+    op.execute(token_blacklist.delete())
+    with op.batch_alter_table("token_blacklist", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("token", sa.String(length=500), nullable=False))
+        batch_op.create_unique_constraint("uq_token_blacklist_token", ["token"])
+        batch_op.drop_index(batch_op.f("ix_token_blacklist_expires_at"))
+        batch_op.drop_constraint("uq_token_blacklist_jti", type_="unique")
+        batch_op.drop_column("jti")
@@ -0,0 +1,169 @@
+"""pack file parsed_map
+
+Revision ID: e6b28f4c9a17
+Revises: a4c19e7b3d52
+Create Date: 2026-10-18 13:02:41.118204
+
+The packed layout is copied from annotator.util.packed_map as it was in
+this revision (version 1), so that replaying the migration does not depend
+on later changes to the application code. The downgrade reads version 2 as
+well: uploads made after later revisions store it. Rows whose parsed_map
+cannot be read are converted to an empty parsed_map, and logged.
+"""
+
+import json
+import logging
+import struct
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e6b28f4c9a17"
+down_revision = "a4c19e7b3d52"
+branch_labels = None
+depends_on = None
+
+
+MAGIC = b"PMAP"
+_HEADER = struct.Struct(">4sBI")
+_NAME_LEN = struct.Struct(">H")
+_SPAN = struct.Struct(">II")
+_LENGTH = struct.Struct(">I")
+# version 2 adds the u32 source start and end of every function to the index
+_SOURCE_SPAN = struct.Struct(">II")
+
+
+logger = logging.getLogger("alembic.env")
+
+EMPTY_PARSED_MAP = {
+    "file": {"path": None, "imports": [], "globals": []},
+    "functions": [],
+    "call_graph": {},
+}
+
+
+def _compress(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _decompress(data):
+    return json.loads(zlib.decompress(data))
+
+
+def pack_parsed_map(parsed_map):
+    index = []
+    entries = []
+    offset = 0
+    for function in parsed_map["functions"]:
+        entry = _compress(function)
+        name = function["name"].encode("utf-8")
+        index.append(_NAME_LEN.pack(len(name)) + name + _SPAN.pack(offset, len(entry)))
+        entries.append(entry)
+        offset += len(entry)
+    meta = _compress(
+        {"file": parsed_map["file"], "call_graph": parsed_map.get("call_graph", {})}
+    )
+    return b"".join(
+        [_HEADER.pack(MAGIC, 1, len(entries)), *index, _LENGTH.pack(len(meta)), meta]
+        + entries
+    )
+
+
+def unpack_parsed_map(blob):
+    view = memoryview(blob)
+    magic, version, count = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version not in (1, 2):
+        raise ValueError(f"unsupported packed parsed_map {magic!r} v{version}")
+    pos = _HEADER.size
+    spans = []
+    for _ in range(count):
+        (name_len,) = _NAME_LEN.unpack_from(view, pos)
+        pos += _NAME_LEN.size + name_len
+        spans.append(_SPAN.unpack_from(view, pos))
+        pos += _SPAN.size
+        if version == 2:
+            pos += _SOURCE_SPAN.size
+    (meta_len,) = _LENGTH.unpack_from(view, pos)
+    pos += _LENGTH.size
+    meta = _decompress(view[pos : pos + meta_len])
+    entries_start = pos + meta_len
+    return {
+        "file": meta["file"],
+        "functions": [
+            _decompress(view[entries_start + offset : entries_start + offset + length])
+            for offset, length in spans
+        ],
+        "call_graph": meta["call_graph"],
+    }
+
+
+site_file = sa.table(
+    "site_file",
+    sa.column("uuid", sa.String),
+    sa.column("parsed_map", sa.String),
+    sa.column("parsed_map_packed", sa.LargeBinary),
+)
+
+
+def _load(uuid, parsed_map):
+    try:
+        value = json.loads(parsed_map)
+        if isinstance(value, dict) and "file" in value and "functions" in value:
+            return value
+    except (TypeError, ValueError):
+        pass
+    logger.warning("site_file %s: parsed_map is not valid, packing it empty", uuid)
+    return EMPTY_PARSED_MAP
+
+
+def _unpack(uuid, packed):
+    try:
+        return unpack_parsed_map(packed)
+    except (TypeError, ValueError, struct.error, zlib.error):
+        logger.warning(
+            "site_file %s: parsed_map_packed is not valid, storing it empty", uuid
+        )
+        return EMPTY_PARSED_MAP
+
+
+def upgrade():
+    with op.batch_alter_table("site_file", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("parsed_map_packed", sa.LargeBinary(), nullable=True)
+        )
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(site_file.c.uuid, site_file.c.parsed_map))
+    for uuid, parsed_map in rows.fetchall():
+        connection.execute(
+            site_file.update()
+            .where(site_file.c.uuid == uuid)
+            .values(parsed_map_packed=pack_parsed_map(_load(uuid, parsed_map)))
+        )
+
+    with op.batch_alter_table("site_file", schema=None) as batch_op:
+        batch_op.alter_column(
+            "parsed_map_packed", existing_type=sa.LargeBinary(), nullable=False
+        )
+        batch_op.drop_column("parsed_map")
+
+
+def downgrade():
+    with op.batch_alter_table("site_file", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("parsed_map", sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(site_file.c.uuid, site_file.c.parsed_map_packed))
+    for uuid, packed in rows.fetchall():
+        connection.execute(
+            site_file.update()
+            .where(site_file.c.uuid == uuid)
+            .values(parsed_map=json.dumps(_unpack(uuid, packed)))
+        )
+
+    with op.batch_alter_table("site_file", schema=None) as batch_op:
+        batch_op.alter_column("parsed_map", existing_type=sa.String(), nullable=False)
+        batch_op.drop_column("parsed_map_packed")
@@ -5,11 +5,18 @@ import os
 import click
 
 from annotator import create_app, db
+from annotator.api.annotation.jobs import run_pending_jobs, start_workers
+from annotator.api.auth.purge import purge_expired_tokens
 from annotator.models.annotation import Annotation
+from annotator.models.annotation_job import AnnotationJob
 from annotator.models.file import File
 from annotator.models.token_blacklist import BlacklistedToken
 from annotator.models.user import User
 from annotator.models.liscense_key import LicenseKey
+from annotator.models.llm_usage import LLMUsage
+from annotator.models.parse_cache import ParseCache
+from annotator.models.project import Project
+from annotator.models.refresh_token import RefreshToken
 
 app = create_app(os.getenv("FLASK_ENV", "development"))
 
@@ -20,9 +27,14 @@ def shell():
         "db": db,
         "User": User,
         "BlacklistedToken": BlacklistedToken,
+        "RefreshToken": RefreshToken,
         "LicenseKey": LicenseKey,
         "File": File,
         "Annotation": Annotation,
+        "AnnotationJob": AnnotationJob,
+        "LLMUsage": LLMUsage,
+        "ParseCache": ParseCache,
+        "Project": Project,
     }
 
 
@@ -45,3 +57,35 @@ def add_user(email, admin, password):
     message = f"Successfully added new {user_type}:\n {new_user}"
     click.secho(message, fg="blue", bold=True)
     return 0
+
+
+@app.cli.command("annotation-worker", short_help="Run queued annotation jobs")
+@click.option("--workers", default=2, show_default=True, help="Worker threads")
+@click.option("--once", is_flag=True, default=False, help="Exit when the queue is empty")
+def annotation_worker(workers, once):
+    """Run annotation jobs from the queue table until interrupted."""
+    if once:
+        count = run_pending_jobs()
+        click.secho(f"Ran {count} annotation job(s)", fg="blue", bold=True)
+        return 0
+    click.secho(f"Running {workers} annotation worker(s)", fg="blue", bold=True)
+    pool = start_workers(app, workers)
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
+    return 0
+
+
+@app.cli.command("purge-tokens", short_help="Delete expired tokens")
+@click.option(
+    "--batch-size",
+    default=app.config["TOKEN_PURGE_BATCH_SIZE"],
+    show_default=True,
+    help="Rows deleted per transaction",
+)
+def purge_tokens(batch_size):
+    """Delete the token_blacklist and refresh_token rows of expired tokens."""
+    deleted = purge_expired_tokens(batch_size)
+    click.secho(f"Purged {deleted} expired token(s)", fg="blue", bold=True)
+    return 0
@@ -19,6 +19,8 @@ def create_app(config_name):
     app.config.from_object(get_config(config_name))
 
     from annotator.api import api_bp
+    from annotator.api.annotation import jobs
+    from annotator.api.auth import purge
 
     app.register_blueprint(api_bp)
 
@@ -26,4 +28,6 @@ def create_app(config_name):
     db.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
+    jobs.init_app(app)
+    purge.init_app(app)
     return app
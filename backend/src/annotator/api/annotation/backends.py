@@ -0,0 +1,43 @@
+"""LLM backends selectable with the LLM_BACKEND setting.
+
+A backend is a function taking the app config and returning a client with
+the openai chat.completions.create() interface, which the gateway wraps.
+"""
+
+from openai import AzureOpenAI
+
+from .stub import StubClient, parse_errors
+
+
+def azure_client(config):
+    # retries are done by the gateway, which also honours Retry-After
+    return AzureOpenAI(
+        api_version=config["AZURE_OPENAI_API_VERSION"],
+        azure_endpoint=config["AZURE_OPENAI_ENDPOINT"],
+        api_key=config["AZURE_OPENAI_KEY"],
+        max_retries=0,
+    )
+
+
+def stub_client(config):
+    return StubClient(
+        latency=config["LLM_STUB_LATENCY_SECONDS"],
+        latency_sigma=config["LLM_STUB_LATENCY_SIGMA"],
+        errors=parse_errors(config["LLM_STUB_ERRORS"]),
+        completion_tokens=config["LLM_STUB_COMPLETION_TOKENS"],
+        seed=config["LLM_STUB_SEED"],
+    )
+
+
+BACKENDS = {"azure": azure_client, "stub": stub_client}
+
+
+def create_client(config):
+    name = config["LLM_BACKEND"]
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown LLM_BACKEND {name!r}, expected one of {', '.join(BACKENDS)}"
+        ) from None
+    return backend(config)
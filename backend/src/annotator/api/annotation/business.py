@@ -2,22 +2,35 @@
 
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
 from uuid import uuid4
 
-from flask import current_app, jsonify
+from flask import Response, current_app, stream_with_context
+from flask_restx import abort
 
 from annotator import db
-from annotator.api.auth.decorators import token_required
+from annotator.api.auth.context import current_auth
+from annotator.api.auth.decorators import token_required, admin_token_required
 from annotator.models.file import File
 from annotator.models.annotation import Annotation
+from annotator.models.annotation_job import AnnotationJob
+from annotator.models.llm_usage import LLMUsage
 
-from annotator.api.annotation.util import chat
+from annotator.api.annotation.coalesce import coalesced_annotation
+from annotator.api.annotation.context import build_context, build_summary_context
+from annotator.api.annotation.gateway import LLMError
+from annotator.api.annotation.hierarchy import annotate_bottom_up
+from annotator.api.annotation.metrics import get_metrics, llm_call
+from annotator.api.annotation.util import chat, chat_stream
+
+# Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 @token_required
 def get_annotation(file_uuid):
     annotation_list_raw = Annotation.find_by_file_id(file_uuid)
-    print(annotation_list_raw)
     annotation_list_processed = []
     for element in annotation_list_raw:
         annotation_list_processed.append(element.as_dict())
@@ -27,47 +40,364 @@ def get_annotation(file_uuid):
 
 
 @token_required
-def get_parsed_map(file_uuid):
-    file = File.find_by_uuid(file_uuid)
-    parsed_map = file.parsed_map
-    return parsed_map
+def annotate(file_uuid, function_name="hello_world", use_cache=True):
+    owner_id = current_auth().public_id
+    file = _find_owned_file(file_uuid, owner_id, with_parsed_map=True)
+    # read now: the commits made while coalescing expire file
+    parsed_map, function_code = _prompt_inputs(file, function_name)
+
+    def new_annotation():
+        text = _complete(
+            owner_id, file_uuid, function_name, parsed_map, function_code, use_cache
+        )
+        annotation = Annotation(
+            uuid=str(uuid4()),
+            annotation=text,
+            function_name=function_name,
+            file_id=file_uuid,
+            owner_id=owner_id,
+        )
+        db.session.add(annotation)
+        return annotation
+
+    # concurrent requests for this function share one model call and one row
+    try:
+        uuid = coalesced_annotation(file_uuid, function_name, new_annotation)
+    except LLMError as e:
+        abort(e.status, e.message, status="fail")
+    return Annotation.find_by_uuid(uuid).as_dict()
 
 
 @token_required
-def get_owner_id(file_uuid):
-    file = File.find_by_uuid(file_uuid)
-    owner_id = file.owner_id
-    return owner_id
+def annotate_file(file_uuid, function_names=None, use_cache=True, hierarchical=False):
+    owner_id = current_auth().public_id
+    file = _find_owned_file(file_uuid, owner_id, with_parsed_map=True)
+    packed_map = file.packed_map()
+    file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], file_uuid)
+    # a name defined twice is annotated once (its last definition)
+    names = list(dict.fromkeys(function_names or packed_map.names()))
+
+    errors = []
+    jobs = {}
+    for name in names:
+        function = packed_map.function(name)
+        if function is None:
+            errors.append(dict(function_name=name, error="Function not found in file."))
+            continue
+        jobs[name] = _read_function_code(
+            file_path, function, packed_map.source_span(name)
+        )
+
+    results = {}
+    if jobs:
+        app = current_app._get_current_object()
+        workers = min(current_app.config["ANNOTATION_BATCH_CONCURRENCY"], len(jobs))
+        if hierarchical:
+            results, failures = _annotate_bottom_up(
+                app, owner_id, file_uuid, packed_map, jobs, workers, use_cache
+            )
+        else:
+            contexts = {
+                name: _prompt_context(packed_map, file_uuid, name) for name in jobs
+            }
+            results, failures = _annotate_independently(
+                app, owner_id, file_uuid, contexts, jobs, workers, use_cache
+            )
+        for name in jobs:
+            if name not in failures:
+                continue
+            e = failures[name]
+            if isinstance(e, LLMError):
+                errors.append(dict(function_name=name, error=e.message))
+            else:
+                current_app.logger.error(
+                    "annotating %s failed", name, exc_info=(type(e), e, e.__traceback__)
+                )
+                errors.append(dict(function_name=name, error="Annotation failed."))
+
+    new_annotations = [
+        Annotation(
+            uuid=str(uuid4()),
+            annotation=results[name],
+            function_name=name,
+            file_id=file_uuid,
+            owner_id=owner_id,
+        )
+        for name in names
+        if name in results
+    ]
+    db.session.add_all(new_annotations)
+    db.session.commit()
+    return dict(
+        file_id=file_uuid,
+        annotations=[annotation.as_dict() for annotation in new_annotations],
+        errors=errors,
+    )
 
 
 @token_required
-def annotate(file_uuid, function_name="hello_world"):
-    owner_id = get_owner_id(file_uuid)
-    parsed_map = get_parsed_map(file_uuid)
-    json_parsed_map = json.loads(parsed_map)
-    start_line = 0
-    end_line = 0
-    for function in json_parsed_map["functions"]:
-        if function["name"] == function_name:
-            start_line = function["start_line"]
-            end_line = function["end_line"]
-    function_code = ""
-    f = open(os.path.join(current_app.config["UPLOAD_FOLDER"], file_uuid))
-    for line_no, line in enumerate(f):
-        if line_no >= start_line - 1:
-            function_code += line
-        if line_no >= end_line - 1:
-            break
-    f.close()
-    annotation = chat(function_name, parsed_map, function_code)
-    uuid = str(uuid4())
-    new_annotation = Annotation(
-        uuid=uuid,
-        annotation=annotation,
+def create_annotation_job(file_uuid, function_name, use_cache=True):
+    owner_id = current_auth().public_id
+    _find_owned_file(file_uuid, owner_id)
+    job = AnnotationJob(
+        file_id=file_uuid,
+        owner_id=owner_id,
+        function_name=function_name,
+        use_cache=use_cache,
+    )
+    db.session.add(job)
+    db.session.commit()
+    workers = current_app.extensions.get("annotation_workers")
+    if workers is not None:
+        workers.wake()
+    return job.as_dict(), HTTPStatus.ACCEPTED
+
+
+@token_required
+def get_annotation_job(job_id):
+    job = AnnotationJob.find_by_uuid(job_id)
+    if not job or job.owner_id != current_auth().public_id:
+        abort(HTTPStatus.NOT_FOUND, "Annotation job not found", status="fail")
+    return job.as_dict()
+
+
+@token_required
+def stream_annotation(file_uuid, function_name, use_cache=True):
+    owner_id = current_auth().public_id
+    file = _find_owned_file(file_uuid, owner_id, with_parsed_map=True)
+    parsed_map, function_code = _prompt_inputs(file, function_name)
+    events = _annotation_events(
+        file_uuid, owner_id, function_name, parsed_map, function_code, use_cache
+    )
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        # let reverse proxies pass every event through as soon as it is sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@admin_token_required
+def get_llm_metrics():
+    return Response(get_metrics().render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@admin_token_required
+def get_llm_usage(sort="tokens", limit=20):
+    """Persisted LLM usage totals of the users and files that cost the most
+    tokens (sort="tokens") or had the slowest calls (sort="latency")."""
+    tokens = LLMUsage.prompt_tokens + LLMUsage.completion_tokens
+    if sort == "latency":
+        user_order = db.func.max(LLMUsage.latency_ms_max)
+        file_order = LLMUsage.latency_ms_max
+    else:
+        user_order = db.func.sum(tokens)
+        file_order = tokens
+    users = (
+        db.session.query(
+            LLMUsage.owner_id,
+            db.func.count(LLMUsage.file_id).label("files"),
+            db.func.sum(LLMUsage.calls).label("calls"),
+            db.func.sum(LLMUsage.cache_hits).label("cache_hits"),
+            db.func.sum(LLMUsage.errors).label("errors"),
+            db.func.sum(LLMUsage.retries).label("retries"),
+            db.func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+            db.func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+            db.func.sum(LLMUsage.latency_ms_total).label("latency_ms_total"),
+            db.func.max(LLMUsage.latency_ms_max).label("latency_ms_max"),
+        )
+        .group_by(LLMUsage.owner_id)
+        .order_by(user_order.desc())
+        .limit(limit)
+        .all()
+    )
+    files = LLMUsage.query.order_by(file_order.desc()).limit(limit).all()
+    return dict(
+        users=[_user_usage(row._asdict()) for row in users],
+        files=[usage.as_dict() for usage in files],
+    )
+
+
+def generate_annotation(file, function_name, use_cache=True):
+    """Ask the model to annotate function_name of file; raises LLMError."""
+    parsed_map, function_code = _prompt_inputs(file, function_name)
+    return _complete(
+        file.owner_id, file.uuid, function_name, parsed_map, function_code, use_cache
+    )
+
+
+def _find_owned_file(file_uuid, owner_id, with_parsed_map=False):
+    file = File.find_by_uuid(file_uuid, with_parsed_map=with_parsed_map)
+    if not file:
+        abort(HTTPStatus.NOT_FOUND, "File not found", status="fail")
+    if file.owner_id != owner_id:
+        abort(
+            HTTPStatus.UNAUTHORIZED, "File does not belong to this user.", status="fail"
+        )
+    return file
+
+
+def _prompt_inputs(file, function_name):
+    """parsed_map context and function source that go into the prompt."""
+    packed_map = file.packed_map()
+    function_code = _read_function_code(
+        os.path.join(current_app.config["UPLOAD_FOLDER"], file.uuid),
+        packed_map.function(function_name),
+        packed_map.source_span(function_name),
+    )
+    return _prompt_context(packed_map, file.uuid, function_name), function_code
+
+
+def _prompt_context(packed_map, file_uuid, function_name):
+    """JSON of the call-graph neighbourhood of function_name for its prompt."""
+    config = current_app.config
+    context = build_context(
+        packed_map,
+        function_name,
+        hops=config["PROMPT_CONTEXT_HOPS"],
+        token_budget=config["PROMPT_CONTEXT_TOKEN_BUDGET"],
+    )
+    current_app.logger.info(
+        "prompt context for %s in %s: %d functions, ~%d tokens (~%d saved of ~%d)%s",
+        function_name,
+        file_uuid,
+        len(context.functions),
+        context.tokens,
+        context.saved_tokens,
+        context.full_tokens,
+        ", truncated to budget" if context.truncated else "",
+    )
+    return context.json
+
+
+def _chat_in_app_context(
+    app, owner_id, file_uuid, function_name, parsed_map, function_code, use_cache
+):
+    with app.app_context():
+        return _complete(
+            owner_id, file_uuid, function_name, parsed_map, function_code, use_cache
+        )
+
+
+def _complete(owner_id, file_uuid, function_name, parsed_map, function_code, use_cache):
+    with llm_call(owner_id, file_uuid) as stats:
+        return chat(
+            function_name, parsed_map, function_code, use_cache=use_cache, stats=stats
+        )
+
+
+def _annotate_independently(
+    app, owner_id, file_uuid, contexts, jobs, workers, use_cache
+):
+    """Annotate every function of jobs in parallel, each with its own prompt
+    context from contexts."""
+    results = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            name: executor.submit(
+                _chat_in_app_context,
+                app,
+                owner_id,
+                file_uuid,
+                name,
+                contexts[name],
+                code,
+                use_cache,
+            )
+            for name, code in jobs.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                failures[name] = e
+    return results, failures
+
+
+def _annotate_bottom_up(app, owner_id, file_uuid, packed_map, jobs, workers, use_cache):
+    """Annotate the functions of jobs callees first; the prompt of a caller has
+    the summaries of its annotated callees instead of their parsed_map entries."""
+    config = app.config
+
+    def annotate_one(name, summaries):
+        context = build_summary_context(
+            packed_map,
+            name,
+            summaries,
+            token_budget=config["PROMPT_CONTEXT_TOKEN_BUDGET"],
+        )
+        return _chat_in_app_context(
+            app, owner_id, file_uuid, name, context.json, jobs[name], use_cache
+        )
+
+    return annotate_bottom_up(
+        packed_map.meta()["call_graph"],
+        list(jobs),
+        annotate_one,
+        workers,
+        summary_chars=config["ANNOTATION_SUMMARY_CHARS"],
+    )
+
+
+def _user_usage(totals):
+    calls = totals["calls"]
+    totals["latency_ms_mean"] = totals.pop("latency_ms_total") / calls if calls else 0
+    return totals
+
+
+def _annotation_events(
+    file_uuid, owner_id, function_name, parsed_map, function_code, use_cache
+):
+    """Server-sent events: one "token" per piece of text, then "done" with the
+    stored annotation, or "error" if the model call failed."""
+    pieces = []
+    try:
+        with llm_call(owner_id, file_uuid) as stats:
+            for piece in chat_stream(
+                function_name,
+                parsed_map,
+                function_code,
+                use_cache=use_cache,
+                stats=stats,
+            ):
+                pieces.append(piece)
+                yield _sse("token", dict(text=piece))
+    except LLMError as e:
+        yield _sse("error", dict(message=e.message, status=int(e.status)))
+        return
+    annotation = Annotation(
+        uuid=str(uuid4()),
+        annotation="".join(pieces),
         function_name=function_name,
         file_id=file_uuid,
         owner_id=owner_id,
     )
-    db.session.add(new_annotation)
+    db.session.add(annotation)
     db.session.commit()
-    return Annotation.find_by_uuid(uuid).as_dict()
+    yield _sse("done", annotation.as_dict())
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _read_function_code(file_path, function, span):
+    if span is not None:
+        start, end = span
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            code = f.read(end - start).decode("utf-8")
+        # same text as reading the file in text mode (universal newlines)
+        return code.replace("\r\n", "\n").replace("\r", "\n")
+    # files stored before byte ranges were indexed: scan up to the function
+    start_line = function["start_line"] if function else 0
+    end_line = function["end_line"] if function else 0
+    function_code = ""
+    with open(file_path) as f:
+        for line_no, line in enumerate(f):
+            if line_no >= start_line - 1:
+                function_code += line
+            if line_no >= end_line - 1:
+                break
+    return function_code
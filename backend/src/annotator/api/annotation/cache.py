@@ -0,0 +1,50 @@
+"""In-process cache of generated annotations keyed by a fingerprint of the prompt."""
+
+import hashlib
+import json
+
+from flask import current_app
+
+from annotator.util.cache import LRUCache
+
+
+def annotation_key(model, deployment, messages, options):
+    """SHA-256 over everything sent to the model.
+
+    messages carry the system prompt, the function code and the parsed_map
+    context given to the model, so a change to any of them (or to the model,
+    deployment or sampling options) gives a new key.
+    """
+    fingerprint = json.dumps(
+        {
+            "model": model,
+            "deployment": deployment,
+            "messages": messages,
+            "options": options,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def get_cached_annotation(key):
+    """Return the annotation stored for key, or None on a miss or expired entry."""
+    return _memory_cache().get(key)
+
+
+def store_annotation(key, annotation):
+    _memory_cache().set(key, annotation)
+
+
+def _memory_cache():
+    cache = current_app.extensions.get("annotation_cache")
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault(
+            "annotation_cache",
+            LRUCache(
+                config.get("ANNOTATION_CACHE_SIZE"),
+                ttl=config.get("ANNOTATION_CACHE_TTL_SECONDS") or None,
+            ),
+        )
+    return cache
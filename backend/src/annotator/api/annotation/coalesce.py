@@ -0,0 +1,97 @@
+"""Coalesce concurrent requests to annotate the same function into one model call.
+
+Within a process, requests for the same (file, function) wait on one
+SingleFlight call. Across processes, the thread running that call must also
+hold the function's AnnotationFlight row; a process that finds the row held
+by another one polls it until the annotation id is published there.
+"""
+
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import current_app
+
+from annotator import db
+from annotator.models.annotation_flight import AnnotationFlight
+from annotator.util.datetime_util import utc_now
+from annotator.util.singleflight import SingleFlight
+
+
+def coalesced_annotation(file_id, function_name, generate):
+    """Return the uuid of an Annotation of function_name made for this request
+    or for a concurrent identical one.
+
+    generate() must add a new Annotation to the session without committing and
+    return it; it is only called when no other request is generating one. If
+    it raises, requests waiting in this process get the same error, while
+    requests waiting in other processes try again themselves.
+    """
+    return _flights().do(
+        (file_id, function_name),
+        lambda: _across_processes(file_id, function_name, generate),
+    )
+
+
+def _flights():
+    flights = current_app.extensions.get("annotation_flights")
+    if flights is None:
+        flights = current_app.extensions.setdefault("annotation_flights", SingleFlight())
+    return flights
+
+
+def _across_processes(file_id, function_name, generate):
+    config = current_app.config
+    lease = timedelta(seconds=config["ANNOTATION_FLIGHT_LEASE_SECONDS"])
+    poll = config["ANNOTATION_FLIGHT_POLL_SECONDS"]
+    token = str(uuid4())
+    while True:
+        if AnnotationFlight.acquire(file_id, function_name, token, utc_now() + lease):
+            return _lead(file_id, function_name, token, generate)
+        annotation_id = _follow(file_id, function_name, poll)
+        if annotation_id is not None:
+            return annotation_id
+
+
+def _lead(file_id, function_name, token, generate):
+    try:
+        annotation = generate()
+    except BaseException:
+        db.session.rollback()
+        AnnotationFlight.release(file_id, function_name, token)
+        raise
+    # published in the same transaction that stores the annotation
+    AnnotationFlight.complete(file_id, function_name, token, annotation.uuid)
+    db.session.commit()
+    return annotation.uuid
+
+
+def _follow(file_id, function_name, poll):
+    """Wait for the flight that holds the marker now; the annotation id it
+    published, or None when it gave up or its lease ran out."""
+    token = None
+    while True:
+        flight = _poll_flight(file_id, function_name)
+        if flight is None or token not in (None, flight.token):
+            return None
+        token = flight.token
+        if flight.annotation_id is not None:
+            return flight.annotation_id
+        if flight.expired:
+            return None
+        time.sleep(poll)
+
+
+def _poll_flight(file_id, function_name):
+    flight = (
+        db.session.query(
+            AnnotationFlight.token,
+            AnnotationFlight.annotation_id,
+            (AnnotationFlight.locked_until < utc_now()).label("expired"),
+        )
+        .filter_by(file_id=file_id, function_name=function_name)
+        .first()
+    )
+    # end the read transaction so the next poll sees other commits
+    db.session.commit()
+    return flight
@@ -0,0 +1,144 @@
+"""Build the parsed_map context of a prompt from the target's call-graph neighbourhood."""
+
+import json
+import math
+from collections import deque, namedtuple
+
+# rough size of a token for English text and code; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+class PromptContext(
+    namedtuple(
+        "PromptContext", ["json", "functions", "tokens", "full_tokens", "truncated"]
+    )
+):
+    """Context JSON for one prompt and its estimated size in tokens, next to
+    the size the whole parsed_map would have taken."""
+
+    __slots__ = ()
+
+    @property
+    def saved_tokens(self):
+        return max(self.full_tokens - self.tokens, 0)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def build_context(packed_map, function_name, hops=2, token_budget=None):
+    """Return a PromptContext holding the part of a parsed_map relevant to one function.
+
+    The context keeps the file metadata, the entry of function_name and the
+    entries of the functions within hops call-graph edges of it (callers and
+    callees), nearest first, as long as the JSON fits in token_budget tokens.
+    Only the entries that are used are decoded from packed_map.
+    """
+    meta = packed_map.meta()
+    call_graph = meta["call_graph"]
+    distances = _neighbourhood(call_graph, function_name, hops)
+
+    target = packed_map.function(function_name)
+    context = {"file": meta["file"], "function": target, "neighbours": []}
+    budget_chars = token_budget * CHARS_PER_TOKEN if token_budget else None
+    used = len(_dumps(context, call_graph))
+    truncated = False
+    for name, distance in distances:
+        entry = packed_map.function(name)
+        if entry is None:
+            continue
+        neighbour = dict(entry, distance=distance)
+        # the entry, its separator and a call_graph row of similar size as its name
+        size = len(json.dumps(neighbour)) + 2 + 2 * len(name) + 8
+        if budget_chars is not None and used + size > budget_chars:
+            truncated = True
+            break
+        context["neighbours"].append(neighbour)
+        used += size
+    text = _dumps(context, call_graph)
+    while (
+        budget_chars is not None and len(text) > budget_chars and context["neighbours"]
+    ):
+        # the estimate above was short; drop the farthest neighbours until it fits
+        context["neighbours"].pop()
+        truncated = True
+        text = _dumps(context, call_graph)
+
+    full_tokens = math.ceil(packed_map.json_size() / CHARS_PER_TOKEN)
+    return PromptContext(
+        json=text,
+        functions=[function_name] + [n["name"] for n in context["neighbours"]],
+        tokens=estimate_tokens(text),
+        full_tokens=full_tokens,
+        truncated=truncated,
+    )
+
+
+def build_summary_context(packed_map, function_name, summaries, token_budget=None):
+    """Return a PromptContext for bottom-up annotation of function_name.
+
+    The context keeps the file metadata, the entry of function_name and its
+    direct callees: the ones in summaries as {"name", "summary"}, the others
+    (not annotated yet, or failed) as their raw entry, as long as the JSON
+    fits in token_budget tokens.
+    """
+    meta = packed_map.meta()
+    target = packed_map.function(function_name)
+    context = {"file": meta["file"], "function": target, "callees": []}
+    budget_chars = token_budget * CHARS_PER_TOKEN if token_budget else None
+    used = len(json.dumps(context))
+    truncated = False
+    for name in meta["call_graph"].get(function_name, []):
+        if name in summaries:
+            callee = {"name": name, "summary": summaries[name]}
+        else:
+            callee = packed_map.function(name)
+            if callee is None:
+                continue
+        size = len(json.dumps(callee)) + 2
+        if budget_chars is not None and used + size > budget_chars:
+            truncated = True
+            break
+        context["callees"].append(callee)
+        used += size
+    text = json.dumps(context)
+    return PromptContext(
+        json=text,
+        functions=[function_name] + [c["name"] for c in context["callees"]],
+        tokens=estimate_tokens(text),
+        full_tokens=math.ceil(packed_map.json_size() / CHARS_PER_TOKEN),
+        truncated=truncated,
+    )
+
+
+def _neighbourhood(call_graph, function_name, hops):
+    """(name, distance) of the functions within hops edges, in BFS order."""
+    callers = {}
+    for caller, callees in call_graph.items():
+        for callee in callees:
+            callers.setdefault(callee, []).append(caller)
+    seen = {function_name}
+    found = []
+    queue = deque([(function_name, 0)])
+    while queue:
+        name, distance = queue.popleft()
+        if distance == hops:
+            continue
+        for neighbour in call_graph.get(name, []) + callers.get(name, []):
+            if neighbour not in seen:
+                seen.add(neighbour)
+                found.append((neighbour, distance + 1))
+                queue.append((neighbour, distance + 1))
+    return found
+
+
+def _dumps(context, call_graph):
+    names = {context["function"]["name"]} if context["function"] else set()
+    names.update(n["name"] for n in context["neighbours"])
+    # call graph edges between the functions that made it into the context
+    edges = {
+        name: [callee for callee in call_graph.get(name, []) if callee in names]
+        for name in sorted(names)
+    }
+    return json.dumps(dict(context, call_graph=edges))
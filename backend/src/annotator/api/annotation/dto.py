@@ -1,4 +1,4 @@
-from flask_restx import Model, fields
+from flask_restx import Model, fields, inputs
 from flask_restx.reqparse import RequestParser
 from werkzeug.datastructures import FileStorage
 
@@ -10,6 +10,43 @@ annotation_generator_parser.add_argument(
 annotation_generator_parser.add_argument(
     name="file_uuid", type=str, location="form", required=True, nullable=False
 )
+annotation_generator_parser.add_argument(
+    name="no_cache",
+    type=inputs.boolean,
+    location="form",
+    required=False,
+    default=False,
+    help="Skip the annotation cache and always call the model.",
+)
+
+annotation_batch_parser = RequestParser(bundle_errors=True)
+annotation_batch_parser.add_argument(
+    name="file_uuid", type=str, location="form", required=True, nullable=False
+)
+annotation_batch_parser.add_argument(
+    name="function_name",
+    type=str,
+    location="form",
+    action="append",
+    required=False,
+    help="Functions to annotate (repeat the field); all functions if omitted.",
+)
+annotation_batch_parser.add_argument(
+    name="no_cache",
+    type=inputs.boolean,
+    location="form",
+    required=False,
+    default=False,
+    help="Skip the annotation cache and always call the model.",
+)
+annotation_batch_parser.add_argument(
+    name="hierarchical",
+    type=inputs.boolean,
+    location="form",
+    required=False,
+    default=False,
+    help="Annotate callees first and give callers their summaries.",
+)
 
 
 annotation_getter = RequestParser(bundle_errors=True)
@@ -36,3 +73,83 @@ annotation_info_list_model = Model(
         "info": fields.List(fields.Nested(annotation_info_model)),
     },
 )
+
+annotation_error_model = Model(
+    "AnnotationError",
+    {
+        "function_name": fields.String,
+        "error": fields.String,
+    },
+)
+
+annotation_batch_model = Model(
+    "AnnotationBatchResponse",
+    {
+        "file_id": fields.String,
+        "annotations": fields.List(fields.Nested(annotation_info_model)),
+        "errors": fields.List(fields.Nested(annotation_error_model)),
+    },
+)
+
+annotation_job_model = Model(
+    "AnnotationJobResponse",
+    {
+        "job_id": fields.String,
+        "status": fields.String,
+        "file_id": fields.String,
+        "function_name": fields.String,
+        "attempts": fields.Integer,
+        "error": fields.String,
+        "created_at": fields.String,
+        "started_at": fields.String,
+        "finished_at": fields.String,
+        "annotation": fields.Nested(annotation_info_model, allow_null=True),
+    },
+)
+
+llm_usage_parser = RequestParser(bundle_errors=True)
+llm_usage_parser.add_argument(
+    name="sort",
+    type=str,
+    location="args",
+    choices=("tokens", "latency"),
+    required=False,
+    default="tokens",
+    help="Rank by total tokens or by the slowest call.",
+)
+llm_usage_parser.add_argument(
+    name="limit",
+    type=inputs.positive,
+    location="args",
+    required=False,
+    default=20,
+)
+
+llm_usage_fields = {
+    "owner_id": fields.String,
+    "calls": fields.Integer,
+    "cache_hits": fields.Integer,
+    "errors": fields.Integer,
+    "retries": fields.Integer,
+    "prompt_tokens": fields.Integer,
+    "completion_tokens": fields.Integer,
+    "latency_ms_mean": fields.Float,
+    "latency_ms_max": fields.Integer,
+}
+
+llm_user_usage_model = Model(
+    "LLMUserUsage", dict(llm_usage_fields, files=fields.Integer)
+)
+
+llm_file_usage_model = Model(
+    "LLMFileUsage",
+    dict(llm_usage_fields, file_id=fields.String, updated_at=fields.String),
+)
+
+llm_usage_model = Model(
+    "LLMUsageResponse",
+    {
+        "users": fields.List(fields.Nested(llm_user_usage_model)),
+        "files": fields.List(fields.Nested(llm_file_usage_model)),
+    },
+)
@@ -1,21 +1,43 @@
 """API endpoint definitions for /annotation namespace."""
 
+from http import HTTPStatus
+
 from flask_restx import Namespace, Resource
 
 from annotator.api.annotation.business import (
     get_annotation,
     annotate,
+    annotate_file,
+    create_annotation_job,
+    get_annotation_job,
+    stream_annotation,
+    get_llm_metrics,
+    get_llm_usage,
 )
 
 from annotator.api.annotation.dto import (
     annotation_generator_parser,
+    annotation_batch_parser,
     annotation_info_model,
     annotation_info_list_model,
+    annotation_error_model,
+    annotation_batch_model,
+    annotation_job_model,
+    llm_usage_parser,
+    llm_user_usage_model,
+    llm_file_usage_model,
+    llm_usage_model,
 )
 
 annotation_ns = Namespace(name="annotation", validate=True)
 annotation_ns.models[annotation_info_model.name] = annotation_info_model
 annotation_ns.models[annotation_info_list_model.name] = annotation_info_list_model
+annotation_ns.models[annotation_error_model.name] = annotation_error_model
+annotation_ns.models[annotation_batch_model.name] = annotation_batch_model
+annotation_ns.models[annotation_job_model.name] = annotation_job_model
+annotation_ns.models[llm_user_usage_model.name] = llm_user_usage_model
+annotation_ns.models[llm_file_usage_model.name] = llm_file_usage_model
+annotation_ns.models[llm_usage_model.name] = llm_usage_model
 
 
 @annotation_ns.route("/generate", endpoint="annotation_generate")
@@ -30,7 +52,8 @@ class Annotate(Resource):
         request_data = annotation_generator_parser.parse_args()
         file_uuid = request_data["file_uuid"]
         function_name = request_data["function_name"]
-        return annotate(file_uuid, function_name)
+        use_cache = not request_data["no_cache"]
+        return annotate(file_uuid, function_name, use_cache=use_cache)
 
     # @annotation_ns.doc(security="Bearer")
     # def post(self):
@@ -38,6 +61,102 @@ class Annotate(Resource):
     #     return annotate()
 
 
+@annotation_ns.route("/generate/stream", endpoint="annotation_generate_stream")
+class AnnotateStream(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/generate/stream"""
+
+    @annotation_ns.expect(annotation_generator_parser)
+    @annotation_ns.produces(["text/event-stream"])
+    @annotation_ns.doc(security="Bearer")
+    def post(self):
+        """Stream the annotation as server-sent events while it is generated"""
+        request_data = annotation_generator_parser.parse_args()
+        return stream_annotation(
+            request_data["file_uuid"],
+            request_data["function_name"],
+            use_cache=not request_data["no_cache"],
+        )
+
+
+@annotation_ns.route("/generate/batch", endpoint="annotation_generate_batch")
+class AnnotateFile(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/generate/batch"""
+
+    @annotation_ns.expect(annotation_batch_parser)
+    @annotation_ns.marshal_with(annotation_batch_model)
+    @annotation_ns.doc(security="Bearer")
+    def post(self):
+        """Annotate all (or the selected) functions of a file"""
+        request_data = annotation_batch_parser.parse_args()
+        return annotate_file(
+            request_data["file_uuid"],
+            request_data["function_name"],
+            use_cache=not request_data["no_cache"],
+            hierarchical=request_data["hierarchical"],
+        )
+
+
+@annotation_ns.route("/jobs", endpoint="annotation_jobs")
+class AnnotationJobs(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/jobs"""
+
+    @annotation_ns.expect(annotation_generator_parser)
+    @annotation_ns.marshal_with(annotation_job_model, code=HTTPStatus.ACCEPTED)
+    @annotation_ns.response(int(HTTPStatus.ACCEPTED), "Annotation job was queued.")
+    @annotation_ns.response(int(HTTPStatus.NOT_FOUND), "File not found.")
+    @annotation_ns.doc(security="Bearer")
+    def post(self):
+        """Queue an annotation job; poll /jobs/<job_id> for the result"""
+        request_data = annotation_generator_parser.parse_args()
+        return create_annotation_job(
+            request_data["file_uuid"],
+            request_data["function_name"],
+            use_cache=not request_data["no_cache"],
+        )
+
+
+@annotation_ns.route("/jobs/<job_id>", endpoint="annotation_job")
+@annotation_ns.param("job_id", "Annotation job id.")
+class GetAnnotationJob(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/jobs/<job_id>"""
+
+    @annotation_ns.marshal_with(annotation_job_model)
+    @annotation_ns.response(int(HTTPStatus.NOT_FOUND), "Annotation job not found.")
+    @annotation_ns.doc(security="Bearer")
+    def get(self, job_id):
+        """Status of an annotation job, with the annotation once it is done"""
+        return get_annotation_job(job_id)
+
+
+@annotation_ns.route("/metrics", endpoint="annotation_metrics")
+class GetLLMMetrics(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/metrics"""
+
+    @annotation_ns.produces(["text/plain"])
+    @annotation_ns.response(int(HTTPStatus.OK), "Metrics in Prometheus text format.")
+    @annotation_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
+    @annotation_ns.response(int(HTTPStatus.FORBIDDEN), "Administrator token required.")
+    @annotation_ns.doc(security="Bearer")
+    def get(self):
+        """Admin: latency, token and cache histograms of the LLM calls of this process"""
+        return get_llm_metrics()
+
+
+@annotation_ns.route("/usage", endpoint="annotation_usage")
+class GetLLMUsage(Resource):
+    """Handles HTTP requests to URL: /api/v1/annotation/usage"""
+
+    @annotation_ns.expect(llm_usage_parser)
+    @annotation_ns.marshal_with(llm_usage_model)
+    @annotation_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
+    @annotation_ns.response(int(HTTPStatus.FORBIDDEN), "Administrator token required.")
+    @annotation_ns.doc(security="Bearer")
+    def get(self):
+        """Admin: persisted LLM usage of the users and files that cost the most"""
+        request_data = llm_usage_parser.parse_args()
+        return get_llm_usage(request_data["sort"], request_data["limit"])
+
+
 @annotation_ns.route("/<file_uuid>", endpoint="annotation_get")
 @annotation_ns.param("file_uuid", "File UUID.")
 class GetAnnotation(Resource):
@@ -0,0 +1,208 @@
+"""Shared LLM client with a concurrency limit, retries and per-call timeouts."""
+
+import email.utils
+import random
+import threading
+import time
+from http import HTTPStatus
+
+import openai
+from flask import current_app
+
+BUSY_ERROR = "Annotation service is busy, please try again later."
+UNAVAILABLE_ERROR = "Annotation service is unavailable, please try again later."
+REJECTED_ERROR = "Annotation service rejected the request."
+
+# 408 / 409 / 429 and 5xx responses are worth another attempt
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMError(Exception):
+    """Raised when a completion could not be obtained; carries the HTTP status
+    the API should answer with."""
+
+    def __init__(self, message, status=HTTPStatus.SERVICE_UNAVAILABLE):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_gateway(client_factory):
+    """Return the app's LLMGateway, creating it (and its client) on first use."""
+    gateway = current_app.extensions.get("llm_gateway")
+    if gateway is None:
+        config = current_app.config
+        gateway = current_app.extensions.setdefault(
+            "llm_gateway",
+            LLMGateway(
+                client_factory,
+                max_in_flight=config.get("LLM_MAX_IN_FLIGHT"),
+                queue_timeout=config.get("LLM_QUEUE_TIMEOUT_SECONDS"),
+                timeout=config.get("LLM_TIMEOUT_SECONDS"),
+                max_retries=config.get("LLM_MAX_RETRIES"),
+                backoff_base=config.get("LLM_BACKOFF_BASE_SECONDS"),
+                backoff_max=config.get("LLM_BACKOFF_MAX_SECONDS"),
+            ),
+        )
+    return gateway
+
+
+class LLMGateway:
+    """Send chat completions through one pooled client.
+
+    At most max_in_flight requests are sent at once; callers wait up to
+    queue_timeout seconds for a slot. Connection errors, timeouts, 429 and 5xx
+    responses are retried up to max_retries times with full-jitter exponential
+    backoff, or after the delay asked for by a Retry-After header. A slot is
+    only held while a request is on the wire, not while backing off.
+
+    When a CallStats is passed as stats, the retries and the tokens reported
+    by the service are added to it.
+    """
+
+    def __init__(
+        self,
+        client_factory,
+        max_in_flight=8,
+        queue_timeout=30,
+        timeout=60,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=20,
+        sleep=time.sleep,
+        jitter=random.random,
+    ):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._sleep = sleep
+        self._jitter = jitter
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def complete(self, stats=None, **request):
+        """Call chat.completions.create(**request) and return the response."""
+        response = self._retrying(lambda: self._send(request), stats)
+        if stats is not None:
+            stats.add_usage(response.usage)
+        return response
+
+    def stream(self, stats=None, **request):
+        """Stream a completion and yield its text deltas as they arrive.
+
+        Failures before the first chunk are retried like complete(); once text
+        was yielded an error cannot be retried and raises LLMError. The slot is
+        held until the stream is exhausted or closed.
+        """
+        response = self._retrying(lambda: self._open_stream(request), stats)
+        try:
+            with response:
+                for chunk in response:
+                    if stats is not None:
+                        # only the last chunk reports usage
+                        stats.add_usage(chunk.usage)
+                    # Azure sends chunks without choices (content filter results)
+                    for choice in chunk.choices:
+                        if choice.delta is not None and choice.delta.content:
+                            yield choice.delta.content
+        except openai.APIError as e:
+            raise LLMError(UNAVAILABLE_ERROR) from e
+        finally:
+            self._slots.release()
+
+    def _retrying(self, send, stats=None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return send()
+            except LLMError:
+                raise
+            except openai.APIStatusError as e:
+                if not _is_retryable(e.status_code):
+                    raise LLMError(REJECTED_ERROR, HTTPStatus.BAD_GATEWAY) from e
+                delay = self._backoff(attempt, _retry_after(e.response.headers))
+                error = e
+            except openai.APIConnectionError as e:
+                # includes APITimeoutError
+                delay = self._backoff(attempt)
+                error = e
+            if attempt == self.max_retries or delay is None:
+                break
+            self._sleep(delay)
+            if stats is not None:
+                stats.retries += 1
+        raise LLMError(UNAVAILABLE_ERROR) from error
+
+    def _send(self, request):
+        self._acquire()
+        try:
+            return self.client.chat.completions.create(timeout=self.timeout, **request)
+        finally:
+            self._slots.release()
+
+    def _open_stream(self, request):
+        """Start a streamed completion; on success the caller releases the slot."""
+        self._acquire()
+        try:
+            return self.client.chat.completions.create(
+                timeout=self.timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+                **request,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMError(BUSY_ERROR)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds to wait before the next attempt (None: do not retry).
+
+        A Retry-After longer than backoff_max is not worth holding a request
+        thread for, so the call fails instead.
+        """
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                return None
+            return retry_after + self._jitter() * self.backoff_base
+        return self._jitter() * min(self.backoff_max, self.backoff_base * 2**attempt)
+
+
+def _is_retryable(status_code):
+    return status_code in _RETRYABLE_STATUS or status_code >= 500
+
+
+def _retry_after(headers):
+    """Delay in seconds requested by retry-after-ms / Retry-After, or None."""
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(float(value) / 1000, 0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
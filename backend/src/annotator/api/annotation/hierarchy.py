@@ -0,0 +1,129 @@
+"""Annotate the functions of a file bottom-up along the call graph.
+
+Callees are annotated before their callers, and a short summary of every
+annotation is given to the callers' prompts in place of the callee's raw
+parsed_map entry. Mutually recursive functions form a strongly connected
+component of the call graph; a component is scheduled as one node, its
+members are annotated in parallel without each other's summaries. Components
+that do not depend on each other run in parallel.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm without recursion, so deep call chains are fine.
+
+    graph maps every node to the nodes it calls. Components are returned
+    callees first: a component comes after every component it calls.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, iter(graph[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, callees = work[-1]
+            for callee in callees:
+                if callee not in index:
+                    index[callee] = lowlink[callee] = counter
+                    counter += 1
+                    stack.append(callee)
+                    on_stack.add(callee)
+                    work.append((callee, iter(graph[callee])))
+                    break
+                if callee in on_stack:
+                    lowlink[node] = min(lowlink[node], index[callee])
+            else:
+                work.pop()
+                if work:
+                    caller = work[-1][0]
+                    lowlink[caller] = min(lowlink[caller], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component[::-1])
+    return components
+
+
+def summarize(text, max_chars):
+    """First sentence of an annotation, cut at a word boundary to max_chars."""
+    text = " ".join(text.split())
+    end = text.find(". ")
+    summary = text[: end + 1] if end != -1 else text
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(" ", 1)[0] + "..."
+    return summary
+
+
+def annotate_bottom_up(call_graph, names, annotate, max_workers, summary_chars=240):
+    """Call annotate(name, callee_summaries) for every name, callees first.
+
+    callee_summaries maps the callees of name (among names, outside its own
+    component) that were annotated successfully to the summary of their
+    annotation.
+    Returns ({name: annotation}, {name: exception}); a failed callee does
+    not stop its callers, they get its raw entry instead of a summary.
+    """
+    selected = set(names)
+    graph = {
+        name: [c for c in call_graph.get(name, []) if c in selected and c != name]
+        for name in names
+    }
+    components = strongly_connected_components(graph)
+    component_of = {name: i for i, members in enumerate(components) for name in members}
+    waiting_for = [set() for _ in components]
+    dependents = [set() for _ in components]
+    for name, callees in graph.items():
+        for callee in callees:
+            caller_i, callee_i = component_of[name], component_of[callee]
+            if caller_i != callee_i:
+                waiting_for[caller_i].add(callee_i)
+                dependents[callee_i].add(caller_i)
+
+    results = {}
+    errors = {}
+    summaries = {}
+    unfinished = [len(members) for members in components]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def submit(i):
+            for name in components[i]:
+                known = {c: summaries[c] for c in graph[name] if c in summaries}
+                running[executor.submit(annotate, name, known)] = (i, name)
+
+        for i, callees in enumerate(waiting_for):
+            if not callees:
+                submit(i)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    summaries[name] = summarize(results[name], summary_chars)
+                except Exception as e:
+                    errors[name] = e
+                unfinished[i] -= 1
+                if unfinished[i]:
+                    continue
+                for caller_i in dependents[i]:
+                    waiting_for[caller_i].discard(i)
+                    if not waiting_for[caller_i]:
+                        submit(caller_i)
+    return results, errors
@@ -0,0 +1,199 @@
+"""Worker threads that run queued AnnotationJob rows.
+
+Jobs are claimed with a conditional UPDATE, so any number of threads and
+processes (web workers or `flask annotation-worker`) can share one queue
+table without running a job twice. A claim is a lease: when a worker dies
+mid-job, the job is claimed again after ANNOTATION_JOB_LEASE_SECONDS.
+"""
+
+import os
+import socket
+import threading
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from annotator import db
+from annotator.models.annotation import Annotation
+from annotator.models.annotation_job import AnnotationJob
+from annotator.util.datetime_util import utc_now
+
+from .business import generate_annotation
+from .gateway import LLMError
+
+INTERRUPTED_ERROR = "Annotation job was interrupted too many times."
+FAILED_ERROR = "Annotation failed."
+FILE_MISSING_ERROR = "File not found"
+
+
+def init_app(app):
+    """Start the app's worker pool before its first request, if configured."""
+    if not app.config.get("ANNOTATION_WORKERS"):
+        return
+
+    @app.before_request
+    def _start_annotation_workers():
+        if "annotation_workers" not in app.extensions:
+            start_workers(app, app.config["ANNOTATION_WORKERS"])
+
+
+def start_workers(app, workers):
+    with _start_lock:
+        pool = app.extensions.get("annotation_workers")
+        if pool is None:
+            pool = app.extensions["annotation_workers"] = JobWorkerPool(app, workers)
+            pool.start()
+    return pool
+
+
+_start_lock = threading.Lock()
+
+
+class JobWorkerPool:
+    """Daemon threads that claim and run jobs until stop() is called.
+
+    Idle workers poll the table every ANNOTATION_JOB_POLL_SECONDS; wake()
+    lets a request that just queued a job skip the wait in this process.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = app.config["ANNOTATION_JOB_POLL_SECONDS"]
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                args=(f"{prefix}:{i}",),
+                name=f"annotation-worker-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, worker_id):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    ran = run_next_job(worker_id)
+            except Exception:
+                self.app.logger.exception("annotation worker %s failed", worker_id)
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+
+def run_pending_jobs(worker_id="inline"):
+    """Run queued jobs in the calling thread until none is left; returns the count."""
+    count = 0
+    while run_next_job(worker_id):
+        count += 1
+    return count
+
+
+def run_next_job(worker_id):
+    """Claim and run one job; returns False if there was nothing to claim."""
+    job = claim_next_job(worker_id)
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+
+def claim_next_job(worker_id):
+    config = current_app.config
+    now = utc_now()
+    max_attempts = config["ANNOTATION_JOB_MAX_ATTEMPTS"]
+    expired = and_(
+        AnnotationJob.status == AnnotationJob.RUNNING, AnnotationJob.locked_until < now
+    )
+    # workers died on these jobs too often: give up instead of retrying forever
+    AnnotationJob.query.filter(expired, AnnotationJob.attempts >= max_attempts).update(
+        dict(status=AnnotationJob.FAILED, error=INTERRUPTED_ERROR, finished_at=now),
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+    claimable = or_(AnnotationJob.status == AnnotationJob.QUEUED, expired)
+    candidates = (
+        db.session.query(AnnotationJob.uuid)
+        .filter(claimable)
+        .order_by(AnnotationJob.created_at)
+        .limit(10)
+        .all()
+    )
+    lease = timedelta(seconds=config["ANNOTATION_JOB_LEASE_SECONDS"])
+    for (uuid,) in candidates:
+        claimed = AnnotationJob.query.filter(
+            AnnotationJob.uuid == uuid, claimable
+        ).update(
+            dict(
+                status=AnnotationJob.RUNNING,
+                locked_by=worker_id,
+                locked_until=now + lease,
+                started_at=now,
+                attempts=AnnotationJob.attempts + 1,
+            ),
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            return AnnotationJob.find_by_uuid(uuid)
+    return None
+
+
+def run_job(job):
+    """Annotate the function of a claimed job and store the outcome.
+
+    The new Annotation row and the job's final status are committed together.
+    """
+    file = job.file
+    if file is None:
+        return _finish(job, error=FILE_MISSING_ERROR)
+    try:
+        text = generate_annotation(file, job.function_name, use_cache=job.use_cache)
+    except LLMError as e:
+        return _finish(job, error=e.message)
+    except Exception:
+        current_app.logger.exception("annotation job %s failed", job.uuid)
+        return _finish(job, error=FAILED_ERROR)
+    annotation = Annotation(
+        uuid=str(uuid4()),
+        annotation=text,
+        function_name=job.function_name,
+        file_id=job.file_id,
+        owner_id=job.owner_id,
+    )
+    db.session.add(annotation)
+    job.annotation_id = annotation.uuid
+    _finish(job)
+
+
+def _finish(job, error=None):
+    job.status = AnnotationJob.FAILED if error else AnnotationJob.DONE
+    job.error = error
+    job.finished_at = utc_now()
+    job.locked_by = None
+    job.locked_until = None
+    db.session.commit()
@@ -0,0 +1,122 @@
+"""Latency, token and retry accounting of LLM calls."""
+
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+from annotator import db
+from annotator.models.llm_usage import LLMUsage
+from annotator.util.metrics import MetricsRegistry
+
+LATENCY_BUCKETS = (0.005, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class CallStats:
+    """What one annotation call cost; filled in by chat() and the gateway."""
+
+    __slots__ = (
+        "cache_hit",
+        "prompt_tokens",
+        "completion_tokens",
+        "retries",
+        "latency",
+        "error",
+    )
+
+    def __init__(self):
+        self.cache_hit = False
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.latency = 0.0
+        self.error = False
+
+    def add_usage(self, usage):
+        """Count the tokens of an openai CompletionUsage (None when not reported)."""
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+
+class LLMMetrics:
+    """In-process histograms and counters of the LLM calls of one app."""
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.calls = self.registry.counter(
+            "annotator_llm_calls_total",
+            "Annotation calls by cache result and outcome.",
+            ["cache", "outcome"],
+        )
+        self.latency = self.registry.histogram(
+            "annotator_llm_call_duration_seconds",
+            "Wall-clock time of an annotation call, including queueing and retries.",
+            LATENCY_BUCKETS,
+            ["cache"],
+        )
+        self.prompt_tokens = self.registry.histogram(
+            "annotator_llm_prompt_tokens",
+            "Prompt tokens billed per model call.",
+            TOKEN_BUCKETS,
+        )
+        self.completion_tokens = self.registry.histogram(
+            "annotator_llm_completion_tokens",
+            "Completion tokens billed per model call.",
+            TOKEN_BUCKETS,
+        )
+        self.retries = self.registry.counter(
+            "annotator_llm_retries_total", "Model requests that were retried."
+        )
+
+    def observe(self, stats):
+        cache = "hit" if stats.cache_hit else "miss"
+        self.calls.inc(cache=cache, outcome="error" if stats.error else "ok")
+        self.latency.observe(stats.latency, cache=cache)
+        if not stats.cache_hit and not stats.error:
+            self.prompt_tokens.observe(stats.prompt_tokens)
+            self.completion_tokens.observe(stats.completion_tokens)
+        if stats.retries:
+            self.retries.inc(stats.retries)
+
+    def render(self):
+        return self.registry.render()
+
+
+def get_metrics():
+    """Return the app's LLMMetrics, creating them on first use."""
+    metrics = current_app.extensions.get("llm_metrics")
+    if metrics is None:
+        metrics = current_app.extensions.setdefault("llm_metrics", LLMMetrics())
+    return metrics
+
+
+@contextmanager
+def llm_call(owner_id, file_id):
+    """Time the annotation call in the block and record the CallStats it yields.
+
+    The call is added to the in-process metrics and to the persisted totals of
+    owner_id and file_id, whether it succeeded or not.
+    """
+    stats = CallStats()
+    start = time.perf_counter()
+    try:
+        yield stats
+    except Exception:
+        stats.error = True
+        raise
+    finally:
+        stats.latency = time.perf_counter() - start
+        get_metrics().observe(stats)
+        _persist(owner_id, file_id, stats)
+
+
+def _persist(owner_id, file_id, stats):
+    # the totals are bookkeeping: never fail the annotation because of them
+    try:
+        LLMUsage.add_call(owner_id, file_id, stats)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("recording LLM usage of %s failed", file_id)
@@ -0,0 +1,209 @@
+"""Deterministic local stand-in for the chat completions API, for load tests.
+
+StubClient has the part of the openai client used by the gateway
+(client.chat.completions.create, plain and streamed) and returns real openai
+response types, so the whole annotation path runs unchanged without network
+access or cost.
+"""
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from .context import estimate_tokens
+
+# share of the latency spent before the first streamed token
+FIRST_TOKEN_SHARE = 0.3
+_WORDS = (
+    "the function reads its arguments checks them and returns a value built from "
+    "the calls it makes to its callees in the call graph"
+).split()
+
+
+def parse_errors(spec):
+    """Parse "429=0.05,503=0.02,timeout=0.01" into [(kind, probability)].
+
+    A kind is an HTTP status code or "timeout"; probabilities must add up to
+    at most 1.
+    """
+    errors = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, probability = item.partition("=")
+        kind = kind.strip().lower()
+        if kind != "timeout":
+            kind = int(kind)
+        errors.append((kind, float(probability)))
+    if sum(p for _, p in errors) > 1:
+        raise ValueError(f"error probabilities add up to more than 1: {spec!r}")
+    return errors
+
+
+class StubStatusError(openai.APIStatusError):
+    """An error response of the stub. Like openai's, but without the HTTP
+    objects of the client's transport library."""
+
+    def __init__(self, status, headers):
+        message = f"Error code: {status} (stub)"
+        Exception.__init__(self, message)
+        self.message = message
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers)
+        self.request = None
+        self.body = None
+
+
+class StubTimeoutError(openai.APITimeoutError):
+    def __init__(self):
+        Exception.__init__(self, "Request timed out (stub).")
+        self.message = "Request timed out (stub)."
+        self.request = None
+
+
+class StubClient:
+    """Answer chat completions after a simulated delay, or fail like the service.
+
+    Latency is log-normal with the given median and sigma (sigma=0 gives a
+    constant delay). errors is a list of (kind, probability) as returned by
+    parse_errors(). Everything is derived from seed, the request and the
+    number of times the same request was sent before, so a run can be
+    replayed exactly whatever the thread interleaving, and a retried request
+    does not repeat the outcome of the attempt before it.
+    """
+
+    def __init__(
+        self,
+        latency=1.5,
+        latency_sigma=0.5,
+        errors=(),
+        completion_tokens=120,
+        seed=0,
+        sleep=time.sleep,
+    ):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.errors = list(errors)
+        self.completion_tokens = completion_tokens
+        self.seed = seed
+        self._sleep = sleep
+        self._sent = {}
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, model, timeout=None, stream=False, **options):
+        digest = hashlib.sha256(
+            json.dumps([self.seed, model, messages], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            attempt = self._sent.get(digest, 0)
+            self._sent[digest] = attempt + 1
+        rng = random.Random(f"{digest}:{attempt}")
+        latency = self.latency * math.exp(self.latency_sigma * rng.gauss(0, 1))
+        error = self._draw_error(rng)
+
+        if timeout is not None and (error == "timeout" or latency > timeout):
+            self._sleep(timeout)
+            raise StubTimeoutError()
+        if error is not None:
+            # services reject quickly
+            self._sleep(latency * 0.1)
+            headers = {}
+            if error == 429:
+                headers["retry-after-ms"] = str(rng.randint(100, 2000))
+            raise StubStatusError(error, headers)
+
+        text = _reply(digest, self.completion_tokens)
+        prompt_tokens = estimate_tokens("".join(m["content"] for m in messages))
+        completion_tokens = len(text.split())
+        usage = CompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        if stream:
+            include_usage = (options.get("stream_options") or {}).get("include_usage")
+            return _StubStream(
+                digest,
+                model,
+                text,
+                usage if include_usage else None,
+                latency,
+                self._sleep,
+            )
+        self._sleep(latency)
+        return ChatCompletion(
+            id=f"chatcmpl-stub-{digest[:12]}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[
+                dict(
+                    index=0,
+                    message=dict(role="assistant", content=text),
+                    finish_reason="stop",
+                )
+            ],
+            usage=usage,
+        )
+
+    def _draw_error(self, rng):
+        draw = rng.random()
+        for kind, probability in self.errors:
+            if draw < probability:
+                return kind
+            draw -= probability
+        return None
+
+
+class _StubStream:
+    """Iterable of ChatCompletionChunk, one per word, with a with-block like
+    openai.Stream."""
+
+    def __init__(self, digest, model, text, usage, latency, sleep):
+        self.digest = digest
+        self.model = model
+        words = text.split(" ")
+        self.pieces = words[:1] + [" " + word for word in words[1:]]
+        self.usage = usage
+        self.latency = latency
+        self._sleep = sleep
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        self._sleep(self.latency * FIRST_TOKEN_SHARE)
+        between = self.latency * (1 - FIRST_TOKEN_SHARE) / max(len(self.pieces) - 1, 1)
+        for i, piece in enumerate(self.pieces):
+            if i:
+                self._sleep(between)
+            yield self._chunk([dict(index=0, delta=dict(content=piece))])
+        if self.usage is not None:
+            yield self._chunk([], usage=self.usage)
+
+    def _chunk(self, choices, usage=None):
+        return ChatCompletionChunk(
+            id=f"chatcmpl-stub-{self.digest[:12]}",
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model=self.model,
+            choices=choices,
+            usage=usage,
+        )
+
+
+def _reply(digest, n_words):
+    """n_words words of text that only depend on digest."""
+    rng = random.Random(digest)
+    words = [rng.choice(_WORDS) for _ in range(max(n_words - 3, 1))]
+    return f"Stub annotation {digest[:8]}: " + " ".join(words)
@@ -1,24 +1,28 @@
-import os
-
 from flask import current_app
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-from pathlib import Path
 
-dotenv_path = Path(__file__).parent / ".env"
-load_dotenv()
-endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+from .backends import create_client
+from .cache import annotation_key, get_cached_annotation, store_annotation
+from .gateway import get_gateway
+
 model_name = "gpt-4.1"
 deployment = "gpt-4.1"
-subscription_key = os.getenv("AZURE_OPENAI_KEY")
-api_version = "2025-01-01-preview"
+completion_options = dict(
+    max_completion_tokens=1000,
+    temperature=0.2,
+    top_p=1.0,
+    frequency_penalty=0.0,
+    presence_penalty=0.0,
+)
 
 system_prompt = """
 You are a function annotation assistant.
 
 You receive:
 1) the full source code of one function, and
-2) a parsed_map JSON describing structural information of the entire file.
+2) a parsed_map JSON describing the file and the functions around this one in
+   the call graph (its callers and callees, with their distance in calls).
+   Callees that were annotated already may appear as {"name", "summary"}
+   instead of their parsed_map entry; the summary describes what they do.
 
 Your task is to generate a single coherent explanation that integrates:
 - what the function does based strictly on its code, and
@@ -39,14 +43,13 @@ def get_user_prompt(function_name, parsed_map, function_code):
 
 
 def get_client():
-    return AzureOpenAI(
-        api_version=api_version, azure_endpoint=endpoint, api_key=subscription_key
-    )
+    """Client of the backend chosen by LLM_BACKEND."""
+    return create_client(current_app.config)
 
 
-def chat(function_name, parsed_map, function_code):
+def get_messages(function_name, parsed_map, function_code):
     user_prompt = get_user_prompt(function_name, parsed_map, function_code)
-    message = [
+    return [
         {
             "role": "system",
             "content": system_prompt,
@@ -57,15 +60,54 @@ def chat(function_name, parsed_map, function_code):
         },
     ]
 
-    client = get_client()
-    response = client.chat.completions.create(
+
+def chat(function_name, parsed_map, function_code, use_cache=True, stats=None):
+    """Return the annotation of one function.
+
+    stats is an optional CallStats that records the cache result, tokens and
+    retries of the call.
+    """
+    message = get_messages(function_name, parsed_map, function_code)
+    key = annotation_key(model_name, deployment, message, completion_options)
+    if use_cache:
+        cached = get_cached_annotation(key)
+        if cached is not None:
+            if stats is not None:
+                stats.cache_hit = True
+            return cached
+
+    response = get_gateway(get_client).complete(
+        stats=stats,
         messages=message,
         model=deployment,
-        max_completion_tokens=1000,
-        temperature=0.2,
-        top_p=1.0,
-        frequency_penalty=0.0,
-        presence_penalty=0.0,
+        **completion_options,
     )
     reply = response.choices[0].message.content
+    if reply is not None:
+        # also refreshes the entry when the cache was bypassed
+        store_annotation(key, reply)
     return reply
+
+
+def chat_stream(function_name, parsed_map, function_code, use_cache=True, stats=None):
+    """Like chat(), but yield the reply in pieces as the model produces them."""
+    message = get_messages(function_name, parsed_map, function_code)
+    key = annotation_key(model_name, deployment, message, completion_options)
+    if use_cache:
+        cached = get_cached_annotation(key)
+        if cached is not None:
+            if stats is not None:
+                stats.cache_hit = True
+            yield cached
+            return
+
+    pieces = []
+    for piece in get_gateway(get_client).stream(
+        stats=stats,
+        messages=message,
+        model=deployment,
+        **completion_options,
+    ):
+        pieces.append(piece)
+        yield piece
+    store_annotation(key, "".join(pieces))
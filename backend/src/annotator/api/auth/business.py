@@ -1,20 +1,30 @@
 """Business logic for /auth API endpoints."""
 
+from contextlib import contextmanager
 from http import HTTPStatus
 
 from flask import current_app
 from flask_restx import abort
+from werkzeug.exceptions import ServiceUnavailable
 
 from annotator import db
+from annotator.api.auth.context import current_auth
 from annotator.api.auth.decorators import token_required, admin_token_required
+from annotator.models.refresh_token import RefreshToken
 from annotator.models.token_blacklist import BlacklistedToken
 from annotator.models.user import User
 from annotator.models.liscense_key import LicenseKey
+from annotator.util.bounded_executor import Overloaded
 from annotator.util.datetime_util import (
     remaining_fromtimestamp,
     format_timespan_digits,
 )
 
+OVERLOADED_ERROR = "Too many logins at the moment, please try again shortly."
+OVERLOADED_RETRY_AFTER_SECONDS = 1
+INVALID_REFRESH_TOKEN = "refresh token is invalid or expired"
+REUSED_REFRESH_TOKEN = "refresh token was already used, please log in again"
+
 
 def process_registration_request(email, password, license_key):
     if User.find_by_email(email):
@@ -23,15 +33,20 @@ def process_registration_request(email, password, license_key):
     if not key or key.used:
         abort(HTTPStatus.UNAUTHORIZED, "License key is invalid or used", status="fail")
     setattr(key, "used", True)
-    new_user = User(email=email, password=password)
+    with _shed_when_overloaded():
+        new_user = User(email=email, password=password)
     db.session.add(new_user)
+    # public_id is generated on flush
+    db.session.flush()
+    refresh, refresh_token = RefreshToken.issue(new_user.public_id)
+    access_token = new_user.encode_access_token(family_id=refresh.family_id)
     db.session.commit()
-    access_token = new_user.encode_access_token()
     return (
         _create_auth_successful_response(
             token=access_token,
             status_code=HTTPStatus.CREATED,
             message="successfully registered",
+            refresh_token=refresh_token,
         ),
         HTTPStatus.CREATED,
     )
@@ -39,32 +54,71 @@ def process_registration_request(email, password, license_key):
 
 def process_login_request(email, password):
     user = User.find_by_email(email)
-    if not user or not user.check_password(password):
-        abort(HTTPStatus.UNAUTHORIZED, "email or password does not match", status="fail")
-    access_token = user.encode_access_token()
+    # give the connection back to the pool while waiting for bcrypt; user keeps
+    # its loaded attributes
+    db.session.close()
+    with _shed_when_overloaded():
+        if not user or not user.check_password(password):
+            abort(
+                HTTPStatus.UNAUTHORIZED,
+                "email or password does not match",
+                status="fail",
+            )
+        if user.needs_rehash():
+            # BCRYPT_LOG_ROUNDS changed since the hash was made
+            db.session.add(user)
+            user.password = password
+    refresh, refresh_token = RefreshToken.issue(user.public_id)
+    access_token = user.encode_access_token(family_id=refresh.family_id)
+    db.session.commit()
     return _create_auth_successful_response(
         token=access_token,
         status_code=HTTPStatus.OK,
         message="successfully logged in",
+        refresh_token=refresh_token,
+    )
+
+
+def process_refresh_request(refresh_token):
+    found = RefreshToken.find_with_owner(refresh_token)
+    if not found:
+        abort(HTTPStatus.UNAUTHORIZED, INVALID_REFRESH_TOKEN, status="fail")
+    refresh, user = found
+    if refresh.revoked_at is not None:
+        abort(HTTPStatus.UNAUTHORIZED, INVALID_REFRESH_TOKEN, status="fail")
+    if refresh.used_at is not None or not RefreshToken.use(refresh.id):
+        # the token was copied: whoever holds it, the family can't be trusted
+        RefreshToken.revoke_family(refresh.family_id)
+        db.session.commit()
+        abort(HTTPStatus.UNAUTHORIZED, REUSED_REFRESH_TOKEN, status="fail")
+    _, next_token = RefreshToken.issue(user.public_id, refresh.family_id)
+    # encoded before the commit expires user and refresh, which would reload them
+    access_token = user.encode_access_token(family_id=refresh.family_id)
+    db.session.commit()
+    return _create_auth_successful_response(
+        token=access_token,
+        status_code=HTTPStatus.OK,
+        message="successfully refreshed",
+        refresh_token=next_token,
     )
 
 
 @token_required
 def get_logged_in_user():
-    public_id = get_logged_in_user.public_id
-    user = User.find_by_public_id(public_id)
-    expires_at = get_logged_in_user.expires_at
+    auth = current_auth()
+    user = auth.user
+    expires_at = auth.expires_at
     user.token_expires_in = format_timespan_digits(remaining_fromtimestamp(expires_at))
     return user
 
 
 @token_required
 def process_logout_request():
-    access_token = process_logout_request.token
-    expires_at = process_logout_request.expires_at
-    blacklisted_token = BlacklistedToken(access_token, expires_at)
-    db.session.add(blacklisted_token)
-    db.session.commit()
+    auth = current_auth()
+    BlacklistedToken.blacklist(auth.jti, auth.expires_at)
+    if auth.family_id:
+        RefreshToken.revoke_family(auth.family_id)
+        db.session.commit()
     response_dict = dict(status="success", message="successfully logged out")
     return response_dict, HTTPStatus.OK
 
@@ -81,7 +135,22 @@ def add_license_key():
     return response_dict, HTTPStatus.CREATED
 
 
-def _create_auth_successful_response(token, status_code, message):
+@contextmanager
+def _shed_when_overloaded():
+    """Answer 503 at once when the password hasher is busy, so that a login
+    spike cannot hold every server thread waiting for bcrypt."""
+    try:
+        yield
+    except Overloaded:
+        db.session.rollback()
+        error = ServiceUnavailable(
+            OVERLOADED_ERROR, retry_after=OVERLOADED_RETRY_AFTER_SECONDS
+        )
+        error.data = dict(message=OVERLOADED_ERROR, status="fail")
+        raise error
+
+
+def _create_auth_successful_response(token, status_code, message, refresh_token=None):
     response = dict(
         status="success",
         message=message,
@@ -89,6 +158,11 @@ def _create_auth_successful_response(token, status_code, message):
         token_type="bearer",
         expires_in=_get_token_expire_time(),
     )
+    if refresh_token is not None:
+        response["refresh_token"] = refresh_token
+        response["refresh_expires_in"] = (
+            current_app.config.get("REFRESH_TOKEN_EXPIRE_DAYS") * 86400
+        )
     return response
 
 
@@ -0,0 +1,44 @@
+"""Identity of the caller of the current request."""
+
+from flask import request
+
+from annotator.models.user import User
+
+
+class AuthContext:
+    """Claims of the request's access token, decoded once per request.
+
+    The User row is only loaded when user is first read, and then kept for
+    the rest of the request.
+    """
+
+    __slots__ = (
+        "public_id",
+        "admin",
+        "token",
+        "jti",
+        "expires_at",
+        "family_id",
+        "_user",
+    )
+
+    def __init__(self, public_id, admin, token, jti, expires_at, family_id=None):
+        self.public_id = public_id
+        self.admin = admin
+        self.token = token
+        self.jti = jti
+        self.expires_at = expires_at
+        self.family_id = family_id
+        self._user = None
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = User.find_by_public_id(self.public_id)
+        return self._user
+
+
+def current_auth():
+    """AuthContext of the current request, set by token_required and
+    admin_token_required; None when the request was not authenticated."""
+    return getattr(request, "auth_context", None)
@@ -4,18 +4,20 @@ from functools import wraps
 
 from flask import request
 
+from annotator.api.auth.context import AuthContext, current_auth
 from annotator.api.exceptions import ApiUnauthorized, ApiForbidden
 from annotator.models.user import User
 
 
 def token_required(f):
-    """Execute function if request contains valid access token."""
+    """Execute function if request contains valid access token.
+
+    The token's claims are available to the function as current_auth().
+    """
 
     @wraps(f)
     def decorated(*args, **kwargs):
-        token_payload = _check_access_token(admin_only=False)
-        for name, val in token_payload.items():
-            setattr(decorated, name, val)
+        _authenticate(admin_only=False)
         return f(*args, **kwargs)
 
     return decorated
@@ -26,16 +28,22 @@ def admin_token_required(f):
 
     @wraps(f)
     def decorated(*args, **kwargs):
-        token_payload = _check_access_token(admin_only=True)
-        if not token_payload["admin"]:
+        if not _authenticate(admin_only=True).admin:
             raise ApiForbidden()
-        for name, val in token_payload.items():
-            setattr(decorated, name, val)
         return f(*args, **kwargs)
 
     return decorated
 
 
+def _authenticate(admin_only):
+    """Decode the request's token on the first call; later calls in the same
+    request (nested decorated functions) reuse it."""
+    auth = current_auth()
+    if auth is None:
+        auth = request.auth_context = AuthContext(**_check_access_token(admin_only))
+    return auth
+
+
 def _check_access_token(admin_only):
     token = request.headers.get("Authorization")
     if not token:
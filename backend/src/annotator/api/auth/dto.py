@@ -27,6 +27,12 @@ auth_register_parser.add_argument(
 )
 
 
+auth_refresh_parser = RequestParser(bundle_errors=True)
+auth_refresh_parser.add_argument(
+    name="refresh_token", type=str, location="form", required=True, nullable=False
+)
+
+
 user_model = Model(
     "UserResponse",
     {
@@ -47,5 +53,7 @@ auth_model = Model(
         "access_token": String,
         "token_type": String,
         "expires_in": Integer,
+        "refresh_token": String,
+        "refresh_expires_in": Integer,
     },
 )
@@ -7,12 +7,14 @@ from flask_restx import Namespace, Resource
 from annotator.api.auth.dto import (
     auth_login_parser,
     auth_register_parser,
+    auth_refresh_parser,
     user_model,
     auth_model,
 )
 from annotator.api.auth.business import (
     process_registration_request,
     process_login_request,
+    process_refresh_request,
     get_logged_in_user,
     process_logout_request,
     add_license_key,
@@ -61,6 +63,22 @@ class LoginUser(Resource):
         return process_login_request(email, password)
 
 
+@auth_ns.route("/refresh", endpoint="auth_refresh")
+class RefreshUser(Resource):
+    """Handles HTTP requests to URL: /api/v1/auth/refresh."""
+
+    @auth_ns.expect(auth_refresh_parser)
+    @auth_ns.marshal_with(auth_model)
+    @auth_ns.response(int(HTTPStatus.OK), "Tokens were refreshed.")
+    @auth_ns.response(int(HTTPStatus.UNAUTHORIZED), "Refresh token is invalid or used.")
+    @auth_ns.response(int(HTTPStatus.BAD_REQUEST), "Validation error.")
+    @auth_ns.response(int(HTTPStatus.INTERNAL_SERVER_ERROR), "Internal server error.")
+    def post(self):
+        """Exchange a refresh token for a new access token and refresh token."""
+        request_data = auth_refresh_parser.parse_args()
+        return process_refresh_request(request_data.get("refresh_token"))
+
+
 @auth_ns.route("/user", endpoint="auth_user")
 class GetUser(Resource):
     """Handles HTTP requests to URL: /api/v1/auth/user."""
@@ -85,7 +103,8 @@ class LogoutUser(Resource):
     @auth_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
     @auth_ns.response(int(HTTPStatus.INTERNAL_SERVER_ERROR), "Internal server error.")
     def post(self):
-        """Add token to blacklist, deauthenticating the current user."""
+        """Add token to blacklist and revoke its refresh tokens, deauthenticating
+        the current user."""
         return process_logout_request()
 
 
@@ -0,0 +1,78 @@
+"""Periodic deletion of expired rows from token_blacklist and refresh_token.
+
+An expired token is rejected when it is decoded, so its blacklist row is
+no longer needed; an expired refresh token can no longer be used. Every
+server process runs the purge in a daemon thread every
+TOKEN_PURGE_INTERVAL_SECONDS; concurrent purges only delete the same rows.
+Set the interval to 0 and run `flask purge-tokens` from a scheduler instead
+to keep it out of the web processes.
+"""
+
+import threading
+
+from flask import current_app
+
+from annotator.models.refresh_token import RefreshToken
+from annotator.models.token_blacklist import BlacklistedToken
+
+
+def init_app(app):
+    """Start the app's purge thread before its first request, if configured."""
+    if not app.config.get("TOKEN_PURGE_INTERVAL_SECONDS"):
+        return
+
+    @app.before_request
+    def _start_token_purger():
+        if "token_purger" not in app.extensions:
+            start_purger(app)
+
+
+def start_purger(app):
+    with _start_lock:
+        purger = app.extensions.get("token_purger")
+        if purger is None:
+            purger = app.extensions["token_purger"] = TokenPurger(app)
+            purger.start()
+    return purger
+
+
+_start_lock = threading.Lock()
+
+
+class TokenPurger:
+    """Daemon thread that purges expired tokens until stop() is called."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config["TOKEN_PURGE_INTERVAL_SECONDS"]
+        self.batch_size = app.config["TOKEN_PURGE_BATCH_SIZE"]
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="token-purger", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    purge_expired_tokens(self.batch_size)
+            except Exception:
+                self.app.logger.exception("purging expired tokens failed")
+
+
+def purge_expired_tokens(batch_size):
+    blacklisted = BlacklistedToken.purge_expired(batch_size)
+    if blacklisted:
+        current_app.logger.info("purged %d expired blacklisted token(s)", blacklisted)
+    refresh = RefreshToken.purge_expired(batch_size)
+    if refresh:
+        current_app.logger.info("purged %d expired refresh token(s)", refresh)
+    return blacklisted + refresh
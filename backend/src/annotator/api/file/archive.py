@@ -0,0 +1,85 @@
+"""Read Python source members out of uploaded zip and tar.gz archives."""
+
+import posixpath
+import tarfile
+import zipfile
+from collections import namedtuple
+from functools import partial
+
+ArchiveMember = namedtuple("ArchiveMember", ["path", "data"])
+
+
+class ArchiveError(Exception):
+    """Raised when an uploaded archive cannot be read or exceeds the limits."""
+
+
+def read_python_members(stream, filename, max_members, max_bytes):
+    """Return the .py members of a zip or tar.gz archive as ArchiveMember tuples.
+
+    Only regular files are read. Paths are normalized to forward slashes
+    without leading "./" or "/" and members escaping the archive root with
+    ".." are skipped. ArchiveError is raised for unsupported formats, more
+    than max_members Python files, or more than max_bytes of Python source.
+    """
+    lower = filename.lower()
+    if lower.endswith(".zip"):
+        members = _iter_zip(stream)
+    elif lower.endswith((".tar.gz", ".tgz")):
+        members = _iter_tar(stream)
+    else:
+        raise ArchiveError("Archive must be a .zip, .tar.gz or .tgz file.")
+
+    result = []
+    total = 0
+    try:
+        for path, size, read in members:
+            path = _normalize(path)
+            if path is None or not path.endswith(".py"):
+                continue
+            if len(result) >= max_members:
+                raise ArchiveError(f"Archive contains more than {max_members} files.")
+            total += size
+            if total > max_bytes:
+                raise ArchiveError(f"Archive source exceeds {max_bytes} bytes.")
+            data = read()
+            if len(data) != size:
+                raise ArchiveError(f"Archive member {path} is corrupt.")
+            result.append(ArchiveMember(path, data))
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"Archive could not be read: {e}")
+    return result
+
+
+def _iter_zip(stream):
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as e:
+        raise ArchiveError(f"Archive could not be read: {e}")
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            yield info.filename, info.file_size, partial(archive.read, info)
+
+
+def _iter_tar(stream):
+    try:
+        archive = tarfile.open(fileobj=stream, mode="r:gz")
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Archive could not be read: {e}")
+    with archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            yield info.name, info.size, partial(_read_tar_member, archive, info)
+
+
+def _read_tar_member(archive, info):
+    return archive.extractfile(info).read()
+
+
+def _normalize(path):
+    path = posixpath.normpath(path.replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../"):
+        return None
+    return path
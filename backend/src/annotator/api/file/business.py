@@ -1,9 +1,9 @@
 """Business logic for /file API endpoints."""
 
+import json
 import os
 from http import HTTPStatus
 from uuid import uuid4
-import json
 
 from flask import current_app
 from flask_restx import abort
@@ -11,39 +11,35 @@ from werkzeug.datastructures import FileStorage
 
 import annotator
 from annotator import db
+from annotator.api.auth.context import current_auth
 from annotator.api.auth.decorators import token_required
+from annotator.models.annotation import Annotation
 from annotator.models.file import File
-from annotator.models.user import User
+from annotator.models.project import Project
 from annotator.util.datetime_util import localized_dt_string
 
-from .parser import parse_python_file
+from .archive import ArchiveError, read_python_members
+from .cache import source_hash, get_cached_parsed_map, store_parsed_map
+from .ingest import IngestError, ingest_upload
+from .project import build_project_call_graph, module_name
+from .revision import function_body_hashes, unchanged_functions
+from .sandbox import parse_in_sandbox, parse_many_in_sandbox, error_status
 
 
 @token_required
 def process_file_upload(name: str, file: FileStorage):
-    owner_id = process_file_upload.public_id
-    owner = User.find_by_public_id(owner_id)
+    owner_id = current_auth().public_id
     item_name = name
     file_name = file.filename
-    uuid = str(uuid4())
-    file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], uuid)
-    file.save(file_path)
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        code = f.read()
-
-    parsed_map_dict = parse_python_file(code)
-    if parsed_map_dict is None:
-        abort(HTTPStatus.BAD_REQUEST, "Uploaded file contains syntax error.")
-    parsed_map_json = json.dumps(parsed_map_dict)
+    uuid, code, parsed_map_json = _save_and_parse(file)
 
     new_file_info = File(
         uuid=uuid,
         item_name=item_name,
         file_name=file_name,
         owner_id=owner_id,
-        parsed_map=parsed_map_json,
     )
+    new_file_info.set_parsed_map(parsed_map_json, source=code.encode("utf-8"))
     db.session.add(new_file_info)
     db.session.commit()
     file_info = File.find_by_uuid(uuid)
@@ -56,9 +52,222 @@ def process_file_upload(name: str, file: FileStorage):
     )
 
 
+@token_required
+def process_file_revision(previous_uuid, file: FileStorage):
+    owner_id = current_auth().public_id
+    previous = File.find_by_uuid(previous_uuid)
+    if not previous:
+        abort(HTTPStatus.NOT_FOUND, "File not found", status="fail")
+    if previous.owner_id != owner_id:
+        abort(
+            HTTPStatus.UNAUTHORIZED, "File does not belong to this user.", status="fail"
+        )
+    uuid, code, parsed_map_json = _save_and_parse(file)
+
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    with open(os.path.join(upload_folder, previous_uuid), "rb") as f:
+        old_hashes = function_body_hashes(f.read(), previous.parsed_map_dict)
+    source = code.encode("utf-8")
+    new_hashes = function_body_hashes(source, json.loads(parsed_map_json))
+    unchanged = unchanged_functions(old_hashes, new_hashes)
+
+    new_file_info = File(
+        uuid=uuid,
+        item_name=previous.item_name,
+        file_name=file.filename,
+        owner_id=owner_id,
+        previous_id=previous.uuid,
+    )
+    new_file_info.set_parsed_map(parsed_map_json, source=source)
+    db.session.add(new_file_info)
+    carried_over = []
+    for annotation in previous.annotations:
+        if annotation.function_name not in unchanged:
+            continue
+        db.session.add(
+            Annotation(
+                uuid=str(uuid4()),
+                annotation=annotation.annotation,
+                function_name=annotation.function_name,
+                created_at=annotation.created_at,
+                file_id=uuid,
+                owner_id=owner_id,
+            )
+        )
+        carried_over.append(annotation.function_name)
+    db.session.commit()
+    return dict(
+        uuid=new_file_info.uuid,
+        created_at=localized_dt_string(new_file_info.created_at),
+        item_name=new_file_info.item_name,
+        file_name=new_file_info.file_name,
+        parsed_map=parsed_map_json,
+        previous_id=previous.uuid,
+        carried_over=sorted(set(carried_over)),
+        changed=sorted(set(new_hashes) - unchanged),
+    )
+
+
+@token_required
+def process_archive_upload(name: str, archive: FileStorage):
+    owner_id = current_auth().public_id
+    try:
+        members = read_python_members(
+            archive.stream,
+            archive.filename,
+            max_members=current_app.config["ARCHIVE_MAX_MEMBERS"],
+            max_bytes=current_app.config["ARCHIVE_MAX_BYTES"],
+        )
+    except ArchiveError as e:
+        abort(HTTPStatus.BAD_REQUEST, str(e), status="fail")
+    if not members:
+        abort(HTTPStatus.BAD_REQUEST, "Archive contains no Python files.", status="fail")
+
+    skipped = []
+    sources = _archive_sources(members, skipped)
+    parsed_maps, errors = _parse_sources(sources)
+
+    project_uuid = str(uuid4())
+    new_files = []
+    contents = []
+    modules = {}
+    for member, code, content_hash in sources:
+        if content_hash in errors:
+            skipped.append(dict(file_name=member.path, error=errors[content_hash]))
+            continue
+        uuid = str(uuid4())
+        parsed_map = json.loads(parsed_maps[content_hash])
+        new_file = File(
+            uuid=uuid,
+            item_name=name,
+            file_name=member.path,
+            owner_id=owner_id,
+            project_id=project_uuid,
+        )
+        new_file.set_parsed_map(parsed_map, source=member.data)
+        new_files.append(new_file)
+        contents.append(member.data)
+        modules[module_name(member.path)] = parsed_map
+    if not new_files:
+        abort(
+            HTTPStatus.BAD_REQUEST,
+            "No Python file in the archive could be parsed.",
+            status="fail",
+        )
+
+    call_graph_json = json.dumps(build_project_call_graph(modules))
+    project = Project(
+        uuid=project_uuid,
+        item_name=name,
+        file_name=archive.filename,
+        owner_id=owner_id,
+        call_graph=call_graph_json,
+    )
+    _store_archive(project, new_files, contents)
+    return dict(
+        uuid=project.uuid,
+        created_at=localized_dt_string(project.created_at),
+        item_name=name,
+        file_name=archive.filename,
+        call_graph=call_graph_json,
+        files=[dict(uuid=f.uuid, file_name=f.file_name) for f in new_files],
+        skipped=skipped,
+    )
+
+
+def _archive_sources(members, skipped):
+    """(member, code, content hash) of every member that can be stored; the
+    others are added to skipped."""
+    sources = []
+    max_path = File.file_name.type.length
+    for member in members:
+        if len(member.path) > max_path:
+            error = f"File path is longer than {max_path} characters."
+            skipped.append(dict(file_name=member.path, error=error))
+            continue
+        try:
+            code = member.data.decode("utf-8")
+        except UnicodeDecodeError:
+            skipped.append(dict(file_name=member.path, error="File is not UTF-8."))
+            continue
+        sources.append((member, code, source_hash(code)))
+    return sources
+
+
+def _parse_sources(sources):
+    """Return (parsed_map JSON by content hash, parse error by content hash).
+
+    Identical sources are parsed once; cache misses are parsed in parallel.
+    """
+    parsed_maps = {}
+    misses = {}
+    for _, code, content_hash in sources:
+        if content_hash in parsed_maps or content_hash in misses:
+            continue
+        cached = get_cached_parsed_map(content_hash)
+        if cached is None:
+            misses[content_hash] = code
+        else:
+            parsed_maps[content_hash] = cached
+    errors = {}
+    results = parse_many_in_sandbox(list(misses.values()))
+    for content_hash, result in zip(misses, results):
+        if result.failure:
+            errors[content_hash] = result.error
+            continue
+        parsed_maps[content_hash] = result.value
+        store_parsed_map(content_hash, result.value)
+    return parsed_maps, errors
+
+
+def _store_archive(project, new_files, contents):
+    """Write the member files to UPLOAD_FOLDER and commit the project with its
+    files; the written files are removed again when the transaction fails."""
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    written = []
+    try:
+        for new_file, data in zip(new_files, contents):
+            file_path = os.path.join(upload_folder, new_file.uuid)
+            with open(file_path, "wb") as f:
+                written.append(file_path)
+                f.write(data)
+        db.session.add(project)
+        db.session.add_all(new_files)
+        db.session.commit()
+    except Exception:
+        # no row points at the files written so far
+        db.session.rollback()
+        for file_path in written:
+            os.remove(file_path)
+        raise
+
+
+def _save_and_parse(file: FileStorage):
+    """Store an uploaded file under a new uuid; return (uuid, code, parsed_map JSON)."""
+    uuid = str(uuid4())
+    file_path = os.path.join(current_app.config["UPLOAD_FOLDER"], uuid)
+    try:
+        ingested = ingest_upload(
+            file.stream, file_path, current_app.config["MAX_UPLOAD_BYTES"]
+        )
+    except IngestError as e:
+        abort(e.status, e.message, status="fail")
+    code = ingested.text
+
+    parsed_map_json = get_cached_parsed_map(ingested.content_hash)
+    if parsed_map_json is None:
+        result = parse_in_sandbox(code)
+        if result.failure:
+            os.remove(file_path)
+            abort(error_status(result.error), result.error)
+        parsed_map_json = result.value
+        store_parsed_map(ingested.content_hash, parsed_map_json)
+    return uuid, code, parsed_map_json
+
+
 @token_required
 def get_file_info():
-    user_id = get_file_info.public_id
+    user_id = current_auth().public_id
     files = File.find_by_user_id(user_id)
     output = []
     for file in files:
@@ -70,7 +279,7 @@ def get_file_info():
 
 @token_required
 def get_file_content(uuid):
-    owner_id = get_file_content.public_id
+    owner_id = current_auth().public_id
     file = File.find_by_uuid(uuid)
     if not file:
         abort(HTTPStatus.NOT_FOUND, "File not found", status="fail")
@@ -88,7 +297,7 @@ def get_file_content(uuid):
 
 @token_required
 def delete_file(uuid):
-    owner_id = delete_file.public_id
+    owner_id = current_auth().public_id
     file = File.find_by_uuid(uuid)
     if not file:
         abort(HTTPStatus.NOT_FOUND, "File not found", status="fail")
@@ -96,6 +305,10 @@ def delete_file(uuid):
         abort(
             HTTPStatus.UNAUTHORIZED, "File does not belong to this user.", status="fail"
         )
+    # later revisions keep their annotations but no longer have a previous file
+    File.query.filter_by(previous_id=uuid).update(
+        dict(previous_id=None), synchronize_session=False
+    )
     db.session.delete(file)
     db.session.commit()
     os.remove(os.path.join(current_app.config["UPLOAD_FOLDER"], uuid))
@@ -0,0 +1,58 @@
+"""Content-hash cache for parsed_map results."""
+
+import hashlib
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from annotator import db
+from annotator.models.parse_cache import ParseCache
+from annotator.util.cache import LRUCache
+
+from .parser import PARSER_VERSION
+
+
+def source_hash(code: str) -> str:
+    """SHA-256 hex digest of the uploaded source."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def get_cached_parsed_map(content_hash):
+    """Return the parsed_map JSON stored for content_hash, or None on a miss.
+
+    The in-process LRU is checked first; on a miss the persistent table is
+    queried and a hit is copied into the LRU.
+    """
+    key = (content_hash, PARSER_VERSION)
+    memory = _memory_cache()
+    parsed_map = memory.get(key)
+    if parsed_map is None:
+        entry = ParseCache.find(content_hash, PARSER_VERSION)
+        if entry:
+            parsed_map = entry.parsed_map
+            memory.set(key, parsed_map)
+    return parsed_map
+
+
+def store_parsed_map(content_hash, parsed_map):
+    """Store parsed_map JSON for content_hash in both cache layers."""
+    _memory_cache().set((content_hash, PARSER_VERSION), parsed_map)
+    entry = ParseCache(
+        content_hash=content_hash,
+        parser_version=PARSER_VERSION,
+        parsed_map=parsed_map,
+    )
+    db.session.add(entry)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another worker stored the same source first
+        db.session.rollback()
+
+
+def _memory_cache():
+    cache = current_app.extensions.get("parse_cache")
+    if cache is None:
+        maxsize = current_app.config.get("PARSE_CACHE_SIZE")
+        cache = current_app.extensions.setdefault("parse_cache", LRUCache(maxsize))
+    return cache
@@ -14,23 +14,57 @@ file_upload_parser.add_argument(
 )
 
 
-file_info_model = Model(
-    "FileInfoResponse",
+file_revision_parser = RequestParser(bundle_errors=True)
+file_revision_parser.add_argument(
+    name="file", type=FileStorage, location="files", required=True, nullable=False
+)
+
+
+archive_upload_parser = RequestParser(bundle_errors=True)
+archive_upload_parser.add_argument(
+    name="name", type=str, location="form", required=True, nullable=False
+)
+archive_upload_parser.add_argument(
+    name="archive", type=FileStorage, location="files", required=True, nullable=False
+)
+
+
+file_summary_model = Model(
+    "FileSummaryResponse",
     {
         "uuid": fields.String,
         "item_name": fields.String,
         "file_name": fields.String,
         "created_at": fields.String,
         "owner_id": fields.String,
+    },
+)
+
+
+file_info_model = Model.clone(
+    "FileInfoResponse",
+    file_summary_model,
+    {
         "parsed_map": fields.String,
     },
 )
 
 
+file_revision_model = Model.clone(
+    "FileRevisionResponse",
+    file_info_model,
+    {
+        "previous_id": fields.String,
+        "carried_over": fields.List(fields.String),
+        "changed": fields.List(fields.String),
+    },
+)
+
+
 file_info_list_model = Model(
     "FileInfoListResponse",
     {
-        "info": fields.List(fields.Nested(file_info_model)),
+        "info": fields.List(fields.Nested(file_summary_model)),
     },
 )
 
@@ -41,3 +75,35 @@ file_content_model = Model(
         "content": fields.String,
     },
 )
+
+
+project_file_model = Model(
+    "ProjectFileModel",
+    {
+        "uuid": fields.String,
+        "file_name": fields.String,
+    },
+)
+
+
+skipped_file_model = Model(
+    "SkippedFileModel",
+    {
+        "file_name": fields.String,
+        "error": fields.String,
+    },
+)
+
+
+project_info_model = Model(
+    "ProjectInfoResponse",
+    {
+        "uuid": fields.String,
+        "item_name": fields.String,
+        "file_name": fields.String,
+        "created_at": fields.String,
+        "call_graph": fields.String,
+        "files": fields.List(fields.Nested(project_file_model)),
+        "skipped": fields.List(fields.Nested(skipped_file_model)),
+    },
+)
@@ -6,21 +6,35 @@ from flask_restx import Namespace, Resource
 
 from annotator.api.file.business import (
     process_file_upload,
+    process_archive_upload,
+    process_file_revision,
     get_file_info,
     get_file_content,
     delete_file,
 )
 from annotator.api.file.dto import (
     file_upload_parser,
+    archive_upload_parser,
+    file_revision_parser,
+    file_summary_model,
     file_info_model,
+    file_revision_model,
     file_info_list_model,
     file_content_model,
+    project_file_model,
+    skipped_file_model,
+    project_info_model,
 )
 
 file_ns = Namespace(name="file", validate=True)
+file_ns.models[file_summary_model.name] = file_summary_model
 file_ns.models[file_info_model.name] = file_info_model
+file_ns.models[file_revision_model.name] = file_revision_model
 file_ns.models[file_info_list_model.name] = file_info_list_model
 file_ns.models[file_content_model.name] = file_content_model
+file_ns.models[project_file_model.name] = project_file_model
+file_ns.models[skipped_file_model.name] = skipped_file_model
+file_ns.models[project_info_model.name] = project_info_model
 
 
 @file_ns.route("/upload", endpoint="file_upload")
@@ -49,6 +63,25 @@ class UploadFile(Resource):
         return get_file_info()
 
 
+@file_ns.route("/upload/archive", endpoint="file_upload_archive")
+@file_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
+@file_ns.response(int(HTTPStatus.BAD_REQUEST), "Validation error.")
+@file_ns.response(int(HTTPStatus.INTERNAL_SERVER_ERROR), "Internal server error.")
+class UploadArchive(Resource):
+    """Handles HTTP requests to URL: /api/v1/file/upload/archive"""
+
+    @file_ns.doc(security="Bearer")
+    @file_ns.expect(archive_upload_parser)
+    @file_ns.response(int(HTTPStatus.OK), "Archive was successfully uploaded.")
+    @file_ns.marshal_with(project_info_model)
+    def post(self):
+        """Upload a zip or tar.gz archive of Python files as one project."""
+        request_data = archive_upload_parser.parse_args()
+        name = request_data["name"]
+        uploaded_archive = request_data["archive"]
+        return process_archive_upload(name, uploaded_archive)
+
+
 @file_ns.route("/<file_uuid>", endpoint="file_action")
 @file_ns.param("file_uuid", "File UUID.")
 @file_ns.response(int(HTTPStatus.BAD_REQUEST), "Validation error.")
@@ -70,3 +103,23 @@ class FileAction(Resource):
     def delete(self, file_uuid):
         """Delete a file"""
         return delete_file(file_uuid)
+
+
+@file_ns.route("/<file_uuid>/revision", endpoint="file_revision")
+@file_ns.param("file_uuid", "UUID of the previous revision.")
+@file_ns.response(int(HTTPStatus.BAD_REQUEST), "Validation error.")
+@file_ns.response(int(HTTPStatus.NOT_FOUND), "File not found.")
+@file_ns.response(int(HTTPStatus.UNAUTHORIZED), "Token is invalid or expired.")
+@file_ns.response(int(HTTPStatus.INTERNAL_SERVER_ERROR), "Internal server error.")
+class FileRevision(Resource):
+    """Handles HTTP requests to URL: /api/v1/file/{uuid}/revision."""
+
+    @file_ns.doc(security="Bearer")
+    @file_ns.expect(file_revision_parser)
+    @file_ns.response(int(HTTPStatus.OK), "Revision was successfully uploaded.")
+    @file_ns.marshal_with(file_revision_model)
+    def post(self, file_uuid):
+        """Upload a new revision of a file, keeping annotations of unchanged functions."""
+        request_data = file_revision_parser.parse_args()
+        uploaded_file = request_data["file"]
+        return process_file_revision(file_uuid, uploaded_file)
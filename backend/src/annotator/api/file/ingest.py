@@ -0,0 +1,65 @@
+"""Stream an uploaded file to disk while hashing, size-checking and decoding it."""
+
+import codecs
+import hashlib
+import os
+from collections import namedtuple
+from http import HTTPStatus
+
+CHUNK_SIZE = 64 * 1024
+
+TOO_LARGE_ERROR = "Uploaded file exceeds the maximum size of {max_bytes} bytes."
+NOT_UTF8_ERROR = "Uploaded file is not valid UTF-8."
+
+Ingested = namedtuple("Ingested", ["content_hash", "text", "size"])
+
+
+class IngestError(Exception):
+    """Raised when an upload is rejected while it is being written."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def ingest_upload(stream, file_path, max_bytes):
+    """Copy stream to file_path in chunks and return an Ingested tuple.
+
+    Every chunk is fed to a SHA-256 digest and an incremental UTF-8 decoder
+    before it is written, so the upload is read exactly once. When the size
+    limit is exceeded or the data is not valid UTF-8, IngestError is raised
+    right away and the partially written file is removed.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = []
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise IngestError(
+                        TOO_LARGE_ERROR.format(max_bytes=max_bytes),
+                        HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    )
+                parts.append(_decode(decoder, chunk))
+                digest.update(chunk)
+                f.write(chunk)
+            parts.append(_decode(decoder, b"", final=True))
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return Ingested(digest.hexdigest(), "".join(parts), size)
+
+
+def _decode(decoder, chunk, final=False):
+    try:
+        return decoder.decode(chunk, final)
+    except UnicodeDecodeError:
+        raise IngestError(NOT_UTF8_ERROR, HTTPStatus.BAD_REQUEST)
@@ -2,6 +2,10 @@
 # generated with the help of ChatGPT(5.1)
 
 import ast
+from collections import deque
+
+# Bump whenever the parsed_map output changes, so cached maps are not reused.
+PARSER_VERSION = "2"
 
 # ----------------------------
 # Helper functions
@@ -76,6 +80,132 @@ def is_recursive(func_name: str, calls: list):
     return func_name in calls
 
 
+# ----------------------------
+# Single-pass extraction
+# ----------------------------
+
+
+def _expr_to_str(node: ast.expr):
+    """ast.unparse, with a fast path for plain names and dotted attribute chains."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parts = [node.attr]
+        value = node.value
+        while isinstance(value, ast.Attribute):
+            parts.append(value.attr)
+            value = value.value
+        if isinstance(value, ast.Name):
+            parts.append(value.id)
+            return ".".join(reversed(parts))
+    return ast.unparse(node)
+
+
+class FunctionScanner:
+    """
+    Collect returns, calls, control flow and recursion of one function
+    in a single traversal.
+
+    Nodes are visited breadth-first, in the same order as ast.walk, so the
+    result matches extract_returns / extract_calls / detect_control_flow.
+    """
+
+    def __init__(self, func_node: ast.FunctionDef):
+        self.func_name = func_node.name
+        self.returns = []
+        self.calls = []
+        self.has_if = False
+        self.has_while = False
+        self.recursion = False
+        self._scan(func_node)
+
+    def _scan(self, func_node):
+        dispatch = self._DISPATCH
+        todo = deque([func_node])
+        while todo:
+            node = todo.popleft()
+            todo.extend(ast.iter_child_nodes(node))
+            visit = dispatch.get(type(node))
+            if visit is not None:
+                visit(self, node)
+
+    def visit_Return(self, node: ast.Return):
+        if node.value is None:
+            self.returns.append("None")
+            return
+        try:
+            expr = _expr_to_str(node.value)
+        except Exception:
+            expr = "<expr>"
+        self.returns.append(expr)
+
+    def visit_Call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Name):
+            self.calls.append(func.id)
+            if func.id == self.func_name:
+                self.recursion = True
+        elif isinstance(func, ast.Attribute):
+            self.calls.append(f"{_expr_to_str(func.value)}.{func.attr}")
+        else:
+            self.calls.append("<unknown_call>")
+
+    def visit_If(self, node: ast.If):
+        self.has_if = True
+
+    def visit_While(self, node: ast.While):
+        self.has_while = True
+
+    @property
+    def control_flow(self):
+        return {"if": self.has_if, "while": self.has_while}
+
+    _DISPATCH = {
+        ast.Return: visit_Return,
+        ast.Call: visit_Call,
+        ast.If: visit_If,
+        ast.While: visit_While,
+    }
+
+
+# ----------------------------
+# Call graph
+# ----------------------------
+
+
+def build_call_graph(function_entries: list):
+    """
+    Build call_graph and fill called_by for every entry in one linear pass.
+
+    Calls are resolved to functions defined in the same file by their last
+    dotted component (obj.method -> method). Edges are de-duplicated and keep
+    first-seen order. A name defined more than once maps to all of its
+    entries in the name index, so every definition gets its called_by.
+    """
+    index = {}
+    for f in function_entries:
+        index.setdefault(f["name"], []).append(f)
+
+    call_graph = {name: [] for name in index}
+    seen = {name: set() for name in index}
+
+    for f in function_entries:
+        caller = f["name"]
+        callees = call_graph[caller]
+        caller_seen = seen[caller]
+        for c in f["calls"]:
+            name_only = c.rpartition(".")[2]  # strip object prefix: obj.method → method
+            if name_only not in index or name_only in caller_seen:
+                continue
+            # each (caller, callee) pair is seen once, so called_by stays unique
+            caller_seen.add(name_only)
+            callees.append(name_only)
+            for g in index[name_only]:
+                g["called_by"].append(caller)
+
+    return call_graph
+
+
 # ----------------------------
 # Main parser
 # ----------------------------
@@ -104,10 +234,7 @@ def parse_python_file(code: str) -> dict | None:
         if isinstance(node, ast.FunctionDef):
             func_name = node.name
             params = [arg.arg for arg in node.args.args]  # simple param list
-            returns = extract_returns(node)
-            calls = extract_calls(node)
-            control_flow = detect_control_flow(node)
-            recursion = is_recursive(func_name, calls)
+            scanner = FunctionScanner(node)
 
             entry = {
                 "name": func_name,
@@ -116,37 +243,18 @@ def parse_python_file(code: str) -> dict | None:
                     node.end_lineno if hasattr(node, "end_lineno") else node.lineno
                 ),
                 "params": params,
-                "returns": returns,
-                "calls": calls,
+                "returns": scanner.returns,
+                "calls": scanner.calls,
                 "called_by": [],  # fill in second pass
-                "control_flow": control_flow,
-                "recursion": recursion,
+                "control_flow": scanner.control_flow,
+                "recursion": scanner.recursion,
             }
             function_entries.append(entry)
 
     # ----------------------------
     # Second pass: build call_graph & called_by
     # ----------------------------
-    call_graph = {}
-    for f in function_entries:
-        call_graph[f["name"]] = []
-
-    all_names = {f["name"] for f in function_entries}
-
-    # For each function, add edges for calls to other functions in same file
-    for f in function_entries:
-        for c in f["calls"]:
-            # Only keep calls to functions defined in this same file
-            name_only = c.split(".")[-1]  # strip object prefix: obj.method → method
-            if name_only in all_names:
-                call_graph[f["name"]].append(name_only)
-
-    # called_by : reverse graph
-    for f in function_entries:
-        for callee in call_graph[f["name"]]:
-            for g in function_entries:
-                if g["name"] == callee:
-                    g["called_by"].append(f["name"])
+    call_graph = build_call_graph(function_entries)
 
     # ----------------------------
     # Final parsed_map
@@ -0,0 +1,104 @@
+"""Project-level call graph across the files of an uploaded archive."""
+
+import posixpath
+
+
+def module_name(path):
+    """Dotted module name for an archive path: pkg/sub/mod.py -> pkg.sub.mod."""
+    stem = posixpath.splitext(path)[0]
+    parts = [part for part in stem.split("/") if part]
+    if len(parts) > 1 and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def build_project_call_graph(parsed_maps):
+    """
+    Build a call graph over all functions of a project.
+
+    parsed_maps maps a module name to the parsed_map of that module. Nodes are
+    qualified "module.function" names. Calls are resolved in this order:
+    1) a plain name defined in the calling module,
+    2) "module.function" / "alias_of_submodule.function" through the module's
+       extract_imports() results,
+    3) a plain name defined in one of the imported project modules
+       (from module import function).
+    Calls that do not resolve to a project function are left out.
+    """
+    resolver = _ModuleResolver(parsed_maps)
+    defined = {
+        module: {f["name"] for f in parsed_map["functions"]}
+        for module, parsed_map in parsed_maps.items()
+    }
+
+    call_graph = {}
+    for module, parsed_map in parsed_maps.items():
+        imports = [name for name in parsed_map["file"]["imports"] if name]
+        imported = resolver.imported_modules(imports)
+        for f in parsed_map["functions"]:
+            callees = call_graph.setdefault(f"{module}.{f['name']}", [])
+            for call in f["calls"]:
+                target = _resolve_call(
+                    call, module, imports, imported, defined, resolver
+                )
+                if target and target not in callees:
+                    callees.append(target)
+    return call_graph
+
+
+def _resolve_call(call, module, imports, imported, defined, resolver):
+    prefix, _, name = call.rpartition(".")
+    if not prefix:
+        if name in defined[module]:
+            return f"{module}.{name}"
+        for target_module in imported:
+            if name in defined[target_module]:
+                return f"{target_module}.{name}"
+        return None
+    for target_module in resolver.resolve_prefix(prefix, imports, imported):
+        if name in defined[target_module]:
+            return f"{target_module}.{name}"
+    return None
+
+
+class _ModuleResolver:
+    """Map import names to project modules, allowing an extra root directory.
+
+    An archive of "repo/pkg/mod.py" produces module "repo.pkg.mod", while the
+    code imports it as "pkg.mod"; a unique dotted-suffix match resolves that.
+    """
+
+    def __init__(self, modules):
+        self.modules = set(modules)
+        self._suffixes = {}
+        for module in modules:
+            parts = module.split(".")
+            for i in range(len(parts)):
+                self._suffixes.setdefault(".".join(parts[i:]), []).append(module)
+
+    def resolve(self, name):
+        if name in self.modules:
+            return name
+        matches = self._suffixes.get(name, [])
+        return matches[0] if len(matches) == 1 else None
+
+    def imported_modules(self, imports):
+        resolved = []
+        for name in imports:
+            module = self.resolve(name)
+            if module and module not in resolved:
+                resolved.append(module)
+        return resolved
+
+    def resolve_prefix(self, prefix, imports, imported):
+        """Project modules a dotted call prefix may refer to."""
+        candidates = []
+        module = self.resolve(prefix)
+        if module in imported:
+            candidates.append(module)
+        # "from pkg import mod" imports "pkg"; mod.f() refers to pkg.mod
+        for parent in imports:
+            module = self.resolve(f"{parent}.{prefix}")
+            if module and module not in candidates:
+                candidates.append(module)
+        return candidates
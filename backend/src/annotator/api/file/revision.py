@@ -0,0 +1,26 @@
+"""Compare function bodies between two revisions of an uploaded file."""
+
+import hashlib
+
+
+def function_body_hashes(source: bytes, parsed_map: dict):
+    """Map each function name to the SHA-256 of its source lines.
+
+    Lines are taken from start_line to end_line of the parsed_map entry.
+    bytes.splitlines() splits on \\n, \\r\\n and \\r only, the same line
+    endings the parser counts. When a name is defined more than once the last
+    definition wins, as it does when the module runs.
+    """
+    lines = source.splitlines(keepends=True)
+    hashes = {}
+    for function in parsed_map["functions"]:
+        body = b"".join(lines[function["start_line"] - 1 : function["end_line"]])
+        hashes[function["name"]] = hashlib.sha256(body).hexdigest()
+    return hashes
+
+
+def unchanged_functions(old_hashes: dict, new_hashes: dict):
+    """Names of functions whose body is byte-identical in both revisions."""
+    return {
+        name for name, digest in new_hashes.items() if old_hashes.get(name) == digest
+    }
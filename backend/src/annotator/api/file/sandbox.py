@@ -0,0 +1,305 @@
+"""Run parse_python_file in a pool of worker processes with CPU and memory limits."""
+
+import json
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+from flask import current_app
+
+try:
+    import resource
+except ImportError:  # Windows: run without CPU / memory limits
+    resource = None
+
+from annotator.util.result import Result
+
+from .parser import parse_python_file
+
+SYNTAX_ERROR = "Uploaded file contains syntax error."
+TIMEOUT_ERROR = "Uploaded file took too long to parse."
+MEMORY_ERROR = "Uploaded file needs too much memory to parse."
+NESTING_ERROR = "Uploaded file is nested too deeply to parse."
+CRASH_ERROR = "Uploaded file crashed the parser."
+UNAVAILABLE_ERROR = "Parser is unavailable, please try again later."
+
+_ERROR_STATUS = {
+    SYNTAX_ERROR: HTTPStatus.BAD_REQUEST,
+    TIMEOUT_ERROR: HTTPStatus.UNPROCESSABLE_ENTITY,
+    MEMORY_ERROR: HTTPStatus.UNPROCESSABLE_ENTITY,
+    NESTING_ERROR: HTTPStatus.UNPROCESSABLE_ENTITY,
+    CRASH_ERROR: HTTPStatus.UNPROCESSABLE_ENTITY,
+    UNAVAILABLE_ERROR: HTTPStatus.SERVICE_UNAVAILABLE,
+}
+
+# extra wall-clock time before the parent gives up on a job whose CPU limit
+# did not fire (e.g. stuck inside a single long C call)
+_WALL_CLOCK_GRACE_SECONDS = 5
+
+
+class CpuTimeExceeded(Exception):
+    """Raised inside a worker when a job exceeds its CPU time limit."""
+
+
+def error_status(error):
+    """HTTP status code used to reject an upload that failed with error."""
+    return _ERROR_STATUS.get(error, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+
+def parse_in_sandbox(code):
+    """Parse code with the app's parser pool and return a Result.
+
+    On success the Result value is the parsed_map JSON string. On failure the
+    Result error is one of the *_ERROR messages defined in this module.
+    """
+    return _get_pool().parse(code)
+
+
+def parse_many_in_sandbox(codes):
+    """Parse several sources in parallel; returns one Result per source, in order."""
+    return _get_pool().parse_many(codes)
+
+
+def _get_pool():
+    pool = current_app.extensions.get("parser_pool")
+    if pool is None:
+        config = current_app.config
+        pool = current_app.extensions.setdefault(
+            "parser_pool",
+            ParserPool(
+                workers=config.get("PARSER_POOL_WORKERS"),
+                timeout=config.get("PARSER_TIMEOUT_SECONDS"),
+                memory_limit_mb=config.get("PARSER_MEMORY_LIMIT_MB"),
+            ),
+        )
+    return pool
+
+
+class ParserPool:
+    """Process pool that parses uploads away from the request thread.
+
+    Each job runs under a CPU time limit (timeout seconds) and every worker
+    process can grow its address space by at most memory_limit_mb. With
+    workers=0 jobs run inline in the calling thread, without limits.
+    """
+
+    def __init__(self, workers=2, timeout=10, memory_limit_mb=512):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def parse(self, code):
+        if not self.workers:
+            return _to_result(_parse_job(code, cpu_seconds=None))
+        for _ in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_parse_job, code, self.timeout)
+            except BrokenProcessPool:
+                # broken by an earlier job; retry once on a new pool
+                self._restart(executor)
+                continue
+            try:
+                status = future.result(timeout=self._wall_clock_timeout())
+            except TimeoutError:
+                self._restart(executor)
+                return Result.Fail(TIMEOUT_ERROR)
+            except BrokenProcessPool:
+                # a worker died during this job (e.g. killed by the OS for using
+                # too much memory); parsing the same code again would do the same
+                self._restart(executor)
+                return Result.Fail(CRASH_ERROR)
+            return _to_result(status)
+        return Result.Fail(UNAVAILABLE_ERROR)
+
+    def parse_many(self, codes):
+        """Submit all sources at once so they are parsed on every worker in parallel."""
+        if not self.workers or len(codes) <= 1:
+            return [self.parse(code) for code in codes]
+        executor = self._get_executor()
+        try:
+            futures = [executor.submit(_parse_job, code, self.timeout) for code in codes]
+        except BrokenProcessPool:
+            self._restart(executor)
+            return [self.parse(code) for code in codes]
+        wall_clock = self._wall_clock_timeout()
+        deadline = None
+        if wall_clock is not None:
+            rounds = math.ceil(len(codes) / self.workers)
+            deadline = time.monotonic() + wall_clock * rounds
+        results = []
+        restarted = False
+        for code, future in zip(codes, futures):
+            if restarted and not _finished(future):
+                # the restart cancelled the jobs still queued and killed the
+                # ones handed to a worker; parse each of them again alone
+                results.append(self.parse(code))
+                continue
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+            try:
+                results.append(_to_result(future.result(timeout=remaining)))
+            except TimeoutError:
+                self._restart(executor)
+                restarted = True
+                results.append(Result.Fail(TIMEOUT_ERROR))
+            except BrokenProcessPool:
+                # one crash breaks every pending job; parse each of them again
+                # alone, so only the source that crashes a worker is rejected
+                self._restart(executor)
+                restarted = True
+                results.append(self.parse(code))
+            except CancelledError:
+                # cancelled when another request restarted the shared pool
+                results.append(self.parse(code))
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def worker_processes(self):
+        """Worker processes of the current pool that are still running."""
+        with self._lock:
+            executor = self._executor
+        return executor.worker_processes() if executor is not None else []
+
+    def _wall_clock_timeout(self):
+        if not self.timeout:
+            return None
+        return self.timeout + _WALL_CLOCK_GRACE_SECONDS
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = _WorkerPool(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,),
+                )
+            return self._executor
+
+    def _restart(self, executor):
+        """Drop a pool with a stuck or dead worker; the next job starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        # ProcessPoolExecutor cannot cancel a running job, so stop its workers
+        for process in executor.worker_processes():
+            process.terminate()
+
+
+class _WorkerPool(ProcessPoolExecutor):
+    """ProcessPoolExecutor of spawned workers that keeps a handle on each of them."""
+
+    def __init__(self, max_workers, initializer, initargs):
+        self._tracking_context = _TrackingContext("spawn")
+        super().__init__(
+            max_workers=max_workers,
+            mp_context=self._tracking_context,
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def worker_processes(self):
+        """Workers started by this pool that are still running."""
+        return [p for p in self._tracking_context.processes if p.is_alive()]
+
+
+class _TrackingContext:
+    """multiprocessing context that keeps a handle on every process it starts.
+
+    ProcessPoolExecutor starts its workers with mp_context.Process; keeping
+    them here lets a stuck worker be terminated.
+    """
+
+    def __init__(self, method):
+        self._context = multiprocessing.get_context(method)
+        self.processes = []
+
+    def Process(self, *args, **kwargs):
+        process = self._context.Process(*args, **kwargs)
+        self.processes.append(process)
+        return process
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+def _finished(future):
+    """True when future holds the outcome of its job."""
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+def _to_result(status):
+    outcome, payload = status
+    if outcome == "ok":
+        return Result.Ok(payload)
+    return Result.Fail(payload)
+
+
+def _init_worker(memory_limit_mb):
+    if resource is None:
+        return
+    if memory_limit_mb:
+        limit = _address_space_bytes() + memory_limit_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _address_space_bytes():
+    """Current virtual memory size of this process (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return pages * resource.getpagesize()
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuTimeExceeded()
+
+
+def _parse_job(code, cpu_seconds):
+    """Worker entry point: parse code and return an (outcome, payload) tuple."""
+    limited = resource is not None and cpu_seconds
+    if limited:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = usage.ru_utime + usage.ru_stime
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(used + cpu_seconds)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        parsed_map = parse_python_file(code)
+        if parsed_map is None:
+            return ("error", SYNTAX_ERROR)
+        return ("ok", json.dumps(parsed_map))
+    except ValueError:
+        # source code containing null bytes
+        return ("error", SYNTAX_ERROR)
+    except CpuTimeExceeded:
+        return ("error", TIMEOUT_ERROR)
+    except MemoryError:
+        return ("error", MEMORY_ERROR)
+    except RecursionError:
+        return ("error", NESTING_ERROR)
+    finally:
+        if limited:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
@@ -3,6 +3,10 @@
 import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# settings from a .env file in the working directory; real env vars win
+load_dotenv()
 
 HERE = Path(__file__).parent
 SQLITE_DEV = "sqlite:///" + str(HERE / "annotator_dev.db")
@@ -17,9 +21,61 @@ class Config:
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(HERE, "uploads"))
     AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
     AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_KEY")
+    AZURE_OPENAI_API_VERSION = os.getenv(
+        "AZURE_OPENAI_API_VERSION", "2025-01-01-preview"
+    )
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+    PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "256"))
+    PARSER_POOL_WORKERS = int(os.getenv("PARSER_POOL_WORKERS", "2"))
+    PARSER_TIMEOUT_SECONDS = int(os.getenv("PARSER_TIMEOUT_SECONDS", "10"))
+    PARSER_MEMORY_LIMIT_MB = int(os.getenv("PARSER_MEMORY_LIMIT_MB", "512"))
+    ARCHIVE_MAX_MEMBERS = int(os.getenv("ARCHIVE_MAX_MEMBERS", "1000"))
+    ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", str(50 * 1024 * 1024)))
+    ANNOTATION_CACHE_SIZE = int(os.getenv("ANNOTATION_CACHE_SIZE", "1024"))
+    ANNOTATION_CACHE_TTL_SECONDS = int(
+        os.getenv("ANNOTATION_CACHE_TTL_SECONDS", str(24 * 60 * 60))
+    )
+    PROMPT_CONTEXT_HOPS = int(os.getenv("PROMPT_CONTEXT_HOPS", "2"))
+    PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "2000"))
+    ANNOTATION_BATCH_CONCURRENCY = int(os.getenv("ANNOTATION_BATCH_CONCURRENCY", "4"))
+    ANNOTATION_SUMMARY_CHARS = int(os.getenv("ANNOTATION_SUMMARY_CHARS", "240"))
+    ANNOTATION_WORKERS = int(os.getenv("ANNOTATION_WORKERS", "2"))
+    ANNOTATION_JOB_POLL_SECONDS = float(os.getenv("ANNOTATION_JOB_POLL_SECONDS", "2"))
+    ANNOTATION_JOB_LEASE_SECONDS = int(os.getenv("ANNOTATION_JOB_LEASE_SECONDS", "600"))
+    ANNOTATION_JOB_MAX_ATTEMPTS = int(os.getenv("ANNOTATION_JOB_MAX_ATTEMPTS", "3"))
+    ANNOTATION_FLIGHT_LEASE_SECONDS = int(
+        os.getenv("ANNOTATION_FLIGHT_LEASE_SECONDS", "300")
+    )
+    ANNOTATION_FLIGHT_POLL_SECONDS = float(
+        os.getenv("ANNOTATION_FLIGHT_POLL_SECONDS", "0.25")
+    )
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "azure")
+    LLM_STUB_LATENCY_SECONDS = float(os.getenv("LLM_STUB_LATENCY_SECONDS", "1.5"))
+    LLM_STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0.5"))
+    LLM_STUB_ERRORS = os.getenv("LLM_STUB_ERRORS", "")
+    LLM_STUB_COMPLETION_TOKENS = int(os.getenv("LLM_STUB_COMPLETION_TOKENS", "120"))
+    LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+    REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "1"))
+    REVOCATION_GAP_SECONDS = int(os.getenv("REVOCATION_GAP_SECONDS", "60"))
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+    REVOCATION_BLOOM_ERROR_RATE = float(
+        os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001")
+    )
+    TOKEN_PURGE_INTERVAL_SECONDS = int(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+    TOKEN_PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
     BCRYPT_LOG_ROUNDS = 4
+    BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+    BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))
+    BCRYPT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BCRYPT_QUEUE_TIMEOUT_SECONDS", "5"))
     TOKEN_EXPIRE_HOURS = 0
     TOKEN_EXPIRE_MINUTES = 0
+    REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     PRESERVE_CONTEXT_ON_EXCEPTION = False
     SWAGGER_UI_DOC_EXPANSION = "list"
@@ -33,6 +89,10 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = SQLITE_TEST
     UPLOAD_FOLDER = os.path.join(HERE, "test_uploads")
+    PARSER_POOL_WORKERS = 0
+    ANNOTATION_WORKERS = 0
+    TOKEN_PURGE_INTERVAL_SECONDS = 0
+    BCRYPT_WORKERS = 0
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,87 @@
+"""Class definition for AnnotationFlight model."""
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from annotator import db
+from annotator.util.datetime_util import utc_now
+
+
+class AnnotationFlight(db.Model):
+    """AnnotationFlight model: marks that one process is annotating a function.
+
+    There is at most one row per (file_id, function_name). The process whose
+    token is in the row generates the annotation and stores its id in the row
+    when it is done; other processes wait for that instead of calling the
+    model themselves. A row whose lease expired, or whose annotation is done,
+    can be taken over by the next request.
+    """
+
+    __tablename__ = "annotation_flight"
+
+    file_id = db.Column(db.String(36), db.ForeignKey("site_file.uuid"), primary_key=True)
+    function_name = db.Column(db.String(100), primary_key=True)
+    token = db.Column(db.String(36), nullable=False)
+    locked_until = db.Column(db.DateTime, nullable=False)
+    annotation_id = db.Column(db.String(36), nullable=True)
+    file = db.relationship(
+        "File", backref=db.backref("annotation_flights", cascade="all, delete-orphan")
+    )
+
+    def __repr__(self):
+        return (
+            f"<annotation_flight file_id={self.file_id}, "
+            f"function_name={self.function_name}, token={self.token}>"
+        )
+
+    @classmethod
+    def find(cls, file_id, function_name):
+        return cls.query.filter_by(file_id=file_id, function_name=function_name).first()
+
+    @classmethod
+    def acquire(cls, file_id, function_name, token, locked_until):
+        """Try to lead the annotation of function_name; commits.
+
+        Returns True when token now holds the marker, False when another
+        request is generating the annotation.
+        """
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    cls(
+                        file_id=file_id,
+                        function_name=function_name,
+                        token=token,
+                        locked_until=locked_until,
+                    )
+                )
+            db.session.commit()
+            return True
+        except IntegrityError:
+            pass
+        # the previous flight finished, or its process died
+        taken = cls.query.filter(
+            cls.file_id == file_id,
+            cls.function_name == function_name,
+            or_(cls.annotation_id.isnot(None), cls.locked_until < utc_now()),
+        ).update(
+            dict(token=token, locked_until=locked_until, annotation_id=None),
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return bool(taken)
+
+    @classmethod
+    def complete(cls, file_id, function_name, token, annotation_id):
+        """Publish the annotation of the flight held by token. Does not commit."""
+        cls.query.filter_by(
+            file_id=file_id, function_name=function_name, token=token
+        ).update(dict(annotation_id=annotation_id), synchronize_session=False)
+
+    @classmethod
+    def release(cls, file_id, function_name, token):
+        """Give up the flight held by token, so that a waiting request can lead."""
+        cls.query.filter_by(
+            file_id=file_id, function_name=function_name, token=token
+        ).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,73 @@
+"""Class definition for AnnotationJob model."""
+
+from uuid import uuid4
+
+from annotator import db
+from annotator.util.datetime_util import utc_now, localized_dt_string
+
+
+class AnnotationJob(db.Model):
+    """AnnotationJob model: a queued request to annotate one function.
+
+    Workers claim a job by setting locked_by / locked_until. A running job
+    whose lease expired (its worker died) can be claimed again, so jobs
+    survive process restarts.
+    """
+
+    __tablename__ = "annotation_job"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    uuid = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid4()))
+    file_id = db.Column(db.String(36), db.ForeignKey("site_file.uuid"), nullable=False)
+    owner_id = db.Column(
+        db.String(36), db.ForeignKey("site_user.public_id"), nullable=False
+    )
+    function_name = db.Column(db.String(100), nullable=False)
+    use_cache = db.Column(db.Boolean, nullable=False, default=True)
+    status = db.Column(db.String(16), nullable=False, default=QUEUED, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_by = db.Column(db.String(64), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    annotation_id = db.Column(
+        db.String(36), db.ForeignKey("site_annotation.uuid"), nullable=True
+    )
+    created_at = db.Column(db.DateTime, default=utc_now, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    annotation = db.relationship("Annotation")
+    file = db.relationship(
+        "File", backref=db.backref("annotation_jobs", cascade="all, delete-orphan")
+    )
+
+    def __repr__(self):
+        return (
+            f"<annotation_job={self.uuid}, function_name={self.function_name}, "
+            f"status={self.status}>"
+        )
+
+    @classmethod
+    def find_by_uuid(cls, uuid):
+        return cls.query.filter_by(uuid=uuid).first()
+
+    def as_dict(self):
+        return dict(
+            job_id=self.uuid,
+            status=self.status,
+            file_id=self.file_id,
+            function_name=self.function_name,
+            attempts=self.attempts,
+            error=self.error,
+            created_at=localized_dt_string(self.created_at),
+            started_at=_dt_string(self.started_at),
+            finished_at=_dt_string(self.finished_at),
+            annotation=self.annotation.as_dict() if self.annotation else None,
+        )
+
+
+def _dt_string(dt):
+    return localized_dt_string(dt) if dt else None
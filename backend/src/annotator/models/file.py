@@ -1,11 +1,13 @@
 """Class definition for File model."""
 
+import json
 from datetime import datetime, timezone, timedelta
 from uuid import uuid4
 
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from annotator import db
+from annotator.util.packed_map import PackedMap, pack_parsed_map
 from annotator.util.datetime_util import (
     utc_now,
     make_tzaware,
@@ -29,7 +31,15 @@ class File(db.Model):
     annotations = db.relationship(
         "Annotation", backref="file", cascade="all, delete-orphan, delete"
     )
-    parsed_map = db.Column(db.String, nullable=False)
+    # parsed_map in the compact layout of annotator.util.packed_map; deferred so
+    # listing files does not load it until parsed_map is actually read
+    parsed_map_packed = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    project_id = db.Column(
+        db.String(36), db.ForeignKey("site_project.uuid"), nullable=True
+    )
+    previous_id = db.Column(
+        db.String(36), db.ForeignKey("site_file.uuid"), nullable=True
+    )
 
     def __repr__(self):
         return f"<file_name={self.file_name}, item_name={self.item_name}>"
@@ -41,15 +51,54 @@ class File(db.Model):
         )
         return localized_dt_string(created_at_utc, use_tz=get_local_utcoffset())
 
+    @property
+    def parsed_map(self):
+        return json.dumps(self.parsed_map_dict)
+
+    @parsed_map.setter
+    def parsed_map(self, value):
+        self.set_parsed_map(value)
+
+    @property
+    def parsed_map_dict(self):
+        return self.packed_map().unpack()
+
+    def set_parsed_map(self, parsed_map, source=None):
+        """Pack parsed_map (dict or JSON string) into parsed_map_packed.
+
+        With source (the uploaded file as bytes) the byte range of every
+        function is indexed as well, see packed_map().source_span().
+        """
+        if isinstance(parsed_map, str):
+            parsed_map = json.loads(parsed_map)
+        self.parsed_map_packed = pack_parsed_map(parsed_map, source=source)
+
+    def packed_map(self):
+        return PackedMap(self.parsed_map_packed)
+
+    def find_function(self, function_name):
+        """Decode only the parsed_map entry of function_name (None if missing)."""
+        return self.packed_map().function(function_name)
+
     @classmethod
-    def find_by_uuid(cls, uuid):
-        return cls.query.filter_by(uuid=uuid).first()
+    def find_by_uuid(cls, uuid, with_parsed_map=False):
+        """with_parsed_map loads the deferred parsed_map in the same query."""
+        query = cls.query
+        if with_parsed_map:
+            query = query.options(db.undefer(cls.parsed_map_packed))
+        return query.filter_by(uuid=uuid).first()
 
     @classmethod
     def find_by_user_id(cls, user_id):
         return cls.query.filter_by(owner_id=user_id).all()
 
     def as_dict(self):
-        output = {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        """Metadata of the file; parsed_map is left out so that listing files
+        neither loads nor unpacks it."""
+        output = {
+            c.name: getattr(self, c.name)
+            for c in self.__table__.columns
+            if c.name != "parsed_map_packed"
+        }
         output["created_at"] = localized_dt_string(self.created_at)
         return output
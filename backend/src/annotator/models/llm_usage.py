@@ -0,0 +1,99 @@
+"""Class definition for LLMUsage model."""
+
+from sqlalchemy.exc import IntegrityError
+
+from annotator import db
+from annotator.util.datetime_util import utc_now, localized_dt_string
+
+
+class LLMUsage(db.Model):
+    """LLMUsage model: running totals of the LLM calls made for one user and file.
+
+    file_id is not a foreign key, so the totals of a deleted file are kept.
+    """
+
+    __tablename__ = "llm_usage"
+
+    owner_id = db.Column(
+        db.String(36), db.ForeignKey("site_user.public_id"), primary_key=True
+    )
+    file_id = db.Column(db.String(36), primary_key=True)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    cache_hits = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    completion_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_ms_total = db.Column(db.BigInteger, nullable=False, default=0)
+    latency_ms_max = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=utc_now, onupdate=utc_now)
+
+    def __repr__(self):
+        return (
+            f"<llm_usage owner_id={self.owner_id}, file_id={self.file_id}, "
+            f"calls={self.calls}>"
+        )
+
+    @classmethod
+    def find_by_owner_id(cls, owner_id):
+        return cls.query.filter_by(owner_id=owner_id).all()
+
+    @classmethod
+    def add_call(cls, owner_id, file_id, stats):
+        """Add the CallStats of one call to the totals of owner_id and file_id.
+
+        The totals are incremented in SQL, so concurrent calls do not lose
+        updates. Does not commit.
+        """
+        latency_ms = round(stats.latency * 1000)
+        values = dict(
+            calls=cls.calls + 1,
+            cache_hits=cls.cache_hits + int(stats.cache_hit),
+            errors=cls.errors + int(stats.error),
+            retries=cls.retries + stats.retries,
+            prompt_tokens=cls.prompt_tokens + stats.prompt_tokens,
+            completion_tokens=cls.completion_tokens + stats.completion_tokens,
+            latency_ms_total=cls.latency_ms_total + latency_ms,
+            latency_ms_max=db.case(
+                (cls.latency_ms_max < latency_ms, latency_ms),
+                else_=cls.latency_ms_max,
+            ),
+            updated_at=utc_now(),
+        )
+        query = cls.query.filter_by(owner_id=owner_id, file_id=file_id)
+        if query.update(values, synchronize_session=False):
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    cls(
+                        owner_id=owner_id,
+                        file_id=file_id,
+                        calls=1,
+                        cache_hits=int(stats.cache_hit),
+                        errors=int(stats.error),
+                        retries=stats.retries,
+                        prompt_tokens=stats.prompt_tokens,
+                        completion_tokens=stats.completion_tokens,
+                        latency_ms_total=latency_ms,
+                        latency_ms_max=latency_ms,
+                    )
+                )
+        except IntegrityError:
+            # another request created the row first
+            query.update(values, synchronize_session=False)
+
+    def as_dict(self):
+        return dict(
+            owner_id=self.owner_id,
+            file_id=self.file_id,
+            calls=self.calls,
+            cache_hits=self.cache_hits,
+            errors=self.errors,
+            retries=self.retries,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            latency_ms_mean=self.latency_ms_total / self.calls if self.calls else 0,
+            latency_ms_max=self.latency_ms_max,
+            updated_at=localized_dt_string(self.updated_at),
+        )
@@ -0,0 +1,27 @@
+"""Class definition for ParseCache model."""
+
+from annotator import db
+from annotator.util.datetime_util import utc_now
+
+
+class ParseCache(db.Model):
+    """ParseCache model for storing parsed_map JSON by source content hash."""
+
+    __tablename__ = "parse_cache"
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    parser_version = db.Column(db.String(16), primary_key=True)
+    parsed_map = db.Column(db.String, nullable=False)
+    created_at = db.Column(db.DateTime, default=utc_now)
+
+    def __repr__(self):
+        return (
+            f"<ParseCache content_hash={self.content_hash}, "
+            f"parser_version={self.parser_version}>"
+        )
+
+    @classmethod
+    def find(cls, content_hash, parser_version):
+        return cls.query.filter_by(
+            content_hash=content_hash, parser_version=parser_version
+        ).first()
@@ -0,0 +1,48 @@
+"""Class definition for Project model."""
+
+from datetime import timezone
+from uuid import uuid4
+
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from annotator import db
+from annotator.util.datetime_util import (
+    utc_now,
+    make_tzaware,
+    localized_dt_string,
+    get_local_utcoffset,
+)
+
+
+class Project(db.Model):
+    """Project model for files uploaded together in one archive."""
+
+    __tablename__ = "site_project"
+
+    uuid = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid4()))
+    item_name = db.Column(db.String(100), nullable=False)
+    file_name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=utc_now)
+    owner_id = db.Column(
+        db.String(36), db.ForeignKey("site_user.public_id"), nullable=False
+    )
+    call_graph = db.Column(db.String, nullable=False)
+    files = db.relationship("File", backref="project")
+
+    def __repr__(self):
+        return f"<file_name={self.file_name}, item_name={self.item_name}>"
+
+    @hybrid_property
+    def created_at_str(self):
+        created_at_utc = make_tzaware(
+            self.created_at, use_tz=timezone.utc, localize=False
+        )
+        return localized_dt_string(created_at_utc, use_tz=get_local_utcoffset())
+
+    @classmethod
+    def find_by_uuid(cls, uuid):
+        return cls.query.filter_by(uuid=uuid).first()
+
+    @classmethod
+    def find_by_user_id(cls, user_id):
+        return cls.query.filter_by(owner_id=user_id).all()
@@ -0,0 +1,105 @@
+"""Class definition for RefreshToken model."""
+
+import hashlib
+import secrets
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import current_app
+
+from annotator import db
+from annotator.models.user import User
+from annotator.util.datetime_util import utc_now
+
+
+class RefreshToken(db.Model):
+    """RefreshToken model: one long-lived token that mints access tokens.
+
+    Only the SHA-256 of the token is stored; the token itself is 256 random
+    bits, so a fast hash is enough. Every refresh uses up its token and
+    issues the next one of the same family (one family per login). Using a
+    token a second time means it was copied: the whole family is revoked.
+    """
+
+    __tablename__ = "refresh_token"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    family_id = db.Column(db.String(36), nullable=False, index=True)
+    owner_id = db.Column(
+        db.String(36), db.ForeignKey("site_user.public_id"), nullable=False
+    )
+    issued_at = db.Column(db.DateTime, default=utc_now)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    used_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<refresh_token family_id={self.family_id}, owner_id={self.owner_id}>"
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def issue(cls, owner_id, family_id=None):
+        """Add a new token of family_id (a new family if None) to the session
+        without committing; returns (row, token)."""
+        token = secrets.token_urlsafe(32)
+        days = current_app.config.get("REFRESH_TOKEN_EXPIRE_DAYS")
+        row = cls(
+            token_hash=cls.hash_token(token),
+            family_id=family_id or str(uuid4()),
+            owner_id=owner_id,
+            expires_at=utc_now() + timedelta(days=days),
+        )
+        db.session.add(row)
+        return row, token
+
+    @classmethod
+    def find_with_owner(cls, token):
+        """(RefreshToken, User) of an unexpired token, or None; one query on
+        the unique token_hash index."""
+        return (
+            db.session.query(cls, User)
+            .join(User, User.public_id == cls.owner_id)
+            .filter(cls.token_hash == cls.hash_token(token), cls.expires_at > utc_now())
+            .first()
+        )
+
+    @classmethod
+    def use(cls, row_id):
+        """Mark a token used; False when it was already used or revoked (by a
+        concurrent refresh, for instance). Does not commit."""
+        used = cls.query.filter(
+            cls.id == row_id, cls.used_at.is_(None), cls.revoked_at.is_(None)
+        ).update(dict(used_at=utc_now()), synchronize_session=False)
+        return bool(used)
+
+    @classmethod
+    def revoke_family(cls, family_id):
+        """Revoke every unrevoked token of family_id. Does not commit."""
+        cls.query.filter(cls.family_id == family_id, cls.revoked_at.is_(None)).update(
+            dict(revoked_at=utc_now()), synchronize_session=False
+        )
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """Delete expired tokens, batch_size rows per transaction; returns the
+        number of rows deleted."""
+        deleted = 0
+        now = utc_now()
+        while True:
+            ids = [
+                row_id
+                for (row_id,) in db.session.query(cls.id)
+                .filter(cls.expires_at < now)
+                .order_by(cls.expires_at)
+                .limit(batch_size)
+            ]
+            if ids:
+                cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+            if len(ids) < batch_size:
+                return deleted
@@ -1,29 +1,222 @@
 """Class definition for BlacklistedToken."""
 
+import hashlib
+import heapq
+import threading
+import time
 from datetime import timezone
 
+from flask import current_app
+
 from annotator import db
-from annotator.util.datetime_util import utc_now, dtaware_fromtimestamp
+from annotator.util.bloom import BloomFilter
+from annotator.util.datetime_util import utc_now, dtaware_fromtimestamp, make_tzaware
 
 
 class BlacklistedToken(db.Model):
-    """BlacklistedToken Model for storing JWT tokens."""
+    """BlacklistedToken Model for storing the ids of revoked JWT tokens.
+
+    jti is the token's jti claim, or the SHA-256 of tokens issued without one.
+    """
 
     __tablename__ = "token_blacklist"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    token = db.Column(db.String(500), unique=True, nullable=False)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
     blacklisted_on = db.Column(db.DateTime, default=utc_now)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
 
-    def __init__(self, token, expires_at):
-        self.token = token
+    def __init__(self, jti, expires_at):
+        self.jti = jti
         self.expires_at = dtaware_fromtimestamp(expires_at, use_tz=timezone.utc)
 
     def __repr__(self):
-        return f"<BlacklistToken token={self.token}>"
+        return f"<BlacklistToken jti={self.jti}>"
+
+    @staticmethod
+    def token_id(token, payload):
+        """Fixed-size id of a decoded token, stored instead of the token."""
+        jti = payload.get("jti")
+        if jti:
+            return jti
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def blacklist(cls, jti, expires_at):
+        """Store jti as revoked until expires_at (UNIX time); commits."""
+        db.session.add(cls(jti, expires_at))
+        db.session.commit()
+        revocation_cache().add(jti, expires_at)
+
+    @classmethod
+    def check_blacklist(cls, jti):
+        return revocation_cache().is_revoked(jti)
 
     @classmethod
-    def check_blacklist(cls, token):
-        exists = cls.query.filter_by(token=token).first()
+    def query_blacklist(cls, jti):
+        """Look jti up in the table, bypassing the cache."""
+        exists = db.session.query(cls.id).filter_by(jti=jti).first()
         return True if exists else False
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """Delete the rows of expired tokens, batch_size rows per transaction.
+
+        Returns the number of rows deleted. Short transactions keep the table
+        available to logins and logouts while a large backlog is purged.
+        """
+        deleted = 0
+        now = utc_now()
+        while True:
+            ids = [
+                row_id
+                for (row_id,) in db.session.query(cls.id)
+                .filter(cls.expires_at < now)
+                .order_by(cls.expires_at)
+                .limit(batch_size)
+            ]
+            if ids:
+                cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+            if len(ids) < batch_size:
+                return deleted
+
+
+class RevocationCache:
+    """Process-local copy of the unexpired rows of token_blacklist.
+
+    A token id that is not in the Bloom filter is not revoked, which answers
+    almost every request without a query. A filter hit is confirmed against
+    the exact set of revoked ids, and only a false positive (about error_rate
+    of the unrevoked tokens) goes to the table.
+
+    Tokens blacklisted by other processes are picked up by an incremental
+    sync, at most every sync_seconds: rows with an id above the last one
+    seen, plus ids that were skipped by the last syncs, as an insert may
+    commit after a later id did. A skipped id is retried for gap_seconds.
+    Entries are dropped once their token expired, since decoding rejects an
+    expired token before asking the cache.
+    """
+
+    def __init__(
+        self, sync_seconds=1.0, gap_seconds=60, capacity=100000, error_rate=0.001
+    ):
+        self.sync_seconds = sync_seconds
+        self.gap_seconds = gap_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._revoked = {}
+        self._expiry = []
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = None
+        self._gaps = {}
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        self._sync_if_due()
+        if jti not in self._bloom:
+            return False
+        if jti in self._revoked:
+            return True
+        return BlacklistedToken.query_blacklist(jti)
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._insert(jti, expires_at)
+
+    def _sync_if_due(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+            return
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+                return
+            if self._last_id is None:
+                self._load()
+            else:
+                self._sync()
+            self._prune()
+            self._synced_at = time.monotonic()
+
+    def _load(self):
+        # read the last id first: a row committed after it is left to _sync
+        last_id = db.session.query(db.func.max(BlacklistedToken.id)).scalar() or 0
+        query = db.session.query(
+            BlacklistedToken.jti, BlacklistedToken.expires_at
+        ).filter(BlacklistedToken.id <= last_id, BlacklistedToken.expires_at > utc_now())
+        for jti, expires_at in query:
+            self._insert(jti, _timestamp(expires_at))
+        self._last_id = last_id
+
+    def _sync(self):
+        condition = BlacklistedToken.id > self._last_id
+        if self._gaps:
+            condition = db.or_(condition, BlacklistedToken.id.in_(self._gaps))
+        rows = db.session.query(
+            BlacklistedToken.id, BlacklistedToken.jti, BlacklistedToken.expires_at
+        ).filter(condition)
+        now = time.time()
+        seen = set()
+        for row_id, jti, expires_at in rows:
+            seen.add(row_id)
+            self._gaps.pop(row_id, None)
+            self._insert(jti, _timestamp(expires_at))
+        last_id = max(seen, default=self._last_id)
+        for missing in range(self._last_id + 1, last_id):
+            if missing not in seen:
+                self._gaps[missing] = now
+        self._last_id = max(self._last_id, last_id)
+        self._gaps = {
+            gap: found
+            for gap, found in self._gaps.items()
+            if now - found < self.gap_seconds
+        }
+
+    def _insert(self, jti, expires_at):
+        if jti not in self._revoked:
+            self._revoked[jti] = expires_at
+            heapq.heappush(self._expiry, (expires_at, jti))
+            self._bloom.add(jti)
+
+    def _prune(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            del self._revoked[jti]
+        # the filter keeps expired tokens and gets less accurate past its
+        # capacity: rebuild it from the live ones
+        bloom = self._bloom
+        if len(bloom) > bloom.capacity or len(bloom) - len(self._revoked) > (
+            bloom.capacity // 2
+        ):
+            bloom = BloomFilter(
+                max(self.capacity, 2 * len(self._revoked)), self.error_rate
+            )
+            for jti in self._revoked:
+                bloom.add(jti)
+            self._bloom = bloom
+
+
+def revocation_cache():
+    cache = current_app.extensions.get("revocation_cache")
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault(
+            "revocation_cache",
+            RevocationCache(
+                sync_seconds=config["REVOCATION_SYNC_SECONDS"],
+                gap_seconds=config["REVOCATION_GAP_SECONDS"],
+                capacity=config["REVOCATION_BLOOM_CAPACITY"],
+                error_rate=config["REVOCATION_BLOOM_ERROR_RATE"],
+            ),
+        )
+    return cache
+
+
+def _timestamp(dt):
+    # SQLite returns naive datetimes, stored in UTC
+    if dt.tzinfo is None:
+        dt = make_tzaware(dt, use_tz=timezone.utc, localize=False)
+    return dt.timestamp()
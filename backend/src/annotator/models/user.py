@@ -9,6 +9,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 
 from annotator import db, bcrypt
 from annotator.models.token_blacklist import BlacklistedToken
+from annotator.util.bounded_executor import BoundedExecutor
 from annotator.util.datetime_util import (
     utc_now,
     get_local_utcoffset,
@@ -48,12 +49,25 @@ class User(db.Model):
 
     @password.setter
     def password(self, password):
+        """Hash password on the password hasher threads; raises Overloaded
+        when they are busy."""
         log_rounds = current_app.config.get("BCRYPT_LOG_ROUNDS")
-        hash_bytes = bcrypt.generate_password_hash(password, log_rounds)
+        hash_bytes = password_hasher().run(
+            bcrypt.generate_password_hash, password, log_rounds
+        )
         self.password_hash = hash_bytes.decode("utf-8")
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """Check password on the password hasher threads; raises Overloaded
+        when they are busy."""
+        return password_hasher().run(
+            bcrypt.check_password_hash, self.password_hash, password
+        )
+
+    def needs_rehash(self):
+        """True when the hash was made with other than the configured rounds."""
+        rounds = int(self.password_hash.split("$")[2])
+        return rounds != current_app.config.get("BCRYPT_LOG_ROUNDS")
 
     @classmethod
     def find_by_email(cls, email):
@@ -63,14 +77,20 @@ class User(db.Model):
     def find_by_public_id(cls, public_id):
         return cls.query.filter_by(public_id=public_id).first()
 
-    def encode_access_token(self):
+    def encode_access_token(self, family_id=None):
+        """family_id is the refresh token family the access token was issued
+        with; logging out with the access token revokes that family."""
         now = datetime.now(timezone.utc)
         token_age_h = current_app.config.get("TOKEN_EXPIRE_HOURS")
         token_age_m = current_app.config.get("TOKEN_EXPIRE_MINUTES")
         expire = now + timedelta(hours=token_age_h, minutes=token_age_m)
         if current_app.config["TESTING"]:
             expire = now + timedelta(seconds=5)
-        payload = dict(exp=expire, iat=now, sub=self.public_id, admin=self.admin)
+        payload = dict(
+            exp=expire, iat=now, jti=uuid4().hex, sub=self.public_id, admin=self.admin
+        )
+        if family_id is not None:
+            payload["fam"] = family_id
         key = current_app.config.get("SECRET_KEY")
         return jwt.encode(payload, key, algorithm="HS256")
 
@@ -91,13 +111,38 @@ class User(db.Model):
             error = "Invalid token. Please log in again."
             return Result.Fail(error)
 
-        if BlacklistedToken.check_blacklist(access_token):
+        jti = BlacklistedToken.token_id(access_token, payload)
+        if BlacklistedToken.check_blacklist(jti):
             error = "Token blacklisted. Please log in again."
             return Result.Fail(error)
         token_payload = dict(
             public_id=payload["sub"],
             admin=payload["admin"],
             token=access_token,
+            jti=jti,
             expires_at=payload["exp"],
+            family_id=payload.get("fam"),
         )
         return Result.Ok(token_payload)
+
+
+def password_hasher():
+    """The app's BoundedExecutor for bcrypt work.
+
+    bcrypt releases the GIL, so its threads hash in parallel while request
+    threads only wait; the bound keeps a login spike from queueing more work
+    than the CPUs can do before clients time out.
+    """
+    hasher = current_app.extensions.get("password_hasher")
+    if hasher is None:
+        config = current_app.config
+        hasher = current_app.extensions.setdefault(
+            "password_hasher",
+            BoundedExecutor(
+                workers=config["BCRYPT_WORKERS"],
+                max_queue=config["BCRYPT_MAX_QUEUE"],
+                queue_timeout=config["BCRYPT_QUEUE_TIMEOUT_SECONDS"],
+                name="bcrypt",
+            ),
+        )
+    return hasher
@@ -0,0 +1,54 @@
+"""Thread pool that rejects work instead of queueing it without bound."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when a job is rejected because the executor is busy."""
+
+
+class BoundedExecutor:
+    """Run jobs on workers threads with at most max_queue jobs waiting.
+
+    run() raises Overloaded right away when the queue is full, and when its
+    job waited more than queue_timeout seconds for a thread; such a job is
+    dropped without running. With workers=0 jobs run inline in the calling
+    thread.
+    """
+
+    def __init__(self, workers, max_queue=64, queue_timeout=5, name="bounded"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = (
+            threading.BoundedSemaphore(workers + max_queue) if workers else None
+        )
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            if workers
+            else None
+        )
+
+    def run(self, fn, *args, **kwargs):
+        if not self.workers:
+            return fn(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        try:
+            future = self._executor.submit(self._job, time.monotonic(), fn, args, kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _job(self, queued_at, fn, args, kwargs):
+        if time.monotonic() - queued_at > self.queue_timeout:
+            raise Overloaded()
+        return fn(*args, **kwargs)
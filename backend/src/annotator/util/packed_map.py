@@ -0,0 +1,213 @@
+"""Compact binary layout for parsed_map dictionaries with a function-name index.
+
+Layout (all integers big-endian):
+
+    magic     b"PMAP"
+    version   u8
+    count     u32                      number of function entries
+    index     count * (u16 name length, name, u32 offset, u32 length,
+                       u32 source start, u32 source end)
+    meta      u32 length, zlib(JSON {"file": ..., "call_graph": ..., "json_size": ...})
+    entries   zlib(compact JSON) of every function entry, back to back
+
+Offsets in the index are relative to the start of the entries section, so a
+reader can find and decode one function entry without touching the others.
+Source start / end are the byte range of the function in the uploaded file
+(NO_SPAN when the source was not available). Version 1 blobs have no source
+range in the index and are still readable.
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = b"PMAP"
+VERSION = 2
+NO_SPAN = 0xFFFFFFFF
+
+_HEADER = struct.Struct(">4sBI")
+_NAME_LEN = struct.Struct(">H")
+_SPAN = struct.Struct(">II")
+_SOURCE_SPAN = struct.Struct(">II")
+_LENGTH = struct.Struct(">I")
+
+
+class PackedMapError(ValueError):
+    """Raised when a blob is not a packed parsed_map."""
+
+
+def pack_parsed_map(parsed_map, source=None):
+    """Serialize a parsed_map dict into the packed layout.
+
+    source is the uploaded file as bytes; when given, the byte range of every
+    function is stored in the index so its code can be read with one seek.
+    """
+    line_starts = _line_starts(source) if source is not None else None
+    index = []
+    entries = []
+    offset = 0
+    for function in parsed_map["functions"]:
+        entry = _compress(function)
+        name = function["name"].encode("utf-8")
+        start, end = _source_span(function, line_starts)
+        index.append(
+            _NAME_LEN.pack(len(name))
+            + name
+            + _SPAN.pack(offset, len(entry))
+            + _SOURCE_SPAN.pack(start, end)
+        )
+        entries.append(entry)
+        offset += len(entry)
+    meta = _compress(
+        {
+            "file": parsed_map["file"],
+            "call_graph": parsed_map.get("call_graph", {}),
+            "json_size": len(json.dumps(parsed_map)),
+        }
+    )
+    return b"".join(
+        [
+            _HEADER.pack(MAGIC, VERSION, len(entries)),
+            *index,
+            _LENGTH.pack(len(meta)),
+            meta,
+            *entries,
+        ]
+    )
+
+
+def unpack_parsed_map(blob):
+    """Decode a whole packed parsed_map back into the original dict."""
+    return PackedMap(blob).unpack()
+
+
+def read_function(blob, name):
+    """Decode only the entry of function name (None if it is not defined)."""
+    return PackedMap(blob).function(name)
+
+
+def read_meta(blob):
+    """Decode only the file metadata, call_graph and JSON size of a packed parsed_map."""
+    return PackedMap(blob).meta()
+
+
+def function_names(blob):
+    """Names of all function entries, in source order, without decoding them."""
+    return PackedMap(blob).names()
+
+
+def _compress(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _decompress(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _line_starts(source):
+    """Byte offset of the start of every line, plus the length of source.
+
+    Lines end at LF, CRLF or CR like in the tokenizer, so line numbers match
+    the ones reported by ast.
+    """
+    starts = [0]
+    for line in source.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line))
+    return starts
+
+
+def _source_span(function, line_starts):
+    if line_starts is None:
+        return NO_SPAN, NO_SPAN
+    start_line = function.get("start_line")
+    end_line = function.get("end_line")
+    if not start_line or not end_line:
+        return NO_SPAN, NO_SPAN
+    last = len(line_starts) - 1
+    start = line_starts[min(start_line - 1, last)]
+    end = line_starts[min(end_line, last)]
+    return start, end
+
+
+class PackedMap:
+    """Parse the header and index of a packed blob; decode sections on demand.
+
+    When a name is defined more than once, lookups return the last definition,
+    as it is the one bound when the module runs.
+    """
+
+    def __init__(self, blob):
+        self.view = memoryview(blob)
+        try:
+            magic, version, count = _HEADER.unpack_from(self.view, 0)
+        except struct.error:
+            raise PackedMapError("blob is too short to be a packed parsed_map")
+        if magic != MAGIC or version not in (1, VERSION):
+            raise PackedMapError(f"unsupported packed parsed_map {magic!r} v{version}")
+        pos = _HEADER.size
+        self.index = []
+        for _ in range(count):
+            (name_len,) = _NAME_LEN.unpack_from(self.view, pos)
+            pos += _NAME_LEN.size
+            name = bytes(self.view[pos : pos + name_len]).decode("utf-8")
+            pos += name_len
+            offset, length = _SPAN.unpack_from(self.view, pos)
+            pos += _SPAN.size
+            span = None
+            if version >= 2:
+                start, end = _SOURCE_SPAN.unpack_from(self.view, pos)
+                pos += _SOURCE_SPAN.size
+                if start != NO_SPAN:
+                    span = (start, end)
+            self.index.append((name, offset, length, span))
+        (meta_len,) = _LENGTH.unpack_from(self.view, pos)
+        pos += _LENGTH.size
+        self._meta = (pos, meta_len)
+        self._entries_start = pos + meta_len
+
+    def names(self):
+        return [name for name, _, _, _ in self.index]
+
+    def meta(self):
+        pos, length = self._meta
+        return _decompress(self.view[pos : pos + length])
+
+    def function(self, name):
+        found = self._lookup(name)
+        if found is None:
+            return None
+        _, offset, length, _ = found
+        return self._entry(offset, length)
+
+    def json_size(self):
+        """Length of json.dumps() of the whole parsed_map."""
+        size = self.meta().get("json_size")
+        if size is None:
+            # packed before the size was recorded
+            size = len(json.dumps(self.unpack()))
+        return size
+
+    def source_span(self, name):
+        """(start, end) byte range of function name in the uploaded file, or None."""
+        found = self._lookup(name)
+        return found[3] if found is not None else None
+
+    def unpack(self):
+        meta = self.meta()
+        return {
+            "file": meta["file"],
+            "functions": [
+                self._entry(offset, length) for _, offset, length, _ in self.index
+            ],
+            "call_graph": meta["call_graph"],
+        }
+
+    def _lookup(self, name):
+        for found in reversed(self.index):
+            if found[0] == name:
+                return found
+        return None
+
+    def _entry(self, offset, length):
+        start = self._entries_start + offset
+        return _decompress(self.view[start : start + length])
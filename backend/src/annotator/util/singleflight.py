@@ -0,0 +1,54 @@
+"""Collapse concurrent calls for the same key into one."""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key for all callers that ask while it is running.
+
+    The first caller for a key runs fn; callers that arrive before it returns
+    wait for it and get the same return value, or the same exception. Once
+    the call finished, the next caller for the key runs fn again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def waiters(self, key):
+        """Number of callers waiting for the running call of key."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call is not None else 0
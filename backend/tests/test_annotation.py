@@ -0,0 +1,273 @@
+"""Endpoint tests for the annotation_ns namespace"""
+
+import io
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+from flask import url_for
+from openai.types import CompletionUsage
+
+from annotator.api.annotation.gateway import UNAVAILABLE_ERROR, LLMError
+from annotator.models.annotation import Annotation
+from tests.test_file import upload_file
+from tests.util import register_user, login_user
+
+CODE = b"""
+def foo(x):
+    return bar(x)
+
+def bar(y):
+    return y
+"""
+
+
+def mock_client(*replies):
+    client = MagicMock()
+    responses = []
+    for reply in replies:
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = reply
+        response.usage = CompletionUsage(
+            prompt_tokens=300, completion_tokens=40, total_tokens=340
+        )
+        responses.append(response)
+    client.chat.completions.create.side_effect = responses
+    return client
+
+
+def generate(client, access_token, file_uuid, function_name, **extra):
+    return client.post(
+        url_for("api.annotation_generate"),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"file_uuid": file_uuid, "function_name": function_name, **extra},
+    )
+
+
+def upload_and_login(client):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    response = upload_file(client, access_token, io.BytesIO(CODE), "a.py", "item")
+    return access_token, response.json["uuid"]
+
+
+def test_generate_annotation(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    llm = mock_client("foo calls bar")
+    with patch("annotator.api.annotation.util.get_client", return_value=llm):
+        response = generate(client, access_token, file_uuid, "foo")
+    assert response.status_code == 200
+    assert response.json["annotation"] == "foo calls bar"
+    assert response.json["function_name"] == "foo"
+    messages = llm.chat.completions.create.call_args.kwargs["messages"]
+    assert "def foo(x):\n    return bar(x)\n" in messages[1]["content"]
+
+
+def test_generate_annotation_uses_cache(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    llm = mock_client("first", "second", "third")
+    with patch("annotator.api.annotation.util.get_client", return_value=llm):
+        first = generate(client, access_token, file_uuid, "foo")
+        cached = generate(client, access_token, file_uuid, "foo")
+        assert llm.chat.completions.create.call_count == 1
+        assert cached.json["annotation"] == first.json["annotation"] == "first"
+
+        bypassed = generate(client, access_token, file_uuid, "foo", no_cache="true")
+        assert llm.chat.completions.create.call_count == 2
+        assert bypassed.json["annotation"] == "second"
+        # the bypass refreshed the cached entry
+        assert generate(client, access_token, file_uuid, "foo").json["annotation"] == (
+            "second"
+        )
+
+        # a different function is a different prompt
+        other = generate(client, access_token, file_uuid, "bar")
+        assert other.json["annotation"] == "third"
+        assert llm.chat.completions.create.call_count == 3
+
+
+def test_generate_annotation_llm_unavailable(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    with patch(
+        "annotator.api.annotation.business.chat",
+        side_effect=LLMError(UNAVAILABLE_ERROR),
+    ):
+        response = generate(client, access_token, file_uuid, "foo")
+    assert response.status_code == 503
+    assert response.json["message"] == UNAVAILABLE_ERROR
+
+
+def generate_batch(client, access_token, file_uuid, function_names=None, **extra):
+    data = {"file_uuid": file_uuid, **extra}
+    if function_names is not None:
+        data["function_name"] = function_names
+    return client.post(
+        url_for("api.annotation_generate_batch"),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data=data,
+    )
+
+
+def test_generate_batch_annotates_all_functions(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    # both calls must be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        barrier.wait()
+        return f"about {function_name}"
+
+    with patch("annotator.api.annotation.business.chat", side_effect=fake_chat):
+        response = generate_batch(client, access_token, file_uuid)
+    assert response.status_code == 200
+    assert response.json["errors"] == []
+    annotations = {
+        a["function_name"]: a["annotation"] for a in response.json["annotations"]
+    }
+    assert annotations == {"foo": "about foo", "bar": "about bar"}
+    assert len(Annotation.find_by_file_id(file_uuid)) == 2
+
+
+def test_generate_batch_reports_errors_per_function(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        if function_name == "bar":
+            raise LLMError(UNAVAILABLE_ERROR)
+        return f"about {function_name}"
+
+    with patch("annotator.api.annotation.business.chat", side_effect=fake_chat):
+        response = generate_batch(
+            client, access_token, file_uuid, ["foo", "bar", "missing", "foo"]
+        )
+    assert response.status_code == 200
+    assert [a["function_name"] for a in response.json["annotations"]] == ["foo"]
+    assert response.json["errors"] == [
+        {"function_name": "missing", "error": "Function not found in file."},
+        {"function_name": "bar", "error": UNAVAILABLE_ERROR},
+    ]
+    assert [a.function_name for a in Annotation.find_by_file_id(file_uuid)] == ["foo"]
+
+
+CHAIN = b"""
+def a():
+    return b()
+
+def b():
+    return c()
+
+def c():
+    return d()
+
+def d():
+    return e()
+
+def e():
+    return 1
+"""
+
+
+def test_generate_batch_trims_prompt_context(client, db, upload_folder):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    response = upload_file(client, access_token, io.BytesIO(CHAIN), "c.py", "chain")
+    file_uuid = response.json["uuid"]
+    contexts = {}
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        contexts[function_name] = json.loads(parsed_map)
+        return f"about {function_name}"
+
+    with patch("annotator.api.annotation.business.chat", side_effect=fake_chat):
+        response = generate_batch(client, access_token, file_uuid, ["a", "c"])
+    assert response.status_code == 200
+    assert "functions" not in contexts["a"]
+    assert contexts["a"]["function"]["name"] == "a"
+    # PROMPT_CONTEXT_HOPS is 2
+    assert [n["name"] for n in contexts["a"]["neighbours"]] == ["b", "c"]
+    assert sorted(n["name"] for n in contexts["c"]["neighbours"]) == [
+        "a",
+        "b",
+        "d",
+        "e",
+    ]
+
+
+def test_generate_batch_file_not_found(client, db, upload_folder):
+    access_token, _ = upload_and_login(client)
+    response = generate_batch(client, access_token, "no-such-file")
+    assert response.status_code == 404
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.chunks = []
+        for piece in pieces:
+            chunk = MagicMock()
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = piece
+            chunk.usage = None
+            self.chunks.append(chunk)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+def read_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return events
+
+
+def generate_stream(client, access_token, file_uuid, function_name):
+    return client.post(
+        url_for("api.annotation_generate_stream"),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"file_uuid": file_uuid, "function_name": function_name},
+    )
+
+
+def test_generate_stream(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    llm = MagicMock()
+    llm.chat.completions.create.return_value = FakeStream(["foo ", "calls ", "bar"])
+    with patch("annotator.api.annotation.util.get_client", return_value=llm):
+        response = generate_stream(client, access_token, file_uuid, "foo")
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = read_events(response)
+        assert events[:3] == [
+            ("token", {"text": "foo "}),
+            ("token", {"text": "calls "}),
+            ("token", {"text": "bar"}),
+        ]
+        event, annotation = events[3]
+        assert event == "done"
+        assert annotation["annotation"] == "foo calls bar"
+        assert Annotation.find_by_uuid(annotation["uuid"]).annotation == "foo calls bar"
+        assert llm.chat.completions.create.call_args.kwargs["stream"] is True
+
+        # the streamed text was cached as a whole
+        cached = read_events(generate_stream(client, access_token, file_uuid, "foo"))
+        assert cached[0] == ("token", {"text": "foo calls bar"})
+        assert llm.chat.completions.create.call_count == 1
+
+
+def test_generate_stream_reports_llm_error(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    with patch(
+        "annotator.api.annotation.business.chat_stream",
+        side_effect=LLMError(UNAVAILABLE_ERROR),
+    ):
+        events = read_events(generate_stream(client, access_token, file_uuid, "foo"))
+    assert events == [("error", {"message": UNAVAILABLE_ERROR, "status": 503})]
+    assert Annotation.find_by_file_id(file_uuid) == []
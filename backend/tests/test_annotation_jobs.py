@@ -0,0 +1,111 @@
+"""Tests for the asynchronous annotation job queue."""
+
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from flask import url_for
+
+from annotator.api.annotation.jobs import (
+    INTERRUPTED_ERROR,
+    claim_next_job,
+    run_pending_jobs,
+    start_workers,
+)
+from annotator.models.annotation_job import AnnotationJob
+from annotator.models.liscense_key import LicenseKey
+from annotator.util.datetime_util import utc_now
+from tests.test_annotation import mock_client, upload_and_login
+from tests.util import register_user, login_user
+
+
+def queue_job(client, access_token, file_uuid, function_name):
+    return client.post(
+        url_for("api.annotation_jobs"),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"file_uuid": file_uuid, "function_name": function_name},
+    )
+
+
+def get_job(client, access_token, job_id):
+    return client.get(
+        url_for("api.annotation_job", job_id=job_id),
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+
+def test_queue_job_returns_202_and_runs(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    response = queue_job(client, access_token, file_uuid, "foo")
+    assert response.status_code == 202
+    job_id = response.json["job_id"]
+    assert response.json["status"] == "queued"
+    assert response.json["annotation"] is None
+
+    with patch(
+        "annotator.api.annotation.util.get_client",
+        return_value=mock_client("foo calls bar"),
+    ):
+        assert run_pending_jobs() == 1
+    response = get_job(client, access_token, job_id)
+    assert response.status_code == 200
+    assert response.json["status"] == "done"
+    assert response.json["attempts"] == 1
+    assert response.json["annotation"]["annotation"] == "foo calls bar"
+    assert response.json["annotation"]["function_name"] == "foo"
+
+
+def test_queued_job_is_run_by_worker_pool(app, client, db, upload_folder):
+    # the job is queued while no worker runs, as after a restart
+    access_token, file_uuid = upload_and_login(client)
+    job_id = queue_job(client, access_token, file_uuid, "bar").json["job_id"]
+
+    with patch(
+        "annotator.api.annotation.util.get_client", return_value=mock_client("bar")
+    ):
+        pool = start_workers(app, 2)
+        try:
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                db.session.expire_all()
+                if AnnotationJob.find_by_uuid(job_id).status == "done":
+                    break
+                time.sleep(0.05)
+        finally:
+            pool.stop(timeout=5)
+    assert get_job(client, access_token, job_id).json["annotation"]["annotation"] == (
+        "bar"
+    )
+
+
+def test_expired_lease_is_claimed_again(app, client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    job_id = queue_job(client, access_token, file_uuid, "foo").json["job_id"]
+    assert claim_next_job("dead-worker").uuid == job_id
+    assert claim_next_job("other-worker") is None
+
+    job = AnnotationJob.find_by_uuid(job_id)
+    job.locked_until = utc_now() - timedelta(seconds=1)
+    db.session.commit()
+    job = claim_next_job("other-worker")
+    assert job.uuid == job_id and job.locked_by == "other-worker"
+    assert job.attempts == 2
+
+    job.attempts = app.config["ANNOTATION_JOB_MAX_ATTEMPTS"]
+    job.locked_until = utc_now() - timedelta(seconds=1)
+    db.session.commit()
+    assert claim_next_job("third-worker") is None
+    response = get_job(client, access_token, job_id)
+    assert response.json["status"] == "failed"
+    assert response.json["error"] == INTERRUPTED_ERROR
+
+
+def test_job_of_other_user_not_found(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    job_id = queue_job(client, access_token, file_uuid, "foo").json["job_id"]
+    db.session.add(LicenseKey(key="BBBB-BBBB-BBBB-BBBB"))
+    db.session.commit()
+    register_user(client, email="other@email.com", key="BBBB-BBBB-BBBB-BBBB")
+    other_token = login_user(client, email="other@email.com").json["access_token"]
+    assert get_job(client, other_token, job_id).status_code == 404
+    assert queue_job(client, other_token, file_uuid, "foo").status_code == 401
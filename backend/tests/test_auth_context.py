@@ -0,0 +1,97 @@
+"""Tests for the request-scoped auth context."""
+
+import threading
+from http import HTTPStatus
+from unittest.mock import patch
+
+from flask import url_for
+
+from annotator.api.annotation import business
+from annotator.api.auth.decorators import token_required
+from annotator.models.liscense_key import LicenseKey
+from annotator.models.user import User
+from tests.test_annotation import generate, mock_client, upload_and_login
+from tests.test_revocation import count_queries
+from tests.util import EMAIL, get_user, register_user, login_user
+
+
+def test_token_is_decoded_once_per_request(app, client, db):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+
+    @token_required
+    def inner():
+        pass
+
+    @token_required
+    def outer():
+        inner()
+
+    with app.test_request_context(headers={"Authorization": f"Bearer {access_token}"}):
+        with patch.object(
+            User, "decode_access_token", wraps=User.decode_access_token
+        ) as decode:
+            outer()
+    assert decode.call_count == 1
+
+
+def test_user_is_loaded_once(client, db):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    with count_queries(db) as statements:
+        response = get_user(client, access_token)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json["email"] == EMAIL
+    assert len([s for s in statements if "FROM site_user" in s]) == 1
+
+
+def test_annotate_queries_file_once(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    llm = mock_client("foo calls bar")
+    with patch("annotator.api.annotation.util.get_client", return_value=llm):
+        with count_queries(db) as statements:
+            response = generate(client, access_token, file_uuid, "foo")
+    assert response.status_code == 200
+    assert len([s for s in statements if "FROM site_file" in s]) == 1
+    assert not [s for s in statements if "FROM site_user" in s]
+
+
+def test_concurrent_requests_keep_their_identity(app, client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    db.session.add(LicenseKey(key="BBBB-BBBB-BBBB-BBBB"))
+    db.session.commit()
+    register_user(client, email="other@email.com", key="BBBB-BBBB-BBBB-BBBB")
+    other_token = login_user(client, email="other@email.com").json["access_token"]
+    # both requests are inside annotate_file at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    statuses = {}
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        return "about " + function_name
+
+    def find_owned_file(file_uuid, owner_id, **kwargs):
+        barrier.wait()
+        return original(file_uuid, owner_id, **kwargs)
+
+    url = url_for("api.annotation_generate_batch")
+
+    def post(name, token):
+        response = app.test_client().post(
+            url,
+            headers={"Authorization": f"Bearer {token}"},
+            data={"file_uuid": file_uuid},
+        )
+        statuses[name] = response.status_code
+
+    original = business._find_owned_file
+    threads = [
+        threading.Thread(target=post, args=("owner", access_token)),
+        threading.Thread(target=post, args=("other", other_token)),
+    ]
+    with patch.object(business, "_find_owned_file", side_effect=find_owned_file):
+        with patch.object(business, "chat", side_effect=fake_chat):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    assert statuses == {"owner": 200, "other": 401}
@@ -1,9 +1,15 @@
 """Unit tests for api.auth_login API endpoint."""
 
+import threading
 from http import HTTPStatus
+from unittest.mock import patch
 
+import pytest
+
+from annotator.api.auth.business import OVERLOADED_ERROR
 from annotator.models.user import User
-from tests.util import EMAIL, register_user, login_user
+from annotator.util.bounded_executor import BoundedExecutor, Overloaded
+from tests.util import EMAIL, PASSWORD, register_user, login_user
 
 SUCCESS = "successfully logged in"
 UNAUTHORIZED = "email or password does not match"
@@ -30,3 +36,68 @@ def test_login_email_does_not_exist(client, db):
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert "message" in response.json and response.json["message"] == UNAUTHORIZED
     assert "access_token" not in response.json
+
+
+def test_bounded_executor_rejects_when_queue_is_full():
+    executor = BoundedExecutor(workers=1, max_queue=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    running = threading.Thread(target=executor.run, args=(block,))
+    running.start()
+    started.wait(5)
+    queued = threading.Thread(target=executor.run, args=(lambda: None,))
+    queued.start()
+    try:
+        with pytest.raises(Overloaded):
+            executor.run(lambda: None)
+    finally:
+        release.set()
+        running.join()
+        queued.join()
+    assert executor.run(lambda: 42) == 42
+    executor.shutdown()
+
+
+def test_bounded_executor_drops_jobs_that_waited_too_long():
+    executor = BoundedExecutor(workers=1, max_queue=1, queue_timeout=0.05)
+    started = threading.Event()
+    ran = []
+
+    def block():
+        started.set()
+        threading.Event().wait(0.2)
+
+    running = threading.Thread(target=executor.run, args=(block,))
+    running.start()
+    started.wait(5)
+    with pytest.raises(Overloaded):
+        executor.run(ran.append, 1)
+    running.join()
+    assert ran == []
+    executor.shutdown()
+
+
+def test_login_sheds_load_when_hasher_is_busy(client, db):
+    register_user(client)
+    with patch.object(User, "check_password", side_effect=Overloaded()):
+        response = login_user(client)
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json["message"] == OVERLOADED_ERROR
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_login_rehashes_password_when_rounds_change(app, client, db):
+    register_user(client)
+    assert User.find_by_email(EMAIL).password_hash.startswith("$2b$04$")
+    app.config["BCRYPT_LOG_ROUNDS"] = 5
+    assert login_user(client).status_code == HTTPStatus.OK
+    user = User.find_by_email(EMAIL)
+    assert user.password_hash.startswith("$2b$05$")
+    assert user.check_password(PASSWORD)
+    # already at the configured rounds: kept as is
+    assert login_user(client).status_code == HTTPStatus.OK
+    assert User.find_by_email(EMAIL).password_hash == user.password_hash
@@ -1,7 +1,10 @@
 """Unit tests for api.auth_logout API endpoint."""
 
+import time
 from http import HTTPStatus
 
+import jwt
+
 from annotator.models.token_blacklist import BlacklistedToken
 from tests.util import WWW_AUTH_NO_TOKEN, register_user, login_user, logout_user
 
@@ -27,7 +30,8 @@ def test_logout(client, db):
     assert "message" in response.json and response.json["message"] == SUCCESS
     blacklist = BlacklistedToken.query.all()
     assert len(blacklist) == 1
-    assert access_token == blacklist[0].token
+    payload = jwt.decode(access_token, options={"verify_signature": False})
+    assert blacklist[0].jti == payload["jti"]
 
 
 def test_logout_token_blacklisted(client, db):
@@ -42,3 +46,16 @@ def test_logout_token_blacklisted(client, db):
     assert "message" in response.json and response.json["message"] == TOKEN_BLACKLISTED
     assert "WWW-Authenticate" in response.headers
     assert response.headers["WWW-Authenticate"] == WWW_AUTH_BLACKLISTED_TOKEN
+
+
+def test_logout_token_without_jti(client, db, user):
+    # issued before tokens had a jti claim: revoked by its SHA-256
+    key = client.application.config["SECRET_KEY"]
+    payload = dict(exp=int(time.time()) + 5, sub=user.public_id, admin=False)
+    access_token = jwt.encode(payload, key, algorithm="HS256")
+    response = logout_user(client, access_token)
+    assert response.status_code == HTTPStatus.OK
+    assert len(BlacklistedToken.query.first().jti) == 64
+    response = logout_user(client, access_token)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json["message"] == TOKEN_BLACKLISTED
@@ -0,0 +1,119 @@
+"""Unit tests for api.auth_refresh API endpoint."""
+
+from datetime import timedelta
+from http import HTTPStatus
+
+from annotator.models.refresh_token import RefreshToken
+from annotator.models.user import User
+from annotator.util.datetime_util import utc_now
+from tests.test_revocation import count_queries
+from tests.util import (
+    get_user,
+    login_user,
+    logout_user,
+    refresh_tokens,
+    register_user,
+)
+
+INVALID = "refresh token is invalid or expired"
+REUSED = "refresh token was already used, please log in again"
+
+
+def test_login_returns_refresh_token(client, db):
+    response = register_user(client)
+    assert "refresh_token" in response.json
+    response = login_user(client)
+    assert response.status_code == HTTPStatus.OK
+    refresh_token = response.json["refresh_token"]
+    assert response.json["refresh_expires_in"] == 30 * 86400
+    row = RefreshToken.query.filter_by(
+        token_hash=RefreshToken.hash_token(refresh_token)
+    ).one()
+    # only the hash is stored
+    assert refresh_token not in (row.token_hash, row.family_id)
+
+
+def test_refresh_rotates_token(client, db):
+    register_user(client)
+    first = login_user(client).json["refresh_token"]
+    response = refresh_tokens(client, first)
+    assert response.status_code == HTTPStatus.OK
+    assert response.json["status"] == "success"
+    assert response.json["token_type"] == "bearer"
+    second = response.json["refresh_token"]
+    assert second != first
+    assert get_user(client, response.json["access_token"]).status_code == HTTPStatus.OK
+    third = refresh_tokens(client, second)
+    assert third.status_code == HTTPStatus.OK
+    families = {row.family_id for row in RefreshToken.query}
+    # one family from registering, one from logging in
+    assert len(families) == 2
+
+
+def test_refresh_does_not_hash_password(client, db, monkeypatch):
+    register_user(client)
+    refresh_token = login_user(client).json["refresh_token"]
+
+    def check_password(self, password):
+        raise AssertionError("refresh must not check the password")
+
+    monkeypatch.setattr(User, "check_password", check_password)
+    with count_queries(db) as statements:
+        response = refresh_tokens(client, refresh_token)
+    assert response.status_code == HTTPStatus.OK
+    selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+    assert len(selects) == 1
+
+
+def test_refresh_reuse_revokes_family(client, db):
+    register_user(client)
+    stolen = login_user(client).json["refresh_token"]
+    legitimate = refresh_tokens(client, stolen).json["refresh_token"]
+    response = refresh_tokens(client, stolen)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json["message"] == REUSED
+    response = refresh_tokens(client, legitimate)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json["message"] == INVALID
+
+
+def test_refresh_reuse_keeps_other_families(client, db):
+    register_user(client)
+    stolen = login_user(client).json["refresh_token"]
+    other = login_user(client).json["refresh_token"]
+    refresh_tokens(client, stolen)
+    assert refresh_tokens(client, stolen).status_code == HTTPStatus.UNAUTHORIZED
+    assert refresh_tokens(client, other).status_code == HTTPStatus.OK
+
+
+def test_refresh_unknown_token(client, db):
+    register_user(client)
+    response = refresh_tokens(client, "not-a-token")
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json["status"] == "fail"
+    assert response.json["message"] == INVALID
+
+
+def test_refresh_expired_token(client, db):
+    register_user(client)
+    refresh_token = login_user(client).json["refresh_token"]
+    RefreshToken.query.update(dict(expires_at=utc_now() - timedelta(seconds=1)))
+    db.session.commit()
+    response = refresh_tokens(client, refresh_token)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert response.json["message"] == INVALID
+    assert RefreshToken.purge_expired() == 2
+    assert RefreshToken.query.count() == 0
+
+
+def test_logout_revokes_refresh_tokens(client, db):
+    register_user(client)
+    response = login_user(client)
+    refresh_token = response.json["refresh_token"]
+    other = login_user(client).json["refresh_token"]
+    assert (
+        logout_user(client, response.json["access_token"]).status_code == HTTPStatus.OK
+    )
+    response = refresh_tokens(client, refresh_token)
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    assert refresh_tokens(client, other).status_code == HTTPStatus.OK
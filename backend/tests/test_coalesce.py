@@ -0,0 +1,158 @@
+"""Tests for coalescing concurrent identical annotation requests."""
+
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from flask import url_for
+
+from annotator.models.annotation import Annotation
+from annotator.models.annotation_flight import AnnotationFlight
+from annotator.models.file import File
+from annotator.util.datetime_util import utc_now
+from annotator.util.singleflight import SingleFlight
+from tests.test_annotation import upload_and_login
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def post_in_thread(app, url, access_token, data, responses):
+    def post():
+        responses.append(
+            app.test_client().post(
+                url, headers={"Authorization": f"Bearer {access_token}"}, data=data
+            )
+        )
+
+    thread = threading.Thread(target=post)
+    thread.start()
+    return thread
+
+
+def test_single_flight_shares_result_and_error():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flights.do("key", slow)))
+        for _ in range(3)
+    ]
+    threads[0].start()
+    wait_until(lambda: calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flights.waiters("key") == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 3
+    assert len(calls) == 1
+
+    def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flights.do("key", failing)
+    # a finished call is not reused
+    assert flights.do("key", lambda: "again") == "again"
+
+
+def test_concurrent_requests_share_one_call(app, client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    url = url_for("api.annotation_generate")
+    data = {"file_uuid": file_uuid, "function_name": "foo"}
+    flights = app.extensions.setdefault("annotation_flights", SingleFlight())
+    calls = []
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        calls.append(function_name)
+        # hold the call until the second request waits for it
+        wait_until(lambda: flights.waiters((file_uuid, "foo")) == 1)
+        return "foo calls bar"
+
+    responses = []
+    with patch("annotator.api.annotation.business.chat", side_effect=fake_chat):
+        threads = [
+            post_in_thread(app, url, access_token, data, responses) for _ in range(2)
+        ]
+        for thread in threads:
+            thread.join()
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json == responses[1].json
+    assert calls == ["foo"]
+    assert len(Annotation.find_by_file_id(file_uuid)) == 1
+
+
+def test_request_waits_for_flight_of_other_process(app, client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    # another server process is annotating foo
+    db.session.add(
+        AnnotationFlight(
+            file_id=file_uuid,
+            function_name="foo",
+            token="other-process",
+            locked_until=utc_now() + timedelta(minutes=5),
+        )
+    )
+    db.session.commit()
+    url = url_for("api.annotation_generate")
+    data = {"file_uuid": file_uuid, "function_name": "foo"}
+
+    responses = []
+    with patch("annotator.api.annotation.business.chat") as chat:
+        thread = post_in_thread(app, url, access_token, data, responses)
+        time.sleep(0.3)
+        assert not responses
+        annotation = Annotation(
+            uuid=str(uuid4()),
+            annotation="from the other process",
+            function_name="foo",
+            file_id=file_uuid,
+            owner_id=File.find_by_uuid(file_uuid).owner_id,
+        )
+        db.session.add(annotation)
+        AnnotationFlight.complete(file_uuid, "foo", "other-process", annotation.uuid)
+        db.session.commit()
+        thread.join()
+    assert responses[0].status_code == 200
+    assert responses[0].json["annotation"] == "from the other process"
+    chat.assert_not_called()
+
+
+def test_expired_flight_is_taken_over(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    # the process that held the marker died
+    db.session.add(
+        AnnotationFlight(
+            file_id=file_uuid,
+            function_name="foo",
+            token="dead-process",
+            locked_until=utc_now() - timedelta(seconds=1),
+        )
+    )
+    db.session.commit()
+    with patch("annotator.api.annotation.business.chat", return_value="foo calls bar"):
+        response = client.post(
+            url_for("api.annotation_generate"),
+            headers={"Authorization": f"Bearer {access_token}"},
+            data={"file_uuid": file_uuid, "function_name": "foo"},
+        )
+    assert response.status_code == 200
+    flight = AnnotationFlight.find(file_uuid, "foo")
+    assert flight.token != "dead-process"
+    assert flight.annotation_id == response.json["uuid"]
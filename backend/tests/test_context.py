@@ -0,0 +1,76 @@
+"""Unit tests for the call-graph neighbourhood prompt context."""
+
+import json
+
+from annotator.api.annotation.context import build_context, estimate_tokens
+from annotator.api.file.parser import parse_python_file
+from annotator.util.packed_map import PackedMap, pack_parsed_map
+
+# a -> b -> c -> d -> e, plus an unrelated function
+CODE = """import os
+
+def a():
+    return b()
+
+def b():
+    return c()
+
+def c():
+    return d()
+
+def d():
+    return e()
+
+def e():
+    return os.getcwd()
+
+def unrelated():
+    return 1
+"""
+
+
+def packed():
+    return PackedMap(pack_parsed_map(parse_python_file(CODE)))
+
+
+def test_context_contains_k_hop_neighbourhood():
+    context = build_context(packed(), "c", hops=1)
+    assert context.functions == ["c", "d", "b"]
+    data = json.loads(context.json)
+    assert data["function"]["name"] == "c"
+    assert [(n["name"], n["distance"]) for n in data["neighbours"]] == [
+        ("d", 1),
+        ("b", 1),
+    ]
+    assert data["call_graph"] == {"b": ["c"], "c": ["d"], "d": []}
+    assert data["file"]["imports"] == ["os"]
+    assert not context.truncated
+
+    context = build_context(packed(), "c", hops=2)
+    assert sorted(context.functions) == ["a", "b", "c", "d", "e"]
+    assert "unrelated" not in context.json
+
+
+def test_context_reports_saved_tokens():
+    parsed_map = parse_python_file(CODE)
+    context = build_context(packed(), "a", hops=1)
+    assert context.full_tokens == estimate_tokens(json.dumps(parsed_map))
+    assert context.tokens == estimate_tokens(context.json)
+    assert context.saved_tokens == context.full_tokens - context.tokens > 0
+
+
+def test_context_respects_token_budget():
+    unlimited = build_context(packed(), "c", hops=2)
+    budget = estimate_tokens(build_context(packed(), "c", hops=1).json) + 10
+    context = build_context(packed(), "c", hops=2, token_budget=budget)
+    assert context.truncated
+    assert context.tokens <= budget
+    # nearest neighbours are kept first
+    assert context.functions == ["c", "d", "b"]
+    assert context.tokens < unlimited.tokens
+
+
+def test_context_of_unknown_function():
+    context = build_context(packed(), "missing", hops=2)
+    assert context.functions == ["missing"]
+    assert json.loads(context.json)["function"] is None
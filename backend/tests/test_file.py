@@ -1,9 +1,24 @@
 """Endpoint tests for the file_ns namespace"""
 
 import io
+import json
+import os
+import tarfile
+import zipfile
+from unittest.mock import patch
 
+import pytest
 from flask import url_for
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
+from annotator.models.annotation import Annotation
+from annotator.models.file import File
+from annotator.models.parse_cache import ParseCache
+from annotator.models.project import Project
+
+from annotator.api.file.sandbox import parse_in_sandbox
+from tests.test_revocation import count_queries
 from tests.util import register_user, login_user
 
 
@@ -45,3 +60,247 @@ def test_upload_get(client, db, upload_folder):
     )
     assert response.status_code == 200
     assert "info" in response.json
+
+
+def test_upload_get_does_not_load_parsed_maps(client, db, upload_folder):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    for i in range(5):
+        response = upload_file(
+            client, access_token, io.BytesIO(CODE), f"f{i}.py", f"item{i}"
+        )
+        assert response.status_code == 200
+    url = url_for("api.file_upload")
+    db.session.expire_all()
+    with count_queries(db) as statements:
+        response = client.get(url, headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 200
+    assert len(response.json["info"]) == 5
+    assert all("parsed_map" not in info for info in response.json["info"])
+    file_selects = [s for s in statements if "FROM site_file" in s]
+    assert len(file_selects) == 1
+    assert "parsed_map_packed" not in file_selects[0]
+
+
+CODE = b"""
+def foo(x):
+    return bar(x)
+
+def bar(y):
+    return y
+"""
+
+
+def test_upload_reuses_cached_parsed_map(app, client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    with patch(
+        "annotator.api.file.business.parse_in_sandbox",
+        wraps=parse_in_sandbox,
+    ) as parse:
+        first = upload_file(client, access_token, io.BytesIO(CODE), "a.py", "first")
+        second = upload_file(client, access_token, io.BytesIO(CODE), "b.py", "second")
+        assert parse.call_count == 1
+        app.extensions["parse_cache"].clear()
+        third = upload_file(client, access_token, io.BytesIO(CODE), "c.py", "third")
+        assert parse.call_count == 1
+    assert first.status_code == second.status_code == third.status_code == 200
+    assert first.json["parsed_map"] == second.json["parsed_map"]
+    assert first.json["parsed_map"] == third.json["parsed_map"]
+    assert first.json["uuid"] != second.json["uuid"]
+    assert len(ParseCache.query.all()) == 1
+
+
+def upload_archive(client, access_token, archive_data, archive_name, item_name):
+    response = client.post(
+        url_for("api.file_upload_archive"),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"archive": (archive_data, archive_name), "name": item_name},
+    )
+    return response
+
+
+PROJECT_FILES = {
+    "repo/pkg/__init__.py": b"",
+    "repo/pkg/util.py": b"def helper():\n    return 1\n",
+    "repo/app.py": b"from pkg.util import helper\n\ndef main():\n    return helper()\n",
+    "repo/broken.py": b"def broken(\n",
+    "repo/README.md": b"not python",
+}
+
+
+def make_zip(files):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        for path, content in files.items():
+            archive.writestr(path, content)
+    data.seek(0)
+    return data
+
+
+def make_tar_gz(files):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as archive:
+        for path, content in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    data.seek(0)
+    return data
+
+
+def test_upload_archive(client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    for archive_name, archive_data in (
+        ("repo.zip", make_zip(PROJECT_FILES)),
+        ("repo.tar.gz", make_tar_gz(PROJECT_FILES)),
+    ):
+        response = upload_archive(
+            client, access_token, archive_data, archive_name, "repo"
+        )
+        assert response.status_code == 200
+        assert response.json["file_name"] == archive_name
+        file_names = {f["file_name"] for f in response.json["files"]}
+        assert file_names == {"repo/pkg/__init__.py", "repo/pkg/util.py", "repo/app.py"}
+        assert response.json["skipped"] == [
+            {
+                "file_name": "repo/broken.py",
+                "error": "Uploaded file contains syntax error.",
+            }
+        ]
+        call_graph = json.loads(response.json["call_graph"])
+        assert call_graph["repo.app.main"] == ["repo.pkg.util.helper"]
+        project = Project.find_by_uuid(response.json["uuid"])
+        assert {f.file_name for f in project.files} == file_names
+    assert len(File.query.all()) == 6
+
+
+def test_upload_archive_skips_long_paths(client, db, upload_folder):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    long_path = "repo/" + "nested/" * 20 + "deep.py"
+    files = {"repo/app.py": PROJECT_FILES["repo/app.py"], long_path: b"x = 1\n"}
+    response = upload_archive(client, access_token, make_zip(files), "repo.zip", "repo")
+    assert response.status_code == 200
+    assert [f["file_name"] for f in response.json["files"]] == ["repo/app.py"]
+    assert response.json["skipped"] == [
+        {"file_name": long_path, "error": "File path is longer than 100 characters."}
+    ]
+
+
+def test_upload_archive_removes_files_when_commit_fails(app, client, db, upload_folder):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    with patch.object(db.session, "add_all", side_effect=SQLAlchemyError("down")):
+        with pytest.raises(SQLAlchemyError):
+            upload_archive(
+                client, access_token, make_zip(PROJECT_FILES), "repo.zip", "repo"
+            )
+    assert os.listdir(app.config["UPLOAD_FOLDER"]) == []
+    assert File.query.count() == 0
+
+
+def test_upload_archive_rejects_unknown_format(client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    data = io.BytesIO(b"def foo():\n    pass\n")
+    response = upload_archive(client, access_token, data, "foo.py", "foo")
+    assert response.status_code == 400
+
+
+def upload_revision(client, access_token, file_uuid, file_data, file_name):
+    response = client.post(
+        url_for("api.file_revision", file_uuid=file_uuid),
+        headers={"Authorization": f"Bearer {access_token}"},
+        data={"file": (file_data, file_name)},
+    )
+    return response
+
+
+def test_upload_revision_carries_over_unchanged_annotations(client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    response = upload_file(client, access_token, io.BytesIO(CODE), "a.py", "item")
+    first = File.find_by_uuid(response.json["uuid"])
+    for function_name in ("foo", "bar"):
+        db.session.add(
+            Annotation(
+                annotation=f"explains {function_name}",
+                function_name=function_name,
+                file_id=first.uuid,
+                owner_id=first.owner_id,
+            )
+        )
+    db.session.commit()
+
+    revised = b"# new header line\n" + CODE.replace(b"return y", b"return y + 1")
+    response = upload_revision(
+        client, access_token, first.uuid, io.BytesIO(revised), "a.py"
+    )
+
+    assert response.status_code == 200
+    assert response.json["item_name"] == "item"
+    assert response.json["previous_id"] == first.uuid
+    assert response.json["carried_over"] == ["foo"]
+    assert response.json["changed"] == ["bar"]
+    annotations = Annotation.find_by_file_id(response.json["uuid"])
+    assert [(a.function_name, a.annotation) for a in annotations] == [
+        ("foo", "explains foo")
+    ]
+    assert len(Annotation.find_by_file_id(first.uuid)) == 2
+
+
+def test_delete_file_with_later_revision(client, db, upload_folder):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    response = upload_file(client, access_token, io.BytesIO(CODE), "a.py", "item")
+    first = response.json["uuid"]
+    revised = CODE.replace(b"return y", b"return y + 1")
+    response = upload_revision(client, access_token, first, io.BytesIO(revised), "a.py")
+    second = response.json["uuid"]
+
+    response = client.delete(
+        url_for("api.file_action", file_uuid=first),
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+    assert response.status_code == 200
+    assert File.find_by_uuid(first) is None
+    assert File.find_by_uuid(second).previous_id is None
+    violations = db.session.execute(text("PRAGMA foreign_key_check(site_file)"))
+    assert violations.fetchall() == []
+
+
+def test_upload_revision_file_not_found(client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    response = upload_revision(client, access_token, "missing", io.BytesIO(CODE), "a.py")
+    assert response.status_code == 404
+
+
+def test_upload_rejects_oversized_file(app, client, db, upload_folder):
+    app.config["MAX_UPLOAD_BYTES"] = 100
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    data = io.BytesIO(b"x = 1\n" * 1000)
+    response = upload_file(client, access_token, data, "big.py", "big")
+    assert response.status_code == 413
+    assert os.listdir(app.config["UPLOAD_FOLDER"]) == []
+
+
+def test_upload_rejects_non_utf8_file(app, client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    data = io.BytesIO(b"x = '\xff\xfe'\n")
+    response = upload_file(client, access_token, data, "latin.py", "latin")
+    assert response.status_code == 400
+    assert response.json["message"] == "Uploaded file is not valid UTF-8."
+    assert os.listdir(app.config["UPLOAD_FOLDER"]) == []
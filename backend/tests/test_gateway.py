@@ -0,0 +1,292 @@
+"""Tests for the LLM gateway against a local HTTP stub of Azure OpenAI."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import AzureOpenAI
+
+from annotator.api.annotation.gateway import (
+    BUSY_ERROR,
+    REJECTED_ERROR,
+    UNAVAILABLE_ERROR,
+    LLMError,
+    LLMGateway,
+    _retry_after,
+)
+from annotator.api.annotation.metrics import CallStats
+
+USAGE = {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+
+
+def completion(content):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4.1",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": USAGE,
+    }
+
+
+def chunk(content):
+    choices = []
+    if content is not None:
+        choices.append(
+            {"index": 0, "delta": {"content": content}, "finish_reason": None}
+        )
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4.1",
+        "choices": choices,
+    }
+
+
+STREAM_PIECES = ["Hello", ", ", "world"]
+
+
+class StubServer:
+    """Serve a scripted list of (status, headers, delay) responses in order;
+    once the script runs out every request succeeds."""
+
+    def __init__(self):
+        self.script = []
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        self.delay = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                    status, headers, delay = (
+                        stub.script.pop(0) if stub.script else (200, {}, stub.delay)
+                    )
+                try:
+                    time.sleep(delay)
+                    if status == 200 and body.get("stream"):
+                        self.send_stream(body)
+                        return
+                    body = completion("ok") if status == 200 else {"error": {}}
+                    data = json.dumps(body).encode("utf-8")
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def send_stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                # Azure starts with a chunk that has no choices
+                for content in [None, *STREAM_PIECES]:
+                    self.send_event(chunk(content))
+                if body.get("stream_options", {}).get("include_usage"):
+                    self.send_event(dict(chunk(None), usage=USAGE))
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def send_event(self, data):
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def make_gateway(stub, **kwargs):
+    sleeps = []
+    kwargs.setdefault("backoff_base", 0.01)
+    gateway = LLMGateway(
+        lambda: AzureOpenAI(
+            api_version="2025-01-01-preview",
+            azure_endpoint=stub.url,
+            api_key="test",
+            max_retries=0,
+        ),
+        sleep=lambda seconds: sleeps.append(seconds),
+        jitter=lambda: 0.5,
+        **kwargs,
+    )
+    return gateway, sleeps
+
+
+def complete(gateway):
+    response = gateway.complete(
+        messages=[{"role": "user", "content": "hi"}], model="gpt-4.1"
+    )
+    return response.choices[0].message.content
+
+
+def test_gateway_reuses_one_client(stub):
+    gateway, _ = make_gateway(stub)
+    assert complete(gateway) == "ok"
+    client = gateway.client
+    assert complete(gateway) == "ok"
+    assert gateway.client is client
+    assert stub.requests == 2
+
+
+def test_gateway_retries_429_honouring_retry_after(stub):
+    stub.script = [(429, {"Retry-After": "2"}, 0), (503, {}, 0)]
+    gateway, sleeps = make_gateway(stub, max_retries=3, backoff_base=0.1)
+    assert complete(gateway) == "ok"
+    assert stub.requests == 3
+    # Retry-After plus jitter, then exponential backoff with jitter
+    assert sleeps == [pytest.approx(2.05), pytest.approx(0.5 * 0.2)]
+
+
+def test_gateway_gives_up_after_max_retries(stub):
+    stub.script = [(500, {}, 0)] * 3
+    gateway, sleeps = make_gateway(stub, max_retries=2)
+    with pytest.raises(LLMError) as e:
+        complete(gateway)
+    assert e.value.message == UNAVAILABLE_ERROR
+    assert stub.requests == 3
+    assert len(sleeps) == 2
+
+
+def test_gateway_does_not_retry_client_errors(stub):
+    stub.script = [(400, {}, 0)]
+    gateway, _ = make_gateway(stub)
+    with pytest.raises(LLMError) as e:
+        complete(gateway)
+    assert e.value.message == REJECTED_ERROR
+    assert e.value.status == 502
+    assert stub.requests == 1
+
+
+def test_gateway_fails_fast_on_long_retry_after(stub):
+    stub.script = [(429, {"retry-after-ms": "60000"}, 0)]
+    gateway, sleeps = make_gateway(stub, backoff_max=5)
+    with pytest.raises(LLMError):
+        complete(gateway)
+    assert stub.requests == 1
+    assert sleeps == []
+
+
+def test_gateway_per_call_timeout(stub):
+    stub.script = [(200, {}, 1.0)]
+    gateway, sleeps = make_gateway(stub, timeout=0.2, max_retries=1)
+    start = time.monotonic()
+    assert complete(gateway) == "ok"
+    assert time.monotonic() - start < 1.0
+    assert stub.requests == 2
+    assert len(sleeps) == 1
+
+
+def test_gateway_limits_requests_in_flight(stub):
+    stub.delay = 0.1
+    gateway, _ = make_gateway(stub, max_in_flight=2)
+    threads = [threading.Thread(target=complete, args=(gateway,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.requests == 6
+    assert stub.peak_in_flight == 2
+
+
+def test_gateway_busy_when_no_slot_frees_up(stub):
+    stub.delay = 0.5
+    gateway, _ = make_gateway(stub, max_in_flight=1, queue_timeout=0.05)
+    worker = threading.Thread(target=complete, args=(gateway,))
+    worker.start()
+    time.sleep(0.1)
+    with pytest.raises(LLMError) as e:
+        complete(gateway)
+    assert e.value.message == BUSY_ERROR
+    worker.join()
+
+
+def test_gateway_stream_yields_pieces_and_releases_slot(stub):
+    stub.script = [(503, {}, 0)]
+    gateway, sleeps = make_gateway(stub, max_in_flight=1, queue_timeout=0.05)
+    pieces = list(
+        gateway.stream(messages=[{"role": "user", "content": "hi"}], model="gpt-4.1")
+    )
+    assert pieces == STREAM_PIECES
+    assert stub.requests == 2
+    assert len(sleeps) == 1
+    # the only slot is free again
+    assert complete(gateway) == "ok"
+
+
+def test_gateway_stream_closed_early_releases_slot(stub):
+    gateway, _ = make_gateway(stub, max_in_flight=1, queue_timeout=0.05)
+    stream = gateway.stream(
+        messages=[{"role": "user", "content": "hi"}], model="gpt-4.1"
+    )
+    assert next(stream) == "Hello"
+    stream.close()
+    assert complete(gateway) == "ok"
+
+
+def test_retry_after_header_formats():
+    assert _retry_after({"retry-after-ms": "250"}) == 0.25
+    assert _retry_after({"retry-after": "3"}) == 3
+    assert _retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert _retry_after({"retry-after": "soon"}) is None
+    assert _retry_after({}) is None
+
+
+def test_gateway_counts_retries_and_tokens(stub):
+    stub.script = [(503, {}, 0), (429, {}, 0)]
+    gateway, _ = make_gateway(stub)
+    stats = CallStats()
+    gateway.complete(
+        stats=stats, messages=[{"role": "user", "content": "hi"}], model="gpt-4.1"
+    )
+    assert stats.retries == 2
+    assert (stats.prompt_tokens, stats.completion_tokens) == (12, 3)
+
+    stats = CallStats()
+    pieces = gateway.stream(
+        stats=stats, messages=[{"role": "user", "content": "hi"}], model="gpt-4.1"
+    )
+    assert list(pieces) == STREAM_PIECES
+    assert (stats.retries, stats.prompt_tokens, stats.completion_tokens) == (0, 12, 3)
@@ -0,0 +1,118 @@
+"""Tests for bottom-up (callees first) annotation of a whole file."""
+
+import json
+import threading
+from unittest.mock import patch
+
+from annotator.api.annotation.gateway import UNAVAILABLE_ERROR, LLMError
+from annotator.api.annotation.hierarchy import (
+    annotate_bottom_up,
+    strongly_connected_components,
+    summarize,
+)
+from tests.test_annotation import generate_batch, upload_and_login
+
+
+def test_components_come_callees_first():
+    graph = {"main": ["even", "log"], "even": ["odd"], "odd": ["even"], "log": []}
+    components = strongly_connected_components(graph)
+    assert sorted(map(sorted, components)) == [["even", "odd"], ["log"], ["main"]]
+    position = {name: i for i, members in enumerate(components) for name in members}
+    assert position["even"] == position["odd"] < position["main"]
+    assert position["log"] < position["main"]
+
+
+def test_components_of_a_deep_chain():
+    # deeper than the interpreter's recursion limit
+    graph = {f"f{i}": [f"f{i + 1}"] for i in range(5000)}
+    graph["f5000"] = []
+    components = strongly_connected_components(graph)
+    assert components == [[f"f{i}"] for i in reversed(range(5001))]
+
+
+def test_summarize_keeps_the_first_sentence():
+    assert summarize("Adds two numbers. Then it returns.", 240) == "Adds two numbers."
+    assert summarize("one two three four", 9) == "one two..."
+
+
+def test_annotate_bottom_up_order_and_summaries():
+    call_graph = {
+        "main": ["parse", "even"],
+        "parse": ["read"],
+        "read": [],
+        "even": ["odd", "even"],
+        "odd": ["even", "read"],
+    }
+    seen = {}
+    lock = threading.Lock()
+
+    def annotate(name, summaries):
+        with lock:
+            seen[name] = (len(seen), dict(summaries))
+        return f"{name} works. More detail."
+
+    results, errors = annotate_bottom_up(call_graph, list(call_graph), annotate, 4)
+    assert errors == {}
+    assert results["main"] == "main works. More detail."
+    assert seen["main"][1] == {"parse": "parse works.", "even": "even works."}
+    assert seen["parse"][1] == {"read": "read works."}
+    # even and odd are one component: neither waits for the other
+    assert seen["even"][1] == {}
+    assert seen["odd"][1] == {"read": "read works."}
+    assert seen["read"][0] < seen["parse"][0] < seen["main"][0]
+
+
+def test_annotate_bottom_up_runs_independent_branches_in_parallel():
+    call_graph = {"main": ["left", "right"], "left": [], "right": []}
+    # left and right must be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def annotate(name, summaries):
+        if name != "main":
+            barrier.wait()
+        return name
+
+    results, errors = annotate_bottom_up(call_graph, list(call_graph), annotate, 2)
+    assert errors == {}
+    assert set(results) == {"main", "left", "right"}
+
+
+def test_annotate_bottom_up_continues_past_failed_callee():
+    call_graph = {"main": ["broken"], "broken": []}
+    error = LLMError(UNAVAILABLE_ERROR)
+    calls = {}
+
+    def annotate(name, summaries):
+        calls[name] = summaries
+        if name == "broken":
+            raise error
+        return name
+
+    results, errors = annotate_bottom_up(call_graph, ["main", "broken"], annotate, 2)
+    assert results == {"main": "main"}
+    assert errors == {"broken": error}
+    assert calls["main"] == {}
+
+
+def test_generate_batch_hierarchical(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    prompts = {}
+
+    def fake_chat(function_name, parsed_map, function_code, **kwargs):
+        prompts[function_name] = json.loads(parsed_map)
+        return f"{function_name} returns its argument. Nothing else."
+
+    with patch("annotator.api.annotation.business.chat", side_effect=fake_chat):
+        response = generate_batch(client, access_token, file_uuid, hierarchical="true")
+    assert response.status_code == 200
+    assert response.json["errors"] == []
+    assert [a["function_name"] for a in response.json["annotations"]] == [
+        "foo",
+        "bar",
+    ]
+    # foo calls bar, so bar was annotated first and foo got its summary
+    assert prompts["foo"]["function"]["name"] == "foo"
+    assert prompts["foo"]["callees"] == [
+        {"name": "bar", "summary": "bar returns its argument."}
+    ]
+    assert prompts["bar"]["callees"] == []
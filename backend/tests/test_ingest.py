@@ -0,0 +1,44 @@
+"""Unit tests for streaming upload ingestion."""
+
+import hashlib
+import io
+from http import HTTPStatus
+
+import pytest
+
+from annotator.api.file.ingest import IngestError, ingest_upload
+
+
+def test_ingest_upload_hashes_decodes_and_writes(tmp_path):
+    # multi-byte characters are split across the 64 KiB chunk boundaries
+    data = ("def f():\n    return 'é€'\n" * 10000).encode("utf-8")
+    path = tmp_path / "upload"
+    ingested = ingest_upload(io.BytesIO(data), path, max_bytes=len(data))
+    assert ingested.content_hash == hashlib.sha256(data).hexdigest()
+    assert ingested.text == data.decode("utf-8")
+    assert ingested.size == len(data)
+    assert path.read_bytes() == data
+
+
+def test_ingest_upload_rejects_truncated_utf8(tmp_path):
+    path = tmp_path / "upload"
+    with pytest.raises(IngestError) as e:
+        ingest_upload(io.BytesIO("x = 'é'".encode("utf-8")[:-2]), path, 100)
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+    assert not path.exists()
+
+
+def test_ingest_upload_stops_at_size_limit(tmp_path):
+    class Stream(io.BytesIO):
+        reads = 0
+
+        def read(self, size=-1):
+            Stream.reads += 1
+            return super().read(size)
+
+    path = tmp_path / "upload"
+    with pytest.raises(IngestError) as e:
+        ingest_upload(Stream(b"x" * 1024 * 1024), path, max_bytes=100 * 1024)
+    assert e.value.status == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+    assert Stream.reads == 2
+    assert not path.exists()
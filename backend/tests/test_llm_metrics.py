@@ -0,0 +1,111 @@
+"""Tests for LLM call accounting and the admin metrics endpoints."""
+
+from unittest.mock import patch
+
+from flask import url_for
+
+from annotator.api.annotation.gateway import UNAVAILABLE_ERROR, LLMError
+from annotator.models.llm_usage import LLMUsage
+from annotator.models.user import User
+from annotator.util.metrics import MetricsRegistry
+from tests.test_annotation import generate, mock_client, upload_and_login
+from tests.util import EMAIL, login_user
+
+
+def make_admin(client, db):
+    User.find_by_email(EMAIL).admin = True
+    db.session.commit()
+    return login_user(client).json["access_token"]
+
+
+def get_metrics(client, access_token):
+    return client.get(
+        url_for("api.annotation_metrics"),
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+
+def get_usage(client, access_token, **params):
+    return client.get(
+        url_for("api.annotation_usage", **params),
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", [0.1, 1], ["cache"])
+    counter = registry.counter("calls_total", "Calls.")
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, cache="miss")
+    counter.inc()
+    counter.inc(2)
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{cache="miss",le="0.1"} 2',
+        'latency_seconds_bucket{cache="miss",le="1"} 3',
+        'latency_seconds_bucket{cache="miss",le="+Inf"} 4',
+        'latency_seconds_sum{cache="miss"} 3.65',
+        'latency_seconds_count{cache="miss"} 4',
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        "calls_total 3",
+    ]
+
+
+def test_annotation_calls_are_recorded(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    llm = mock_client("first")
+    with patch("annotator.api.annotation.util.get_client", return_value=llm):
+        generate(client, access_token, file_uuid, "foo")
+        generate(client, access_token, file_uuid, "foo")
+    with patch(
+        "annotator.api.annotation.util.get_gateway",
+        side_effect=LLMError(UNAVAILABLE_ERROR),
+    ):
+        generate(client, access_token, file_uuid, "bar")
+
+    usage = LLMUsage.query.one()
+    assert usage.file_id == file_uuid
+    assert (usage.calls, usage.cache_hits, usage.errors) == (3, 1, 1)
+    assert (usage.prompt_tokens, usage.completion_tokens) == (300, 40)
+    assert usage.latency_ms_max <= usage.latency_ms_total
+
+    admin_token = make_admin(client, db)
+    metrics = get_metrics(client, admin_token)
+    assert metrics.status_code == 200
+    assert metrics.content_type.startswith("text/plain; version=0.0.4")
+    lines = metrics.get_data(as_text=True).splitlines()
+    assert 'annotator_llm_calls_total{cache="hit",outcome="ok"} 1' in lines
+    assert 'annotator_llm_calls_total{cache="miss",outcome="ok"} 1' in lines
+    assert 'annotator_llm_calls_total{cache="miss",outcome="error"} 1' in lines
+    assert 'annotator_llm_call_duration_seconds_count{cache="miss"} 2' in lines
+    assert "annotator_llm_prompt_tokens_sum 300" in lines
+    assert 'annotator_llm_completion_tokens_bucket{le="50"} 1' in lines
+
+
+def test_usage_totals_per_user_and_file(client, db, upload_folder):
+    access_token, file_uuid = upload_and_login(client)
+    with patch(
+        "annotator.api.annotation.util.get_client",
+        return_value=mock_client("foo", "bar"),
+    ):
+        generate(client, access_token, file_uuid, "foo")
+        generate(client, access_token, file_uuid, "bar")
+
+    response = get_usage(client, make_admin(client, db), sort="latency")
+    assert response.status_code == 200
+    [user] = response.json["users"]
+    assert user["owner_id"] == User.find_by_email(EMAIL).public_id
+    assert (user["files"], user["calls"], user["prompt_tokens"]) == (1, 2, 600)
+    [file_usage] = response.json["files"]
+    assert file_usage["file_id"] == file_uuid
+    assert file_usage["completion_tokens"] == 80
+
+
+def test_metrics_endpoints_are_admin_only(client, db, upload_folder):
+    access_token, _ = upload_and_login(client)
+    assert get_metrics(client, access_token).status_code == 403
+    assert get_usage(client, access_token).status_code == 403
+    assert client.get(url_for("api.annotation_metrics")).status_code == 401
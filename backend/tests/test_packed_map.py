@@ -0,0 +1,106 @@
+"""Unit tests for the packed parsed_map storage format."""
+
+import json
+
+import pytest
+
+from annotator.api.annotation.business import _read_function_code
+from annotator.api.file.parser import parse_python_file
+from annotator.models.file import File
+from annotator.util.packed_map import (
+    PackedMap,
+    PackedMapError,
+    function_names,
+    pack_parsed_map,
+    read_function,
+    read_meta,
+    unpack_parsed_map,
+)
+
+CODE = """import os
+
+def helper(x):
+    return x + 1
+
+def main():
+    if helper(1):
+        return os.getcwd()
+
+def helper(x):
+    return x
+"""
+
+
+def test_pack_round_trip_preserves_parsed_map():
+    parsed_map = parse_python_file(CODE)
+    blob = pack_parsed_map(parsed_map)
+    assert unpack_parsed_map(blob) == parsed_map
+    assert json.dumps(unpack_parsed_map(blob)) == json.dumps(parsed_map)
+
+
+def test_read_function_decodes_single_entry():
+    parsed_map = parse_python_file(CODE)
+    blob = pack_parsed_map(parsed_map)
+    assert function_names(blob) == ["helper", "main", "helper"]
+    assert read_function(blob, "main") == parsed_map["functions"][1]
+    # the last definition of a name wins
+    assert read_function(blob, "helper") == parsed_map["functions"][2]
+    assert read_function(blob, "missing") is None
+    assert read_meta(blob) == {
+        "file": parsed_map["file"],
+        "call_graph": parsed_map["call_graph"],
+        "json_size": len(json.dumps(parsed_map)),
+    }
+
+
+def test_unpack_rejects_foreign_blob():
+    with pytest.raises(PackedMapError):
+        unpack_parsed_map(b"{}")
+    with pytest.raises(PackedMapError):
+        unpack_parsed_map(b"JSON" + bytes(8))
+
+
+def test_file_model_keeps_json_interface(db, user):
+    parsed_map = parse_python_file(CODE)
+    file = File(
+        item_name="item",
+        file_name="main.py",
+        owner_id=user.public_id,
+        parsed_map=json.dumps(parsed_map),
+    )
+    db.session.add(file)
+    db.session.commit()
+    db.session.expire_all()
+
+    file = File.find_by_uuid(file.uuid)
+    assert isinstance(file.parsed_map_packed, bytes)
+    assert file.parsed_map == json.dumps(parsed_map)
+    assert file.find_function("main")["start_line"] == 6
+    output = file.as_dict()
+    assert "parsed_map_packed" not in output
+    assert "parsed_map" not in output
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_source_span_matches_line_scan(tmp_path, newline):
+    source = CODE.replace("\n", newline).encode("utf-8")
+    path = tmp_path / "upload"
+    path.write_bytes(source)
+    parsed_map = parse_python_file(source.decode("utf-8"))
+    packed = PackedMap(pack_parsed_map(parsed_map, source=source))
+    for name in ("main", "helper"):
+        function = packed.function(name)
+        span = packed.source_span(name)
+        assert span is not None
+        assert _read_function_code(path, function, span) == _read_function_code(
+            path, function, None
+        )
+    assert _read_function_code(
+        path, packed.function("main"), packed.source_span("main")
+    ) == ("def main():\n    if helper(1):\n        return os.getcwd()\n")
+
+
+def test_source_span_missing_without_source():
+    packed = PackedMap(pack_parsed_map(parse_python_file(CODE)))
+    assert packed.source_span("main") is None
+    assert packed.source_span("missing") is None
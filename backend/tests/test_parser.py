@@ -1,4 +1,12 @@
-from src.annotator.api.file.parser import parse_python_file
+import ast
+
+from src.annotator.api.file.parser import (
+    parse_python_file,
+    extract_returns,
+    extract_calls,
+    detect_control_flow,
+    is_recursive,
+)
 
 
 # Basic structure + imports/globals + params + returns + calls + graph
@@ -176,3 +184,79 @@ X = 42
     assert "X" in parsed["file"]["globals"]
     assert parsed["functions"] == []
     assert parsed["call_graph"] == {}
+
+
+# Single-pass scanner matches the per-helper walks
+
+
+def test_parse_python_file_matches_legacy_helpers():
+    code = """
+import os
+from collections import deque
+
+def walk(node, depth=0):
+    if node is None:
+        return None
+    while depth < 3:
+        depth += 1
+    queue = deque([node])
+    os.path.join("a", "b")
+    "x".join(["y"])
+    (lambda: 1)()
+    get_handler()(node)
+    return walk(node.left, depth + 1) or walk(node.right, depth + 1)
+
+def helper(items):
+    total = 0
+    for item in items:
+        if item:
+            total += item.value.compute()
+    return {"total": total, "count": len(items)}
+
+def main():
+    def inner():
+        return helper([1, 2])
+    return walk(inner()), [x for x in range(3)]
+"""
+    parsed = parse_python_file(code)
+    tree = ast.parse(code)
+    func_nodes = [n for n in tree.body if isinstance(n, ast.FunctionDef)]
+    assert len(parsed["functions"]) == len(func_nodes)
+
+    for entry, node in zip(parsed["functions"], func_nodes):
+        calls = extract_calls(node)
+        assert entry["name"] == node.name
+        assert entry["returns"] == extract_returns(node)
+        assert entry["calls"] == calls
+        assert entry["control_flow"] == detect_control_flow(node)
+        assert entry["recursion"] == is_recursive(node.name, calls)
+
+
+# Repeated calls produce a single edge in both directions
+
+
+def test_parse_python_file_call_graph_deduplicated():
+    code = """
+def leaf():
+    return 1
+
+def caller(obj):
+    leaf()
+    leaf()
+    obj.leaf()
+    return leaf()
+
+def other():
+    return caller(None) + leaf()
+"""
+    parsed = parse_python_file(code)
+
+    functions = {f["name"]: f for f in parsed["functions"]}
+    assert parsed["call_graph"] == {
+        "leaf": [],
+        "caller": ["leaf"],
+        "other": ["caller", "leaf"],
+    }
+    assert functions["leaf"]["called_by"] == ["caller", "other"]
+    assert functions["caller"]["called_by"] == ["other"]
+    assert functions["other"]["called_by"] == []
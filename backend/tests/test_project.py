@@ -0,0 +1,45 @@
+"""Unit tests for the project-level call graph."""
+
+from annotator.api.file.parser import parse_python_file
+from annotator.api.file.project import build_project_call_graph, module_name
+
+
+def test_module_name():
+    assert module_name("app.py") == "app"
+    assert module_name("pkg/sub/mod.py") == "pkg.sub.mod"
+    assert module_name("pkg/__init__.py") == "pkg"
+
+
+def test_build_project_call_graph_resolves_imports():
+    sources = {
+        "repo/pkg/__init__.py": "",
+        "repo/pkg/util.py": "def helper():\n    return 1\n\ndef other():\n    pass\n",
+        "repo/app.py": """
+import os
+import pkg.util
+from pkg import util
+from pkg.util import helper
+
+def main():
+    helper()
+    pkg.util.other()
+    util.helper()
+    os.path.join("a")
+    return run()
+
+def run():
+    return missing()
+""",
+    }
+    parsed_maps = {
+        module_name(path): parse_python_file(code) for path, code in sources.items()
+    }
+
+    call_graph = build_project_call_graph(parsed_maps)
+
+    assert call_graph == {
+        "repo.pkg.util.helper": [],
+        "repo.pkg.util.other": [],
+        "repo.app.main": ["repo.pkg.util.helper", "repo.pkg.util.other", "repo.app.run"],
+        "repo.app.run": [],
+    }
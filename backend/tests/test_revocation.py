@@ -0,0 +1,159 @@
+"""Tests for the in-memory cache of revoked access tokens."""
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from http import HTTPStatus
+
+import jwt
+from sqlalchemy import event
+
+from annotator.models.token_blacklist import BlacklistedToken, RevocationCache
+from annotator.util.bloom import BloomFilter
+from annotator.util.datetime_util import utc_now
+from tests.util import get_user, login_user, logout_user, register_user
+
+
+@contextmanager
+def count_queries(db):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def blacklist_row(db, jti, row_id=None, expires_in=60):
+    row = BlacklistedToken(jti, time.time() + expires_in)
+    row.id = row_id
+    db.session.add(row)
+    db.session.commit()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"token-{i}")
+    assert all(f"token-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def token_id(access_token):
+    return jwt.decode(access_token, options={"verify_signature": False})["jti"]
+
+
+def test_tokens_have_unique_ids(client, db):
+    register_user(client)
+    first = login_user(client).json["access_token"]
+    second = login_user(client).json["access_token"]
+    assert len(token_id(first)) == 32
+    assert token_id(first) != token_id(second)
+
+
+def test_valid_token_is_checked_without_query(client, db):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    assert get_user(client, access_token).status_code == HTTPStatus.OK
+    with count_queries(db) as statements:
+        assert not BlacklistedToken.check_blacklist(token_id(access_token))
+    assert statements == []
+
+
+def test_logout_revokes_token_in_cache(client, db):
+    register_user(client)
+    access_token = login_user(client).json["access_token"]
+    assert logout_user(client, access_token).status_code == HTTPStatus.OK
+    with count_queries(db) as statements:
+        assert BlacklistedToken.check_blacklist(token_id(access_token))
+    assert statements == []
+    assert get_user(client, access_token).status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_cache_syncs_tokens_blacklisted_by_other_processes(db):
+    cache = RevocationCache(sync_seconds=0)
+    blacklist_row(db, "before-start")
+    blacklist_row(db, "expired", expires_in=-60)
+    assert cache.is_revoked("before-start")
+    assert not cache.is_revoked("expired")
+
+    # another process logs out
+    blacklist_row(db, "later")
+    assert cache.is_revoked("later")
+    assert not cache.is_revoked("never")
+
+
+def test_cache_picks_up_ids_committed_out_of_order(db):
+    cache = RevocationCache(sync_seconds=0)
+    blacklist_row(db, "first", row_id=1)
+    assert cache.is_revoked("first")
+    # id 2 is still being inserted when id 3 commits
+    blacklist_row(db, "third", row_id=3)
+    assert cache.is_revoked("third")
+    blacklist_row(db, "second", row_id=2)
+    assert cache.is_revoked("second")
+
+
+def test_cache_picks_up_token_revoked_while_loading(db):
+    cache = RevocationCache(sync_seconds=0)
+    blacklist_row(db, "before-start")
+    engine = db.engine
+    revoked = []
+
+    def revoke_during_load(conn, cursor, statement, *args):
+        # a revocation shows up between the load queries
+        if revoked or "token_blacklist" not in statement:
+            return
+        revoked.append(True)
+        conn.execute(
+            BlacklistedToken.__table__.insert().values(
+                jti="during-load", expires_at=utc_now() + timedelta(minutes=1)
+            )
+        )
+
+    event.listen(engine, "after_cursor_execute", revoke_during_load)
+    try:
+        cache.is_revoked("before-start")
+    finally:
+        event.remove(engine, "after_cursor_execute", revoke_during_load)
+    assert revoked
+    assert cache.is_revoked("during-load")
+
+
+def test_cache_waits_for_sync_interval(db):
+    cache = RevocationCache(sync_seconds=60)
+    assert not cache.is_revoked("token")
+    blacklist_row(db, "token")
+    # not seen until the next sync, unless blacklisted by this process
+    assert not cache.is_revoked("token")
+    cache.add("token", time.time() + 60)
+    assert cache.is_revoked("token")
+
+
+def test_cache_drops_expired_tokens(db):
+    cache = RevocationCache(sync_seconds=0, capacity=4)
+    for i in range(8):
+        cache.add(f"old-{i}", time.time() - 1)
+    cache.add("live", time.time() + 60)
+    assert not cache.is_revoked("old-0")
+    assert cache.is_revoked("live")
+    assert list(cache._revoked) == ["live"]
+    assert len(cache._bloom) == 1
+
+
+def test_purge_deletes_expired_rows_in_batches(db):
+    for i in range(5):
+        blacklist_row(db, f"expired-{i}", expires_in=-60)
+    blacklist_row(db, "live")
+    with count_queries(db) as statements:
+        assert BlacklistedToken.purge_expired(batch_size=2) == 5
+    deletes = [s for s in statements if s.startswith("DELETE")]
+    assert len(deletes) == 3
+    assert [row.jti for row in BlacklistedToken.query.all()] == ["live"]
+    assert BlacklistedToken.purge_expired(batch_size=2) == 0
@@ -0,0 +1,117 @@
+"""Unit tests for the sandboxed parser process pool."""
+
+import io
+import json
+import os
+import signal
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+
+from annotator.api.file.parser import parse_python_file
+from annotator.api.file.sandbox import (
+    ParserPool,
+    SYNTAX_ERROR,
+    TIMEOUT_ERROR,
+    MEMORY_ERROR,
+    CRASH_ERROR,
+)
+from tests.test_file import upload_file
+from tests.util import register_user, login_user
+
+CODE = "def foo(x):\n    return bar(x)\n\ndef bar(y):\n    return y\n"
+
+
+def generate_code(n_functions):
+    return "".join(
+        f"def f{i}(a):\n    if a:\n        return f{i + 1}(a)\n    return a.b.c(a)\n"
+        for i in range(n_functions)
+    )
+
+
+@pytest.fixture
+def pool(request):
+    pool = ParserPool(workers=1, **request.param)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=30, memory_limit_mb=512)], indirect=True)
+def test_parser_pool_parses_in_worker(pool):
+    result = pool.parse(CODE)
+    assert result.success
+    assert json.loads(result.value) == parse_python_file(CODE)
+    result = pool.parse("def broken(\n")
+    assert result.failure
+    assert result.error == SYNTAX_ERROR
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=30, memory_limit_mb=512)], indirect=True)
+def test_parser_pool_parse_many_keeps_order(pool):
+    codes = [CODE, "def broken(\n", generate_code(3)]
+    results = pool.parse_many(codes)
+    assert [r.success for r in results] == [True, False, True]
+    assert json.loads(results[0].value) == parse_python_file(codes[0])
+    assert results[1].error == SYNTAX_ERROR
+    assert json.loads(results[2].value) == parse_python_file(codes[2])
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=30, memory_limit_mb=16)], indirect=True)
+def test_parser_pool_rejects_memory_limit(pool):
+    result = pool.parse(generate_code(20000))
+    assert result.failure
+    assert result.error == MEMORY_ERROR
+    assert pool.parse(CODE).success
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=1, memory_limit_mb=0)], indirect=True)
+def test_parser_pool_rejects_cpu_timeout(pool):
+    result = pool.parse(generate_code(20000))
+    assert result.failure
+    assert result.error == TIMEOUT_ERROR
+    assert pool.parse(CODE).success
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=60, memory_limit_mb=0)], indirect=True)
+def test_parser_pool_does_not_retry_crashed_job(pool):
+    assert pool.parse(CODE).success
+    [worker] = pool.worker_processes()
+
+    def kill_worker():
+        # what the OS does to a worker that runs out of memory
+        time.sleep(0.5)
+        os.kill(worker.pid, signal.SIGKILL)
+
+    killer = threading.Thread(target=kill_worker)
+    killer.start()
+    started = time.monotonic()
+    result = pool.parse(generate_code(20000))
+    killer.join()
+    assert result.failure
+    assert result.error == CRASH_ERROR
+    assert time.monotonic() - started < 10
+    assert pool.parse(CODE).success
+    assert worker not in pool.worker_processes()
+
+
+@pytest.mark.parametrize("pool", [dict(timeout=60, memory_limit_mb=0)], indirect=True)
+def test_parser_pool_parse_many_survives_timeout(pool, monkeypatch):
+    # the batch gets 0.2s per round, single parses after the restart do not
+    timeouts = iter([0.2])
+    monkeypatch.setattr(pool, "_wall_clock_timeout", lambda: next(timeouts, 60))
+    codes = [generate_code(20000)] + [CODE] * 6
+    results = pool.parse_many(codes)
+    assert results[0].error == TIMEOUT_ERROR
+    assert [r.error for r in results[1:]] == [None] * 6
+    assert json.loads(results[1].value) == parse_python_file(CODE)
+
+
+def test_upload_rejects_deeply_nested_file(client, db, upload_folder):
+    register_user(client)
+    response = login_user(client)
+    access_token = response.json["access_token"]
+    data = io.BytesIO(b"x = " + b"-" * 100000 + b"1\n")
+    response = upload_file(client, access_token, data, "nested.py", "nested")
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,114 @@
+"""Tests for the LLM backend selection and the deterministic stub backend."""
+
+import openai
+import pytest
+
+from annotator.api.annotation.backends import create_client
+from annotator.api.annotation.gateway import UNAVAILABLE_ERROR, LLMError, LLMGateway
+from annotator.api.annotation.metrics import CallStats
+from annotator.api.annotation.stub import StubClient, parse_errors
+from tests.test_annotation import generate, upload_and_login
+
+MESSAGES = [{"role": "user", "content": "Explain function: foo"}]
+
+
+def stub_gateway(**kwargs):
+    sleeps = []
+    client = StubClient(sleep=sleeps.append, **kwargs)
+    gateway = LLMGateway(lambda: client, sleep=sleeps.append, jitter=lambda: 0.5)
+    return gateway, sleeps
+
+
+def test_parse_errors():
+    assert parse_errors("") == []
+    assert parse_errors("429=0.05, timeout=0.01") == [(429, 0.05), ("timeout", 0.01)]
+    with pytest.raises(ValueError):
+        parse_errors("500=0.7,503=0.4")
+
+
+def test_stub_is_deterministic():
+    first = StubClient(sleep=lambda _: None, seed=1)
+    second = StubClient(sleep=lambda _: None, seed=1)
+    reply = first.chat.completions.create(messages=MESSAGES, model="gpt-4.1")
+    assert reply == second.chat.completions.create(messages=MESSAGES, model="gpt-4.1")
+    assert reply.choices[0].message.content.startswith("Stub annotation")
+    assert reply.usage.completion_tokens == 120
+
+    other = StubClient(sleep=lambda _: None, seed=2)
+    other_reply = other.chat.completions.create(messages=MESSAGES, model="gpt-4.1")
+    assert other_reply.choices[0].message.content != reply.choices[0].message.content
+
+
+def test_stub_latency_distribution():
+    sleeps = []
+    client = StubClient(latency=2, latency_sigma=0, sleep=sleeps.append)
+    client.chat.completions.create(messages=MESSAGES, model="gpt-4.1")
+    assert sleeps == [2]
+
+    sleeps.clear()
+    client = StubClient(latency=1, latency_sigma=0.5, sleep=sleeps.append)
+    for i in range(200):
+        messages = [{"role": "user", "content": f"Explain function: f{i}"}]
+        client.chat.completions.create(messages=messages, model="gpt-4.1")
+    sleeps.sort()
+    # log-normal around the median
+    assert 0.8 < sleeps[100] < 1.25
+    assert sleeps[-1] > 1.5 and sleeps[0] < 0.7
+
+
+def test_stub_errors_go_through_gateway_retries():
+    gateway, _ = stub_gateway(latency=0.01, errors=[(503, 1.0)])
+    with pytest.raises(LLMError) as e:
+        gateway.complete(messages=MESSAGES, model="gpt-4.1")
+    assert e.value.message == UNAVAILABLE_ERROR
+
+    # with this seed the first attempt is throttled, the retry succeeds
+    gateway, sleeps = stub_gateway(latency=0.01, errors=[(429, 0.5)], seed=0)
+    stats = CallStats()
+    response = gateway.complete(stats=stats, messages=MESSAGES, model="gpt-4.1")
+    assert response.choices[0].message.content
+    assert stats.retries == 1
+    # the retry waited for the stub's Retry-After
+    assert max(sleeps) >= 0.1
+
+
+def test_stub_times_out_like_the_service():
+    client = StubClient(latency=5, latency_sigma=0, sleep=lambda _: None)
+    with pytest.raises(openai.APITimeoutError):
+        client.chat.completions.create(messages=MESSAGES, model="gpt-4.1", timeout=1)
+
+
+def test_stub_streams_same_text_with_usage():
+    gateway, sleeps = stub_gateway(latency=1, latency_sigma=0)
+    text = (
+        gateway.complete(messages=MESSAGES, model="gpt-4.1").choices[0].message.content
+    )
+    sleeps.clear()
+    stats = CallStats()
+    pieces = list(gateway.stream(stats=stats, messages=MESSAGES, model="gpt-4.1"))
+    assert "".join(pieces) == text
+    assert len(pieces) == 120
+    assert stats.completion_tokens == 120
+    assert sum(sleeps) == pytest.approx(1)
+
+
+def test_create_client_by_config(app):
+    app.config["LLM_BACKEND"] = "stub"
+    assert isinstance(create_client(app.config), StubClient)
+    app.config.update(
+        LLM_BACKEND="azure",
+        AZURE_OPENAI_ENDPOINT="https://example.openai.azure.com",
+        AZURE_OPENAI_KEY="test",
+    )
+    assert isinstance(create_client(app.config), openai.AzureOpenAI)
+    app.config["LLM_BACKEND"] = "nope"
+    with pytest.raises(ValueError):
+        create_client(app.config)
+
+
+def test_annotate_with_stub_backend(app, client, db, upload_folder):
+    app.config.update(LLM_BACKEND="stub", LLM_STUB_LATENCY_SECONDS=0.01)
+    access_token, file_uuid = upload_and_login(client)
+    response = generate(client, access_token, file_uuid, "foo")
+    assert response.status_code == 200
+    assert response.json["annotation"].startswith("Stub annotation")
@@ -35,3 +35,11 @@ def logout_user(test_client, access_token):
     return test_client.post(
         url_for("api.auth_logout"), headers={"Authorization": f"Bearer {access_token}"}
     )
+
+
+def refresh_tokens(test_client, refresh_token):
+    return test_client.post(
+        url_for("api.auth_refresh"),
+        data=f"refresh_token={refresh_token}",
+        content_type="application/x-www-form-urlencoded",
+    )